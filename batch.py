@@ -0,0 +1,201 @@
+"""Headless batch processing of segmentation cases (no Qt required).
+
+Each case is a VTI volume with optional saved contours (.npz from "Save
+Contours") and optional VTP meshes. For every case the volume is loaded, the
+contours (plus those interpolated between annotated slices) are rasterized
+into a label volume, and the meshes are loaded, reduced to an ensemble mean
+surface with per-vertex spread and scored against the contours and each other
+(Dice/IoU, Hausdorff and average surface distance). Cases run in a process
+pool; outputs, metrics and per-stage timings go to <output-dir>/<case name>/.
+
+    python batch.py worklist.json --output-dir results --workers 4
+    python batch.py scans/*.vti --meshes "vtp/*.vtp" --output-dir results
+
+A worklist is a JSON list of {"name", "vti", "contours", "meshes"} objects
+(only "vti" is required). VTI files given directly use <stem>.npz next to them
+as contours when it exists. A case is named after its VTI file; when several
+files share a stem (e.g. study_*/image.vti) their names are built from the
+path below the files' common directory instead. Names must be unique.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from contours import ContourRasterizer, ContourStore, interpolate_contours
+from ensemble import compute_ensemble_statistics, load_ensemble
+from mesh_io import GeometryCache, read_vtp, write_vtp
+from metrics import annotated_labels, compute_agreement_metrics, contour_points
+from volume_io import read_vti, write_vti
+
+
+def load_worklist(inputs, meshes_pattern=None):
+    """Expands the command-line inputs (worklist .json files and .vti files) into case dicts."""
+    mesh_paths = sorted(glob.glob(meshes_pattern)) if meshes_pattern else []
+    cases = []
+    for path in inputs:
+        if path.lower().endswith(".json"):
+            with open(path) as f:
+                entries = json.load(f)
+            base_dir = os.path.dirname(os.path.abspath(path))
+            for entry in entries:
+                case = dict(entry)
+                # Relative paths in a worklist are relative to the worklist itself
+                case['vti'] = os.path.join(base_dir, case['vti'])
+                if case.get('contours'):
+                    case['contours'] = os.path.join(base_dir, case['contours'])
+                case['meshes'] = [os.path.join(base_dir, m) for m in case.get('meshes', [])] or mesh_paths
+                cases.append(case)
+        else:
+            contours = os.path.splitext(path)[0] + ".npz"
+            cases.append({'vti': path, 'contours': contours if os.path.exists(contours) else None,
+                          'meshes': mesh_paths})
+    assign_case_names(cases)
+    return cases
+
+
+def assign_case_names(cases):
+    """Names unnamed cases after their VTI file, disambiguating shared stems; raises ValueError on duplicates."""
+    unnamed = [case for case in cases if 'name' not in case]
+    stems = [os.path.splitext(os.path.basename(case['vti']))[0] for case in unnamed]
+    shared = {stem for stem in stems if stems.count(stem) > 1}
+    for stem in shared:
+        paths = [os.path.abspath(case['vti']) for case, s in zip(unnamed, stems) if s == stem]
+        common = os.path.commonpath([os.path.dirname(path) for path in paths])
+        for case, path in zip([case for case, s in zip(unnamed, stems) if s == stem], paths):
+            case['name'] = os.path.splitext(os.path.relpath(path, common))[0].replace(os.sep, "_")
+    for case, stem in zip(unnamed, stems):
+        case.setdefault('name', stem)
+
+    names = [case['name'] for case in cases]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate case names (outputs would overwrite each other): {', '.join(duplicates)}")
+
+
+def process_case(case, output_dir, geometry_cache_dir=None, interpolate=True):
+    """Runs all stages of one case and returns its report (status, outputs and stage timings in seconds)."""
+    timings = {}
+    report = {'name': case['name'], 'vti': case['vti'], 'status': 'ok', 'timings': timings, 'outputs': {}}
+    case_dir = os.path.join(output_dir, case['name'])
+    os.makedirs(case_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    def stage(name, function):
+        start = time.perf_counter()
+        result = function()
+        timings[name] = time.perf_counter() - start
+        return result
+
+    try:
+        image_data = stage('load_vti', lambda: read_vti(case['vti']))
+        if image_data is None:
+            raise IOError(f"Failed to load VTI file: {case['vti']}")
+        report['dimensions'] = list(image_data.GetDimensions())
+
+        if case.get('contours'):
+            store = ContourStore()
+            stage('load_contours', lambda: store.load(case['contours']))
+            interpolated = None
+            if interpolate:
+                spacing = image_data.GetSpacing()
+                interpolated = stage('interpolate_contours',
+                                     lambda: interpolate_contours(store, sample_spacing=min(spacing[0], spacing[1])))
+                report['interpolated_contours'] = len(interpolated)
+            rasterizer = ContourRasterizer(image_data)
+            stage('rasterize', lambda: rasterizer.update(store, interpolated=interpolated))
+            labels_path = os.path.join(case_dir, "labels.vti")
+            stage('write_labels', lambda: write_vti(rasterizer.label_image, labels_path))
+            report['contours'] = len(store)
+            annotated = sorted(set(store.annotated_slices())
+                               | set(interpolated.annotated_slices() if interpolated else []))
+            report['labelled_voxels'] = int(rasterizer.labels.sum())
+            report['outputs']['labels'] = labels_path
+
+        if case.get('meshes'):
+            loader = GeometryCache(geometry_cache_dir).load if geometry_cache_dir else read_vtp
+            # One worker thread per stage: parallelism comes from the process pool
+            ensemble = stage('load_meshes', lambda: load_ensemble(case['meshes'], loader, max_workers=1))
+            report['meshes'] = len(ensemble)
+            if len(ensemble) > 0:
+                statistics = stage('ensemble_statistics',
+                                   lambda: compute_ensemble_statistics(ensemble, max_workers=1))
+                mean_path = os.path.join(case_dir, "ensemble_mean.vtp")
+                stage('write_ensemble', lambda: write_vtp(statistics.mean_surface(), mean_path))
+                report['outputs']['ensemble_mean'] = mean_path
+
+                members = [ensemble.member(i) for i in range(len(ensemble))]
+                contour_args = {}
+                if case.get('contours'):
+                    spacing = image_data.GetSpacing()
+                    metric_slices, labels = annotated_labels(rasterizer.labels, annotated, image_data)
+                    contour_args = {'labels': labels, 'annotated_slices': metric_slices,
+                                    'contour_xyz': contour_points([store] + ([interpolated] if interpolated else []),
+                                                                  min(spacing[0], spacing[1]))}
+                contour_metrics, pairwise_metrics = stage('metrics', lambda: compute_agreement_metrics(
+                    members, image_data, max_workers=1, **contour_args))
+                names = [os.path.basename(key) for key in ensemble.keys]
+                report['metrics'] = {
+                    'contours': dict(zip(names, contour_metrics)) if contour_metrics is not None else None,
+                    'pairwise': {f"{names[i]} vs {names[j]}": m for (i, j), m in sorted(pairwise_metrics.items())}}
+    except Exception as e:
+        report['status'] = 'error'
+        report['error'] = f"{type(e).__name__}: {e}"
+        report['traceback'] = traceback.format_exc()
+
+    timings['total'] = time.perf_counter() - started
+    with open(os.path.join(case_dir, "case.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch processing of segmentation cases.",
+                                     epilog="See the module docstring of batch.py for the worklist format.")
+    parser.add_argument("inputs", nargs="+", help="Worklist .json files and/or .vti files")
+    parser.add_argument("--meshes", help="Glob of VTP meshes used for cases that do not list their own")
+    parser.add_argument("--output-dir", default="batch_output")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of worker processes")
+    parser.add_argument("--geometry-cache", help="Directory of the binary mesh cache shared by the workers")
+    parser.add_argument("--no-interpolation", action="store_true",
+                        help="Rasterize only the drawn contours, without filling the slices between them")
+    args = parser.parse_args()
+
+    try:
+        cases = load_worklist(args.inputs, args.meshes)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if not cases:
+        print("No cases to process.", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    reports = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(cases))) as executor:
+        futures = [executor.submit(process_case, case, args.output_dir, args.geometry_cache,
+                                   not args.no_interpolation) for case in cases]
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            print(f"[{len(reports)}/{len(cases)}] {report['name']}: {report['status']} "
+                  f"({report['timings']['total']:.2f} s)")
+            if report['status'] != 'ok':
+                print(f"    {report['error']}", file=sys.stderr)
+
+    summary = {'wall_time': time.perf_counter() - started, 'workers': args.workers,
+               'cases': sorted(reports, key=lambda r: r['name'])}
+    with open(os.path.join(args.output_dir, "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=2)
+    failed = sum(report['status'] != 'ok' for report in reports)
+    print(f"Processed {len(reports)} cases in {summary['wall_time']:.2f} s, {failed} failed.")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
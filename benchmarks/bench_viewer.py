@@ -0,0 +1,211 @@
+"""Headless latency benchmarks for the viewer's hot paths.
+
+Drives VTIViewer offscreen on synthetic volumes and meshes and prints
+per-operation latency percentiles (ms) and peak memory as JSON:
+
+    python benchmarks/bench_viewer.py --sizes 64 128 256 --output bench.json
+
+Each size runs in its own process so peak memory is measured per case. Qt's
+offscreen platform is used unless QT_QPA_PLATFORM is set (e.g. to xcb under
+xvfb-run for a GPU-less X server).
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+PERCENTILES = (50, 90, 99)
+
+
+def peak_rss_bytes():
+    """Returns the peak resident set size of this process (None if it cannot be determined)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is in bytes on macOS, KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def write_synthetic_volume(path, size):
+    """Writes a size^3 int16 volume with a few nested blobs and noise."""
+    z, y, x = np.mgrid[0:size, 0:size, 0:size].astype(np.float32) / size - 0.5
+    radius = np.sqrt(x * x + y * y + z * z)
+    values = 1000.0 * np.exp(-(radius / 0.25) ** 2) + 300.0 * (radius < 0.15)
+    values += np.random.default_rng(0).normal(0.0, 20.0, values.shape)
+    image = vtk.vtkImageData()
+    image.SetDimensions(size, size, size)
+    image.SetSpacing(1.0, 1.0, 1.0)
+    scalars = numpy_support.numpy_to_vtk(values.astype(np.int16).ravel(), deep=1)
+    scalars.SetName("Intensity")
+    image.GetPointData().SetScalars(scalars)
+    writer = vtk.vtkXMLImageDataWriter()
+    writer.SetFileName(path)
+    writer.SetInputData(image)
+    writer.Write()
+
+
+def write_synthetic_meshes(directory, size, count):
+    """Writes `count` sphere meshes of about 2 * size^2 triangles centred in the volume."""
+    paths = []
+    for i in range(count):
+        sphere = vtk.vtkSphereSource()
+        sphere.SetCenter(size / 2.0, size / 2.0, size / 2.0)
+        sphere.SetRadius(size * (0.3 + 0.02 * i))
+        sphere.SetThetaResolution(size)
+        sphere.SetPhiResolution(size)
+        path = os.path.join(directory, f"mesh_{i}.vtp")
+        writer = vtk.vtkXMLPolyDataWriter()
+        writer.SetFileName(path)
+        writer.SetInputConnection(sphere.GetOutputPort())
+        writer.Write()
+        paths.append(path)
+    return paths
+
+
+def summarize(samples):
+    samples_ms = np.asarray(samples) * 1000.0
+    summary = {f"p{p}": float(np.percentile(samples_ms, p)) for p in PERCENTILES}
+    summary.update(count=len(samples), mean=float(samples_ms.mean()), max=float(samples_ms.max()))
+    return summary
+
+
+def run_case(size, repeats, mesh_render=True):
+    """Benchmarks one volume/mesh size in this process and returns its results."""
+    from PyQt5.QtWidgets import QApplication
+    from mesh_io import GeometryCache
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    timings = {}
+
+    def timed(name, operation, render=True):
+        # Operations are measured through to their coalesced render
+        start = time.perf_counter()
+        operation()
+        if render:
+            viewer.render_scheduler.flush()
+        else:
+            viewer.render_scheduler.cancel()
+        timings.setdefault(name, []).append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        vti_path = os.path.join(work_dir, "volume.vti")
+        write_synthetic_volume(vti_path, size)
+        mesh_paths = write_synthetic_meshes(work_dir, size, repeats)
+
+        viewer = main.VTIViewer()
+        viewer.vtp_file_list[:] = mesh_paths
+        viewer.vtp_prefetcher.geometry_cache = GeometryCache(os.path.join(work_dir, "geometry"))
+
+        # load_vti: from the call until all views are initialized
+        for _ in range(repeats):
+            viewer.image_data = None
+            start = time.perf_counter()
+            viewer.load_vti(vti_path)
+            while viewer.image_data is None:
+                app.processEvents()
+                time.sleep(0.001)
+            viewer.render_scheduler.flush()
+            timings.setdefault("load_vti", []).append(time.perf_counter() - start)
+            app.processEvents()
+
+        # update_slices: move all three sliders to a new position
+        for i in range(repeats):
+            index = (i * 7) % size
+            def move_sliders():
+                viewer.slider_axial.setValue(index)
+                viewer.slider_coronal.setValue(index)
+                viewer.slider_sagittal.setValue(index)
+            timed("update_slices", move_sliders)
+
+        # set_slice: a single 2D view stepping through slices
+        for i in range(repeats):
+            timed("set_slice", lambda: viewer.slice_widget_axial.set_slice((i * 3) % size))
+
+        # add_contour_point: a closed contour drawn on the middle axial slice
+        viewer.slider_axial.setValue(size // 2)
+        viewer.draw_btn.setChecked(True)
+        viewer.toggle_drawing(True)
+        for angle in np.linspace(0.0, 2.0 * np.pi, max(repeats, 8), endpoint=False):
+            point = (size / 2.0 + size / 4.0 * np.cos(angle), size / 2.0 + size / 4.0 * np.sin(angle))
+            timed("add_contour_point", lambda: viewer.add_contour_point(point))
+        viewer.draw_btn.setChecked(False)
+        viewer.toggle_drawing(False)
+
+        # load_vtp_after_calc: first through cold caches, then from the geometry cache on disk
+        for name in ("load_vtp_after_calc", "load_vtp_after_calc_geometry_cached"):
+            viewer.vtp_file_index = 0
+            viewer.vtp_cache.clear()
+            for _ in mesh_paths:
+                viewer.vtp_cache.clear()  # Measure the decode, not the in-memory cache
+                def show_next_step():
+                    # The step is decoded in the background; wait for it and show it as the GUI's poll does
+                    viewer.load_vtp_after_calc()
+                    request = viewer.vtp_step_request
+                    if request is not None:
+                        concurrent.futures.wait([request])
+                        viewer.poll_vtp_step(request, viewer.vtp_file_list[viewer.vtp_file_index - 1])
+                timed(name, show_next_step, render=mesh_render)
+
+        viewer.close()
+
+    return {
+        'volume_size': size,
+        'mesh_triangles': 2 * size * (size - 2),
+        'mesh_render': mesh_render,
+        'operations': {name: summarize(samples) for name, samples in timings.items()},
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 128, 256],
+                        help="Edge lengths of the synthetic cubic volumes")
+    parser.add_argument("--repeats", type=int, default=20, help="Samples per operation")
+    parser.add_argument("--output", help="Write the JSON results to this file instead of stdout")
+    parser.add_argument("--no-mesh-render", action="store_true",
+                        help="Time VTP swaps without drawing them (for GL stacks that cannot draw "
+                             "translucent meshes offscreen)")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)  # Internal: run one case in-process
+    args = parser.parse_args()
+
+    if args.single is not None:
+        print(json.dumps(run_case(args.single, args.repeats, mesh_render=not args.no_mesh_render)))
+        return
+
+    results = {'python': sys.version.split()[0], 'vtk': vtk.vtkVersion.GetVTKVersion(), 'cases': []}
+    for size in args.sizes:
+        command = [sys.executable, os.path.abspath(__file__), "--single", str(size), "--repeats", str(args.repeats)]
+        if args.no_mesh_render:
+            command.append("--no-mesh-render")
+        completed = subprocess.run(command, capture_output=True, text=True, check=True)
+        results['cases'].append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        print(f"Finished size {size}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main_cli()
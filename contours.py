@@ -0,0 +1,561 @@
+import threading
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+
+def catmull_rom_segment(p0, p1, p2, p3, num_samples):
+    """Samples the Catmull-Rom segment from p1 to p2 (p2 itself excluded) at num_samples points.
+
+    Given (n, 2) arrays of segment points and one sample count per segment,
+    samples all n segments in one vectorized pass and concatenates them.
+    """
+    p0, p1, p2, p3 = (np.asarray(p, dtype=float) for p in (p0, p1, p2, p3))
+    if p1.ndim == 1:
+        t = np.linspace(0.0, 1.0, num_samples, endpoint=False)[:, None]
+    else:
+        # Per-sample segment index and local parameter t in [0, 1)
+        counts = np.broadcast_to(np.asarray(num_samples, dtype=np.int64), (len(p1),))
+        segment = np.repeat(np.arange(len(p1)), counts)
+        starts = np.cumsum(counts) - counts
+        t = ((np.arange(counts.sum()) - starts[segment]) / counts[segment])[:, None]
+        p0, p1, p2, p3 = p0[segment], p1[segment], p2[segment], p3[segment]
+    t2 = t * t
+    t3 = t2 * t
+    return 0.5 * ((2.0 * p1)
+                  + (p2 - p0) * t
+                  + (2.0 * p0 - 5.0 * p1 + 4.0 * p2 - p3) * t2
+                  + (3.0 * p1 - p0 - 3.0 * p2 + p3) * t3)
+
+
+def sample_closed_contour(control_points, sample_spacing=1.0, min_samples=4, max_samples=100):
+    """Samples the closed Catmull-Rom curve through control_points (n, 2) in one vectorized pass."""
+    p1 = np.asarray(control_points, dtype=float)
+    if len(p1) < 2:
+        return p1.copy()
+    p0 = np.roll(p1, 1, axis=0)
+    p2 = np.roll(p1, -1, axis=0)
+    p3 = np.roll(p1, -2, axis=0)
+    lengths = np.hypot(*(p2 - p1).T)
+    counts = np.clip(np.ceil(lengths / sample_spacing), min_samples, max_samples).astype(int)
+    return catmull_rom_segment(p0, p1, p2, p3, counts)
+
+
+def closed_polylines(curves, z_values):
+    """Builds one polydata holding a closed polyline per (k, 2) curve, curve i at height z_values[i]."""
+    curves = list(curves)
+    sizes = np.array([len(c) for c in curves], dtype=np.int64)
+    xyz = np.empty((int(sizes.sum()), 3))
+    if len(curves):
+        xyz[:, :2] = np.concatenate(curves)
+        xyz[:, 2] = np.repeat(np.asarray(z_values, dtype=float), sizes)
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(xyz, deep=1))
+
+    # Each curve of k points becomes a cell of k + 1 ids, the last one closing the loop
+    closed = sizes[sizes >= 2]
+    starts = (np.cumsum(sizes) - sizes)[sizes >= 2]
+    cell_sizes = closed + 1
+    offsets = np.concatenate([[0], np.cumsum(cell_sizes)])
+    cell_of_id = np.repeat(np.arange(len(closed)), cell_sizes)
+    local = np.arange(int(cell_sizes.sum())) - offsets[cell_of_id]
+    connectivity = starts[cell_of_id] + local % closed[cell_of_id]
+    lines = vtk.vtkCellArray()
+    lines.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets.astype(np.int64), deep=1),
+                  numpy_support.numpy_to_vtkIdTypeArray(connectivity.astype(np.int64), deep=1))
+
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.SetLines(lines)
+    return polydata
+
+
+def marker_points(points_xy, z):
+    """Builds a points-only polydata of marker positions for a glyph mapper."""
+    xyz = np.empty((len(points_xy), 3))
+    xyz[:, :2] = points_xy
+    xyz[:, 2] = z
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(xyz, deep=1))
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(points)
+    return polydata
+
+
+# ==============================================================================
+# Incrementally updated closed contour
+# ==============================================================================
+class IncrementalContour:
+    """A closed Catmull-Rom contour on one axial slice that is updated locally per appended point.
+
+    Segment i runs from control point i to control point i + 1 (wrapping around)
+    and is sampled according to its length, so a click only re-evaluates the
+    four segments that depend on the new point. The smooth curve is exposed as
+    `polydata_2d` (at display_z, for the slice view) and `polydata_3d` (at the
+    physical slice_z); the control points as `markers`, meant to be drawn by a
+    single glyph mapper. `preview_2d` is a rubber band from the last control
+    point through the cursor back to the first, moved by set_preview().
+    """
+    MIN_SEGMENT_SAMPLES = 4
+    MAX_SEGMENT_SAMPLES = 100
+
+    def __init__(self, slice_z, display_z, sample_spacing=1.0):
+        self.slice_z = slice_z
+        self.display_z = display_z
+        self.sample_spacing = sample_spacing
+
+        self._control = np.empty((16, 2))  # Grown by doubling, so appends are amortized O(1)
+        self._num_control = 0
+        self._segments = []  # Sampled points of each segment, shape (k, 2)
+
+        self.polydata_2d = vtk.vtkPolyData()
+        self.polydata_3d = vtk.vtkPolyData()
+        self.markers = vtk.vtkPolyData()
+        self.markers.SetPoints(vtk.vtkPoints())
+
+        # Three points updated in place on every mouse move: last control point, cursor, first control point
+        preview_points = vtk.vtkPoints()
+        preview_points.SetNumberOfPoints(3)
+        for i in range(3):
+            preview_points.SetPoint(i, 0.0, 0.0, display_z)
+        preview_line = vtk.vtkCellArray()
+        preview_line.InsertNextCell(3, [0, 1, 2])
+        self.preview_2d = vtk.vtkPolyData()
+        self.preview_2d.SetPoints(preview_points)
+        self.preview_2d.SetLines(preview_line)
+
+    @property
+    def control_points(self):
+        """Control points in physical in-plane coordinates, shape (n, 2)."""
+        return self._control[:self._num_control]
+
+    def _segment(self, i):
+        n = self._num_control
+        p = self._control
+        p0, p1, p2, p3 = p[(i - 1) % n], p[i], p[(i + 1) % n], p[(i + 2) % n]
+        length = np.hypot(*(p2 - p1))
+        num_samples = int(np.clip(np.ceil(length / self.sample_spacing),
+                                  self.MIN_SEGMENT_SAMPLES, self.MAX_SEGMENT_SAMPLES))
+        return catmull_rom_segment(p0, p1, p2, p3, num_samples)
+
+    def append(self, x, y):
+        """Appends a control point and refreshes the curve and marker outputs."""
+        if self._num_control == len(self._control):
+            self._control = np.concatenate([self._control, np.empty_like(self._control)])
+        self._control[self._num_control] = (x, y)
+        self._num_control += 1
+        n = self._num_control
+
+        if n < 4:
+            # Every segment depends on every point until the loop has four of them
+            self._segments = [self._segment(i) for i in range(n)] if n >= 2 else []
+        else:
+            # Segments n-3 (old closing neighbour), n-2 (new), n-1 (new closing) and 0 depend on the new point
+            self._segments[n - 3] = self._segment(n - 3)
+            self._segments[n - 2] = self._segment(n - 2)
+            self._segments.append(self._segment(n - 1))
+            self._segments[0] = self._segment(0)
+
+        self.markers.GetPoints().InsertNextPoint(x, y, self.display_z)
+        self.markers.Modified()
+        self._update_curves()
+
+    def set_preview(self, x, y):
+        """Moves the rubber band's cursor end to (x, y); it collapses to the cursor while there are no points."""
+        n = self._num_control
+        last = self._control[n - 1] if n else (x, y)
+        first = self._control[0] if n else (x, y)
+        points = self.preview_2d.GetPoints()
+        points.SetPoint(0, last[0], last[1], self.display_z)
+        points.SetPoint(1, x, y, self.display_z)
+        points.SetPoint(2, first[0], first[1], self.display_z)
+        points.Modified()
+
+    def _update_curves(self):
+        if self._segments:
+            samples = np.concatenate(self._segments)
+        else:
+            samples = self.control_points
+        self.polydata_2d.ShallowCopy(closed_polylines([samples], [self.display_z]))
+        self.polydata_3d.ShallowCopy(closed_polylines([samples], [self.slice_z]))
+
+
+def make_marker_actor(markers, size=2.0, color=(1, 0, 0)):
+    """Returns one actor drawing a cube glyph at every point of `markers`."""
+    cube = vtk.vtkCubeSource()
+    cube.SetXLength(size)
+    cube.SetYLength(size)
+    cube.SetZLength(size)
+    mapper = vtk.vtkGlyph3DMapper()
+    mapper.SetInputData(markers)
+    mapper.SetSourceConnection(cube.GetOutputPort())
+    mapper.ScalingOff()
+    mapper.OrientOff()
+    actor = vtk.vtkActor()
+    actor.SetMapper(mapper)
+    actor.GetProperty().SetColor(*color)
+    return actor
+
+
+# ==============================================================================
+# Array-backed store of finished contours
+# ==============================================================================
+def _grown(array, length):
+    """Copies array into a new, longer array along the first axis (the rest is left uninitialized)."""
+    grown = np.empty((length,) + array.shape[1:], dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class ContourStore:
+    """All finished contours in contiguous arrays, indexed by axial slice.
+
+    Control points of every contour live in one (N, 2) array; contour i owns
+    rows offsets[i]:offsets[i + 1]. The arrays grow in amortized steps, so adding
+    a contour does not copy them. No VTK objects are kept per contour, the
+    viewer builds actors only for what it displays. `version` changes on every
+    edit and `slice_versions` records the version of each slice's last edit, so
+    dependants can tell what to refresh.
+    """
+    def __init__(self):
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        self._points = np.empty((256, 2))
+        self._num_points = 0
+        self._num_contours = 0
+        self._offsets = np.zeros(65, dtype=np.int64)
+        self._slices = np.empty(64, dtype=np.int64)
+        self._slice_z = np.empty(64)
+        self._by_slice = {}  # key: slice index, value: list of contour ids
+        self.slice_versions = {}  # key: slice index, value: store version of its last edit
+        self.version += 1
+
+    def __len__(self):
+        return self._num_contours
+
+    @property
+    def points(self):
+        return self._points[:self._num_points]
+
+    @property
+    def offsets(self):
+        return self._offsets[:self._num_contours + 1]
+
+    @property
+    def slices(self):
+        return self._slices[:self._num_contours]
+
+    @property
+    def slice_z(self):
+        return self._slice_z[:self._num_contours]
+
+    def add(self, slice_index, slice_z, control_points):
+        """Stores a contour and returns its id."""
+        control_points = np.asarray(control_points, dtype=float).reshape(-1, 2)
+        needed = self._num_points + len(control_points)
+        if needed > len(self._points):
+            self._points = _grown(self.points, max(needed, 2 * len(self._points)))
+        self._points[self._num_points:needed] = control_points
+        self._num_points = needed
+
+        contour_id = self._num_contours
+        if contour_id == len(self._slices):
+            capacity = max(2 * contour_id, 64)
+            self._offsets = _grown(self.offsets, capacity + 1)
+            self._slices = _grown(self.slices, capacity)
+            self._slice_z = _grown(self.slice_z, capacity)
+        self._offsets[contour_id + 1] = needed
+        self._slices[contour_id] = slice_index
+        self._slice_z[contour_id] = slice_z
+        self._num_contours = contour_id + 1
+        self._by_slice.setdefault(int(slice_index), []).append(contour_id)
+        self.version += 1
+        self.slice_versions[int(slice_index)] = self.version
+        return contour_id
+
+    def copy(self):
+        """Returns an independent store with the same contours (e.g. to hand to a worker thread)."""
+        other = ContourStore()
+        other._points = self.points.copy()
+        other._num_points = self._num_points
+        other._num_contours = self._num_contours
+        other._offsets = self.offsets.copy()
+        other._slices = self.slices.copy()
+        other._slice_z = self.slice_z.copy()
+        other._by_slice = {slice_index: list(ids) for slice_index, ids in self._by_slice.items()}
+        other.slice_versions = dict(self.slice_versions)
+        other.version = self.version
+        return other
+
+    def control_points(self, contour_id):
+        """Control points of one contour, as a view into the shared array."""
+        return self._points[self._offsets[contour_id]:self._offsets[contour_id + 1]]
+
+    def contours_on_slice(self, slice_index):
+        if slice_index is None:
+            return []
+        return self._by_slice.get(int(slice_index), [])
+
+    def annotated_slices(self):
+        return sorted(self._by_slice)
+
+    def save(self, file_path):
+        """Writes the whole annotation session as an uncompressed .npz file."""
+        np.savez(file_path, points=self.points, offsets=self.offsets,
+                 slices=self.slices, slice_z=self.slice_z)
+
+    def load(self, file_path):
+        """Replaces the store's content with a session written by save()."""
+        with np.load(file_path) as data:
+            points = data['points']
+            self._points = np.array(points, dtype=float).reshape(-1, 2)
+            self._num_points = len(self._points)
+            self._offsets = data['offsets'].astype(np.int64)
+            self._slices = data['slices'].astype(np.int64)
+            self._slice_z = data['slice_z'].astype(float)
+        self._num_contours = len(self._slices)
+        self._by_slice = {}
+        for contour_id, slice_index in enumerate(self._slices.tolist()):
+            self._by_slice.setdefault(slice_index, []).append(contour_id)
+        self.version += 1
+        self.slice_versions = {slice_index: self.version for slice_index in self._by_slice}
+
+
+# ==============================================================================
+# Inter-slice interpolation between key contours
+# ==============================================================================
+def resample_closed_curve(curve, num_points):
+    """Resamples a closed curve (k, 2) to num_points points evenly spaced by arc length."""
+    closed = np.concatenate([curve, curve[:1]])
+    arc = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(closed, axis=0).T))])
+    targets = np.linspace(0.0, arc[-1], num_points, endpoint=False)
+    return np.column_stack([np.interp(targets, arc, closed[:, 0]), np.interp(targets, arc, closed[:, 1])])
+
+
+def signed_area(curve):
+    x, y = curve[:, 0], curve[:, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
+def align_correspondence(a, b):
+    """Reorders curve b (same point count as a) so that b[i] corresponds to a[i].
+
+    b is given a's winding direction, then the cyclic shift minimizing the
+    summed squared distances between the centred curves is chosen (all shifts
+    are evaluated at once).
+    """
+    if np.sign(signed_area(a)) != np.sign(signed_area(b)):
+        b = b[::-1]
+    n = len(a)
+    shifts = (np.arange(n)[:, None] + np.arange(n)[None, :]) % n  # Row s holds b's indices for shift s
+    centred_a = a - a.mean(axis=0)
+    centred_b = b - b.mean(axis=0)
+    costs = ((centred_b[shifts] - centred_a) ** 2).sum(axis=(1, 2))
+    return b[shifts[np.argmin(costs)]]
+
+
+def match_contours(curves_a, curves_b):
+    """Pairs the contours of two slices by closest centroids; returns (i, j) index pairs."""
+    if not curves_a or not curves_b:
+        return []
+    centroids_a = np.array([c.mean(axis=0) for c in curves_a])
+    centroids_b = np.array([c.mean(axis=0) for c in curves_b])
+    distances = np.hypot(*(centroids_a[:, None] - centroids_b[None, :]).transpose(2, 0, 1))
+    pairs = []
+    for flat in np.argsort(distances, axis=None):
+        i, j = np.unravel_index(flat, distances.shape)
+        if all(i != p[0] and j != p[1] for p in pairs):
+            pairs.append((int(i), int(j)))
+    return pairs
+
+
+def interpolate_contours(store, num_points=64, sample_spacing=1.0, max_gap=None):
+    """Returns a ContourStore of contours interpolated on the unannotated slices between key contours.
+
+    Key contours of consecutive annotated slices are paired by centroid (see
+    match_contours), resampled to num_points matched points each and blended
+    linearly; all intermediate slices of a gap are produced in one array
+    operation. Unpaired contours (e.g. at branchings) end at their slice.
+    Gaps wider than max_gap slices are left empty. The result's slice_versions
+    hold, per interpolated slice, the (slice_a, slice_b) versions of the key
+    slices it was blended from, so it only differs where its inputs changed.
+    """
+    result = ContourStore()
+    annotated = store.annotated_slices()
+    for slice_a, slice_b in zip(annotated[:-1], annotated[1:]):
+        gap = slice_b - slice_a
+        if gap < 2 or (max_gap is not None and gap > max_gap):
+            continue
+        ids_a, ids_b = store.contours_on_slice(slice_a), store.contours_on_slice(slice_b)
+        curves_a = [resample_closed_curve(sample_closed_contour(store.control_points(i), sample_spacing), num_points)
+                    for i in ids_a]
+        curves_b = [resample_closed_curve(sample_closed_contour(store.control_points(i), sample_spacing), num_points)
+                    for i in ids_b]
+        z_a, z_b = store.slice_z[ids_a[0]], store.slice_z[ids_b[0]]
+        fractions = np.arange(1, gap) / gap
+        for i, j in match_contours(curves_a, curves_b):
+            a = curves_a[i]
+            b = align_correspondence(a, curves_b[j])
+            blended = a[None] + fractions[:, None, None] * (b - a)[None]  # (gap - 1, num_points, 2)
+            for k, curve in enumerate(blended):
+                result.add(slice_a + k + 1, z_a + fractions[k] * (z_b - z_a), curve)
+        for slice_index in range(slice_a + 1, slice_b):
+            if slice_index in result.slice_versions:
+                result.slice_versions[slice_index] = (store.slice_versions.get(slice_a),
+                                                      store.slice_versions.get(slice_b))
+    return result
+
+
+class ContourInterpolationJob:
+    """Interpolates between the key contours of a snapshot of a ContourStore on a worker thread.
+
+    The GUI polls `done`, `error` and `result`; `version` is the store version
+    the snapshot was taken at, so stale results can be dropped.
+    """
+    def __init__(self, store, num_points=64, sample_spacing=1.0, max_gap=None):
+        self.snapshot = store.copy()
+        self.version = store.version
+        self.num_points = num_points
+        self.sample_spacing = sample_spacing
+        self.max_gap = max_gap
+        self.result = None
+        self.error = None
+        self.done = False
+        self._thread = threading.Thread(target=self._run, name="contour-interpolation", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.result = interpolate_contours(self.snapshot, self.num_points, self.sample_spacing, self.max_gap)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+
+# ==============================================================================
+# Contour-to-label-volume rasterisation
+# ==============================================================================
+def polygon_mask(polygon, origin, spacing, shape):
+    """Rasterizes a closed polygon (k, 2) in physical coordinates onto a (ny, nx) pixel grid.
+
+    A pixel is inside if its center is, by the even-odd rule. The crossings of
+    all edges with the pixel rows they span are computed at once, and inside
+    spans are filled with a parity cumulative sum along each row.
+    """
+    if len(polygon) < 3:
+        return np.zeros(shape, dtype=bool)
+    return edges_mask(polygon, np.roll(polygon, -1, axis=0), origin, spacing, shape)
+
+
+def edges_mask(starts, ends, origin, spacing, shape):
+    """Even-odd rasterization of a closed set of edges from starts (k, 2) to ends (k, 2), in any order.
+
+    Used by polygon_mask; also fills cross-sections of closed surfaces given as
+    unordered segments.
+    """
+    ny, nx = shape
+    mask = np.zeros(shape, dtype=bool)
+    if len(starts) == 0:
+        return mask
+    x0 = (starts[:, 0] - origin[0]) / spacing[0]
+    y0 = (starts[:, 1] - origin[1]) / spacing[1]
+    x1 = (ends[:, 0] - origin[0]) / spacing[0]
+    y1 = (ends[:, 1] - origin[1]) / spacing[1]
+    row_lo = max(0, int(np.ceil(min(y0.min(), y1.min()))))
+    row_hi = min(ny - 1, int(np.floor(max(y0.max(), y1.max()))))
+    if row_lo > row_hi:
+        return mask
+
+    # Half-open rule: an edge crosses every row y with min(y0, y1) <= y < max(y0, y1)
+    first = np.maximum(np.ceil(np.minimum(y0, y1)), row_lo).astype(np.int64)
+    last = np.minimum(np.ceil(np.maximum(y0, y1)) - 1, row_hi).astype(np.int64)
+    counts = np.maximum(last - first + 1, 0)
+    edge_ids = np.repeat(np.arange(len(x0)), counts)
+    rows = first[edge_ids] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    t = (rows - y0[edge_ids]) / (y1[edge_ids] - y0[edge_ids])
+    x_cross = x0[edge_ids] + t * (x1[edge_ids] - x0[edge_ids])
+    # Parity flips at the first pixel center right of each crossing
+    columns = np.clip(np.ceil(x_cross), 0, nx).astype(np.int64)
+    num_rows = row_hi - row_lo + 1
+    toggles = np.bincount((rows - row_lo) * (nx + 1) + columns, minlength=num_rows * (nx + 1))
+    toggles = toggles.reshape(num_rows, nx + 1)[:, :nx].astype(np.uint8)
+    mask[row_lo:row_hi + 1] = (np.cumsum(toggles, axis=1, dtype=np.uint8) & 1).astype(bool)
+    return mask
+
+
+class ContourRasterizer:
+    """Keeps a binary label volume on the grid of a reference image in sync with a ContourStore.
+
+    `label_image` has the reference image's extent, origin and spacing and wraps
+    the `labels` array (nz, ny, nx) without copying. update() only re-rasterizes
+    slices whose contours changed since the last call, plus the slice of a
+    contour still being drawn, so the mask can be kept live while drawing.
+    Closed contours on the same slice are combined as a union, including those
+    of an optional second store of interpolated contours. Slices are keyed by
+    the stores' slice_versions only, so a store may be replaced by one with
+    equal versions (e.g. a new interpolation result) without redrawing.
+    """
+    def __init__(self, reference_image):
+        self.extent = tuple(reference_image.GetExtent())
+        self.origin = tuple(reference_image.GetOrigin())
+        self.spacing = tuple(reference_image.GetSpacing())
+        x0, x1, y0, y1, z0, z1 = self.extent
+        # np.zeros maps untouched pages lazily, so unannotated slices cost no resident memory
+        self.labels = np.zeros((z1 - z0 + 1, y1 - y0 + 1, x1 - x0 + 1), dtype=np.uint8)
+
+        self.label_image = vtk.vtkImageData()
+        self.label_image.SetExtent(self.extent)
+        self.label_image.SetOrigin(self.origin)
+        self.label_image.SetSpacing(self.spacing)
+        scalars = numpy_support.numpy_to_vtk(self.labels.reshape(-1), deep=0)
+        scalars.SetName("Labels")
+        self.label_image.GetPointData().SetScalars(scalars)
+
+        self._rasterized = {}  # key: slice index, value: store slice version it was rasterized from
+
+    def slice_mask(self, polygons):
+        """Union of the given closed polygons on one axial slice of the label grid."""
+        x0, _, y0, _, _, _ = self.extent
+        origin = (self.origin[0] + x0 * self.spacing[0], self.origin[1] + y0 * self.spacing[1])
+        mask = np.zeros(self.labels.shape[1:], dtype=bool)
+        for polygon in polygons:
+            mask |= polygon_mask(polygon, origin, self.spacing[:2], mask.shape)
+        return mask
+
+    def update(self, store, pending=None, interpolated=None):
+        """Re-rasterizes changed slices; pending is an optional (slice index, control points) being drawn.
+
+        Returns the list of slice indices that were rewritten.
+        """
+        stores = [store] if interpolated is None else [store, interpolated]
+        # A slice is up to date if it was rasterized at the same slice versions of every store
+        wanted = {s: tuple(st.slice_versions.get(s) for st in stores)
+                  for st in stores for s in st.slice_versions}
+        if pending is not None:
+            wanted[int(pending[0])] = object()  # Never equal to a previous entry, so always refreshed
+        dirty = [s for s, version in wanted.items() if self._rasterized.get(s) != version]
+        dirty += [s for s in self._rasterized if s not in wanted]
+
+        sample_spacing = min(self.spacing[0], self.spacing[1])
+        z0, z1 = self.extent[4], self.extent[5]
+        for slice_index in dirty:
+            if not z0 <= slice_index <= z1:
+                continue
+            control = [st.control_points(i) for st in stores for i in st.contours_on_slice(slice_index)]
+            if pending is not None and int(pending[0]) == slice_index:
+                control.append(np.asarray(pending[1], dtype=float))
+            polygons = [sample_closed_contour(points, sample_spacing) for points in control]
+            self.labels[slice_index - z0] = self.slice_mask(polygons)
+
+        self._rasterized = wanted
+        if dirty:
+            self.label_image.GetPointData().GetScalars().Modified()
+            self.label_image.Modified()
+        return dirty
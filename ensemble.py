@@ -0,0 +1,281 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from mesh_io import read_vtp
+
+
+def load_members(paths, loader=read_vtp, max_workers=4):
+    """Loads ensemble members in parallel; returns them in path order (None for unreadable files)."""
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ensemble-load") as executor:
+        return list(executor.map(loader, paths))
+
+
+def point_array(polydata):
+    return numpy_support.vtk_to_numpy(polydata.GetPoints().GetData())
+
+
+def same_topology(a, b):
+    """True if two meshes have the same number of points and identical polygon connectivity."""
+    return a.GetNumberOfPoints() == b.GetNumberOfPoints() and same_cells(a.GetPolys(), b.GetPolys())
+
+
+def same_cells(polys_a, polys_b):
+    return (polys_a.GetNumberOfCells() == polys_b.GetNumberOfCells()
+            and np.array_equal(numpy_support.vtk_to_numpy(polys_a.GetOffsetsArray()),
+                           numpy_support.vtk_to_numpy(polys_b.GetOffsetsArray()))
+            and np.array_equal(numpy_support.vtk_to_numpy(polys_a.GetConnectivityArray()),
+                               numpy_support.vtk_to_numpy(polys_b.GetConnectivityArray())))
+
+
+def corresponding_points(reference, member):
+    """Returns, for every reference vertex, the closest vertex of member as an (N, 3) array.
+
+    The lookup runs in C++ (vtkPointInterpolator over a k-d tree point locator),
+    so several members can be matched on worker threads at once. On dense
+    surfaces the closest vertex approximates the closest surface point to
+    within the member's edge length.
+    """
+    source = vtk.vtkPolyData()
+    source.SetPoints(member.GetPoints())
+    coordinates = numpy_support.numpy_to_vtk(point_array(member), deep=0)
+    coordinates.SetName("Position")
+    source.GetPointData().AddArray(coordinates)
+
+    locator = vtk.vtkKdTreePointLocator()
+    locator.SetDataSet(source)
+    locator.BuildLocator()
+    kernel = vtk.vtkLinearKernel()
+    kernel.SetKernelFootprintToNClosest()
+    kernel.SetNumberOfPoints(1)
+
+    targets = vtk.vtkPolyData()
+    targets.SetPoints(reference.GetPoints())
+    interpolator = vtk.vtkPointInterpolator()
+    interpolator.SetInputData(targets)
+    interpolator.SetSourceData(source)
+    interpolator.SetLocator(locator)
+    interpolator.SetKernel(kernel)
+    interpolator.Update()
+    return numpy_support.vtk_to_numpy(interpolator.GetOutput().GetPointData().GetArray("Position")).copy()
+
+
+# ==============================================================================
+# Ensemble members sharing connectivity, stored as one coordinate array per topology
+# ==============================================================================
+class SharedTopologyEnsemble:
+    """Holds ensemble members with each distinct connectivity stored once.
+
+    Members are grouped by topology (same point count and identical polygons).
+    A group keeps a single vtkCellArray and all of its members' coordinates in
+    one contiguous (members, N, 3) array; member(i) returns a lightweight
+    vtkPolyData whose points wrap that member's rows without copying and whose
+    polygons are the group's shared cell array. Point and cell data arrays of
+    the inputs are not kept.
+    """
+    def __init__(self):
+        self.keys = []  # Member keys (e.g. file paths) in insertion order
+        self._members = []  # (group index, row in the group's coordinate array)
+        self._groups = []  # dict(polys, coordinates, count)
+        self._views = {}  # key: member index, value: vtkPolyData view
+
+    def __len__(self):
+        return len(self._members)
+
+    def add(self, key, polydata):
+        """Adds a member and returns its index; its connectivity is shared with an existing group if possible."""
+        points = point_array(polydata)
+        group_index = next((i for i, group in enumerate(self._groups)
+                            if group['coordinates'].shape[1] == len(points)
+                            and same_cells(group['polys'], polydata.GetPolys())), None)
+        if group_index is None:
+            self._groups.append({'polys': polydata.GetPolys(),
+                                 'coordinates': np.empty((4,) + points.shape, dtype=points.dtype), 'count': 0})
+            group_index = len(self._groups) - 1
+
+        group = self._groups[group_index]
+        if group['count'] == len(group['coordinates']):
+            # Grow geometrically; views of earlier members keep their old buffer alive until dropped
+            grown = np.empty((2 * group['count'],) + points.shape, dtype=group['coordinates'].dtype)
+            grown[:group['count']] = group['coordinates'][:group['count']]
+            group['coordinates'] = grown
+            self._views.clear()
+        group['coordinates'][group['count']] = points
+        self._members.append((group_index, group['count']))
+        group['count'] += 1
+        self.keys.append(key)
+        return len(self._members) - 1
+
+    def group_of(self, index):
+        return self._members[index][0]
+
+    def coordinates(self, index):
+        """Returns a member's (N, 3) coordinates as a view of its group's array."""
+        group_index, row = self._members[index]
+        return self._groups[group_index]['coordinates'][row]
+
+    def member(self, index):
+        """Returns a member as a vtkPolyData sharing the group's connectivity and coordinate storage."""
+        view = self._views.get(index)
+        if view is None:
+            group_index, row = self._members[index]
+            points = vtk.vtkPoints()
+            points.SetData(numpy_support.numpy_to_vtk(self.coordinates(index), deep=0))
+            view = vtk.vtkPolyData()
+            view.SetPoints(points)
+            view.SetPolys(self._groups[group_index]['polys'])
+            self._views[index] = view
+        return view
+
+
+def load_ensemble(paths, loader=read_vtp, max_workers=4):
+    """Loads members in parallel into a SharedTopologyEnsemble (unreadable files are skipped)."""
+    ensemble = SharedTopologyEnsemble()
+    for path, polydata in zip(paths, load_members(paths, loader, max_workers)):
+        if polydata is not None:
+            ensemble.add(path, polydata)
+    return ensemble
+
+
+# ==============================================================================
+# Per-vertex mean surface and positional variance of an ensemble
+# ==============================================================================
+class EnsembleStatistics:
+    """Running per-vertex mean position and positional variance over ensemble members.
+
+    Statistics live on the reference mesh's vertices. Members with the
+    reference's topology contribute their vertices directly; others contribute
+    their closest vertices (see corresponding_points). Members are added in
+    batches and merged with Chan's parallel update, so only one batch of
+    coordinates is held at a time.
+    """
+    def __init__(self, reference):
+        self.reference = reference
+        self.count = 0
+        self.mean = np.zeros((reference.GetNumberOfPoints(), 3))
+        self.m2 = np.zeros(reference.GetNumberOfPoints())  # Sum of squared distances to the mean
+
+    def add_batch(self, positions):
+        """Merges a (members, N, 3) array of corresponding positions into the statistics."""
+        positions = np.asarray(positions, dtype=np.float64)
+        batch_count = positions.shape[0]
+        batch_mean = positions.mean(axis=0)
+        batch_m2 = ((positions - batch_mean) ** 2).sum(axis=(0, 2))
+
+        total = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.m2 += batch_m2 + (delta ** 2).sum(axis=1) * self.count * batch_count / total
+        self.mean += delta * batch_count / total
+        self.count = total
+
+    @property
+    def variance(self):
+        """Mean squared distance of the members' vertices to the mean position (per vertex)."""
+        return self.m2 / max(self.count, 1)
+
+    def mean_surface(self):
+        """Returns the mean surface on the reference topology with Variance and StdDev point arrays."""
+        surface = vtk.vtkPolyData()
+        surface.ShallowCopy(self.reference)
+        points = vtk.vtkPoints()
+        points.SetData(numpy_support.numpy_to_vtk(self.mean, deep=1))
+        surface.SetPoints(points)
+        surface.GetPointData().Initialize()
+        surface.GetCellData().Initialize()
+        variance = self.variance
+        for name, values in (("Variance", variance), ("StdDev", np.sqrt(variance))):
+            array = numpy_support.numpy_to_vtk(values, deep=1)
+            array.SetName(name)
+            surface.GetPointData().AddArray(array)
+        surface.GetPointData().SetActiveScalars("StdDev")
+        return surface
+
+
+def compute_ensemble_statistics(ensemble, batch_size=8, max_workers=4, progress_callback=None, is_cancelled=None):
+    """Returns EnsembleStatistics of a SharedTopologyEnsemble on its first member's vertices.
+
+    Returns None if the ensemble is empty or the computation was cancelled.
+    """
+    if len(ensemble) == 0:
+        return None
+    reference = ensemble.member(0)
+    statistics = EnsembleStatistics(reference)
+
+    def positions_of(index):
+        if ensemble.group_of(index) == ensemble.group_of(0):
+            return ensemble.coordinates(index)
+        return corresponding_points(reference, ensemble.member(index))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ensemble-stats") as executor:
+        for start in range(0, len(ensemble), batch_size):
+            if is_cancelled and is_cancelled():
+                return None
+            indices = range(start, min(start + batch_size, len(ensemble)))
+            statistics.add_batch(np.stack(list(executor.map(positions_of, indices))))
+            if progress_callback:
+                progress_callback((indices[-1] + 1) / len(ensemble))
+    return statistics
+
+
+class EnsembleStatisticsJob:
+    """Loads ensemble members and computes their statistics on a worker thread.
+
+    The GUI polls `progress`, `done`, `error` and `surface` (the mean surface);
+    the loaded members stay available in `ensemble`.
+    """
+    def __init__(self, paths, loader=read_vtp, batch_size=8, max_workers=4):
+        self.paths = list(paths)
+        self.loader = loader
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.progress = 0.0
+        self.surface = None
+        self.statistics = None
+        self.ensemble = None
+        self.error = None
+        self.done = False
+        self.cancelled = False
+        self._thread = threading.Thread(target=self._run, name="ensemble-job", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        try:
+            self.ensemble = load_ensemble(self.paths, self.loader, self.max_workers)
+            self.progress = 0.3
+            if self.cancelled:
+                return
+
+            def on_progress(fraction):
+                self.progress = 0.3 + 0.7 * fraction
+            self.statistics = compute_ensemble_statistics(self.ensemble, self.batch_size, self.max_workers,
+                                                          progress_callback=on_progress,
+                                                          is_cancelled=lambda: self.cancelled)
+            if self.statistics is None:
+                if not self.cancelled:
+                    raise IOError("No ensemble member could be loaded")
+                return
+            self.surface = self.statistics.mean_surface()
+            self.progress = 1.0
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+
+def make_uncertainty_lookup_table(scalar_range):
+    """Blue (certain) to red (uncertain) lookup table over scalar_range."""
+    lut = vtk.vtkLookupTable()
+    lut.SetHueRange(0.667, 0.0)
+    lut.SetRange(scalar_range)
+    lut.SetNumberOfTableValues(256)
+    lut.Build()
+    return lut
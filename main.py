@@ -1,13 +1,34 @@
+import os
 import sys
+import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QFileDialog, QPushButton,
                              QVBoxLayout, QWidget, QSlider, QLabel, QGroupBox,
-                             QFormLayout, QHBoxLayout, QMessageBox, QGridLayout)
+                             QFormLayout, QHBoxLayout, QMessageBox, QGridLayout, QSpinBox,
+                             QComboBox)
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QProgressDialog
 from PyQt5.QtCore import QTimer
+import numpy as np
 import vtk
 from vtk.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
 
+from contours import (ContourInterpolationJob, ContourRasterizer, ContourStore, IncrementalContour,
+                      closed_polylines, make_marker_actor, marker_points, sample_closed_contour)
+from ensemble import EnsembleStatisticsJob, make_uncertainty_lookup_table
+from mesh_actor import PersistentMeshActor
+from mesh_io import GeometryCache, PolyDataLRUCache, VTPPrefetcher
+from mesh_lod import MeshLODBuilder
+from mesh_sections import TriangleSliceIndex
+from mesh_stream import MeshStreamClient
+from metrics import AgreementMetricsJob, annotated_labels, contour_points, format_metrics
+from profiling import FrameStatsOverlay, Profiler, profiled
+from rendering import FrameRateGovernor, RenderScheduler, display_to_plane
+from slice_cache import AxisSliceCache, view_slice_image, volume_voxels
+from volume_io import VolumeLoadJob, write_vti
+from volume_pyramid import VolumePyramid
+from volume_rendering import TRANSFER_FUNCTION_PRESETS, CPUVolumeRenderer
+from volume_stats import WINDOW_PRESETS, VolumeStatistics, middle_slices_range
+
 # ==============================================================================
 # Custom interactor style for picking points in the 2D view
 # ==============================================================================
@@ -18,17 +39,31 @@ class ContourInteractorStyle(vtk.vtkInteractorStyleImage):
 
         # Use AddObserver to bind the left-click event to ensure it's captured
         self.AddObserver("LeftButtonPressEvent", self.on_left_button_press)
+        self.AddObserver("MouseMoveEvent", self.on_mouse_move)
+
+    def slice_plane_position(self):
+        """Returns the event position projected onto the slice view's image plane (z = 0), or None."""
+        x, y = self.GetInteractor().GetEventPosition()
+        return display_to_plane(self.GetDefaultRenderer(), x, y, 0.0)
+
+    def on_mouse_move(self, obj, event):
+        if self.parent_viewer and self.parent_viewer.is_drawing:
+            world_pos = self.slice_plane_position()
+            if world_pos is not None:
+                self.parent_viewer.update_contour_preview(world_pos)
+        self.OnMouseMove()
 
     def on_left_button_press(self, obj, event):
         if not self.parent_viewer or not self.parent_viewer.is_drawing:
             self.OnLeftButtonDown()
             return
 
-        click_pos = self.GetInteractor().GetEventPosition()
-        renderer = self.GetDefaultRenderer()
-        picker = vtk.vtkPropPicker()
-        picker.Pick(click_pos[0], click_pos[1], 0, renderer)
-        world_pos = list(picker.GetPickPosition())
+        # Analytic ray/plane intersection: the cost does not depend on the props in the view
+        world_pos = self.slice_plane_position()
+        if world_pos is None:
+            self.OnLeftButtonDown()
+            return
+        world_pos = list(world_pos)
 
         # Force the Z value to be the physical coordinate of the current axial slice
         if self.parent_viewer and hasattr(self.parent_viewer, "slider_axial"):
@@ -106,12 +141,26 @@ class ImageSliceViewerWidget(QWidget):
         self.reslice.SetOutputDimensionality(2)
         self.reslice.SetInterpolationModeToLinear()
 
-        mapper = vtk.vtkImageSliceMapper()
-        mapper.SetInputConnection(self.reslice.GetOutputPort())
+        # Axis-aligned volumes skip the reslice: slices are NumPy views served from a per-axis cache
+        self.slice_cache = AxisSliceCache(view_axis)
+
+        self.mapper = vtk.vtkImageSliceMapper()
+        self.mapper.SetInputConnection(self.reslice.GetOutputPort())
 
         self.image_slice = vtk.vtkImageSlice()
-        self.image_slice.SetMapper(mapper)
+        self.image_slice.SetMapper(self.mapper)
         self.renderer.AddActor(self.image_slice)
+
+        # Outline of the displayed VTP mesh on this slice
+        self.section_polydata = vtk.vtkPolyData()
+        section_mapper = vtk.vtkPolyDataMapper()
+        section_mapper.SetInputData(self.section_polydata)
+        self.section_actor = vtk.vtkActor()
+        self.section_actor.SetMapper(section_mapper)
+        self.section_actor.GetProperty().SetColor(0, 1, 0)  # Green
+        self.section_actor.GetProperty().SetLineWidth(2)
+        self.section_actor.PickableOff()
+        self.renderer.AddActor(self.section_actor)
         
 
         camera = self.renderer.GetActiveCamera()
@@ -129,11 +178,23 @@ class ImageSliceViewerWidget(QWidget):
         layout.addWidget(self.vtk_widget)
 
         self.camera_reset_done = False
+        self.render_scheduler = None
+        self.profiler = None
 
 
     def set_input_data(self, image_data):
         """Sets the input volume data."""
         self.reslice.SetInputData(image_data)
+        if image_data.GetPointData().GetScalars() and image_data.GetDirectionMatrix().IsIdentity():
+            self.slice_cache.set_voxels(volume_voxels(image_data), image_data.GetExtent(),
+                                        image_data.GetOrigin(), image_data.GetSpacing())
+        else:
+            self.slice_cache.clear()
+        self.camera_reset_done = False
+
+    def set_voxels(self, voxels, extent, origin, spacing):
+        """Sets the volume as a (nz, ny, nx) array, e.g. the memory map of an out-of-core volume."""
+        self.slice_cache.set_voxels(voxels, extent, origin, spacing)
         self.camera_reset_done = False
             
     def set_color_level(self, level):
@@ -142,8 +203,15 @@ class ImageSliceViewerWidget(QWidget):
     def set_color_window(self, window):
         self.image_slice.GetProperty().SetColorWindow(window)
 
+    @profiled("slices", name=lambda widget: f"set_slice:{widget.view_axis}")
     def set_slice(self, slice_index):
         """Updates the slice position based on the slice index."""
+        if self.slice_cache.has_volume():
+            # Fast path: swap in the cached (or freshly extracted) axis-aligned slice
+            self.mapper.SetInputData(self.slice_cache.get(slice_index))
+            self.finish_slice_update()
+            return
+
         if not self.reslice.GetInput(): return
         
         image_data = self.reslice.GetInput()
@@ -154,44 +222,57 @@ class ImageSliceViewerWidget(QWidget):
         reslice_axes = vtk.vtkMatrix4x4()
         
         if self.view_axis == 'x': # Sagittal (YZ Plane)
-            reslice_axes.DeepCopy((0, 1, 0, 0,
-                                   0, 0, 1, 0,
+            reslice_axes.DeepCopy((0, 0, 1, 0,
                                    1, 0, 0, 0,
+                                   0, 1, 0, 0,
                                    0, 0, 0, 1))
-            center = image_data.GetCenter()
             slice_pos = origin[0] + slice_index * spacing[0]
             reslice_axes.SetElement(0, 3, slice_pos)
-            reslice_axes.SetElement(1, 3, center[1])
-            reslice_axes.SetElement(2, 3, center[2])
         elif self.view_axis == 'y': # Coronal (XZ Plane)
             reslice_axes.DeepCopy((1, 0, 0, 0,
                                    0, 0, 1, 0,
                                    0, 1, 0, 0,
                                    0, 0, 0, 1))
-            center = image_data.GetCenter()
             slice_pos = origin[1] + slice_index * spacing[1]
-            reslice_axes.SetElement(0, 3, center[0])
             reslice_axes.SetElement(1, 3, slice_pos)
-            reslice_axes.SetElement(2, 3, center[2])
         elif self.view_axis == 'z': # Axial (XY Plane)
             reslice_axes.DeepCopy((1, 0, 0, 0,
                                    0, 1, 0, 0,
                                    0, 0, 1, 0,
                                    0, 0, 0, 1))
-            center = image_data.GetCenter()
             slice_pos = origin[2] + slice_index * spacing[2]
-            reslice_axes.SetElement(0, 3, center[0])
-            reslice_axes.SetElement(1, 3, center[1])
             reslice_axes.SetElement(2, 3, slice_pos)
 
+        # Only the normal component is translated, so the output keeps physical in-plane coordinates
         self.reslice.SetResliceAxes(reslice_axes)
         self.reslice.Update()
+        self.mapper.SetInputConnection(self.reslice.GetOutputPort())
+        self.finish_slice_update()
+
+    def set_section(self, polydata):
+        """Replaces the mesh outline drawn over the slice (an empty polydata hides it)."""
+        self.section_polydata.ShallowCopy(polydata)
+        self.request_render()
 
+    def set_coarse_slice(self, image):
+        """Shows a downsampled slice image (same layout as the slice cache output) until set_slice() is called."""
+        self.mapper.SetInputData(image)
+        self.finish_slice_update()
+
+    def finish_slice_update(self):
+        """Resets the camera on the first slice of a new volume and schedules a redraw."""
         if not hasattr(self, "camera_reset_done") or not self.camera_reset_done:
             self.renderer.ResetCamera()
             self.camera_reset_done = True
 
-        self.vtk_widget.GetRenderWindow().Render()
+        self.request_render()
+
+    def request_render(self):
+        """Schedules a redraw of this view (immediately if no scheduler is attached)."""
+        if self.render_scheduler is not None:
+            self.render_scheduler.request(self.vtk_widget.GetRenderWindow())
+        else:
+            self.vtk_widget.GetRenderWindow().Render()
 
 # ==============================================================================
 # Main Window Class
@@ -203,17 +284,39 @@ class VTIViewer(QMainWindow):
         self.resize(1600, 900)
 
         self.image_data = None
+        self.vti_load_job = None  # VolumeLoadJob of the file being (or last) loaded
+        self.volume = None  # OutOfCoreVolume when the loaded VTI is served from a memory-mapped sidecar
+        self.out_of_core_threshold_bytes = 2 * 1024 ** 3  # Larger volumes are not read into memory
         self.is_drawing = False
         self.contours = []
-        self.current_contour_points = None
+        self.current_contour = None
         self.current_contour_actor_2d = None
         self.current_contour_actor_3d = None
+        self.current_contour_marker_actor = None
+        self.current_contour_preview_actor = None
+
+        # All redraws go through one scheduler so each window is drawn at most once per frame
+        self.render_scheduler = RenderScheduler(max_fps=60)
+        self.profiler = Profiler()
+        self.displayed_slices = {}  # key: view axis, value: slice index currently shown
+
+        self.volume_stats = None  # VolumeStatistics of the loaded volume, built in the background
+
+        # Large volumes show coarse pyramid slices while the sliders move and refine once they pause
+        self.volume_pyramid = None
+        self.pyramid_min_voxels = 256 ** 3  # Smaller volumes are always shown at full resolution
+        self.coarse_slice_size = 256  # Largest side of the coarse slices shown while scrolling
+        self.coarse_axes = set()  # View axes currently showing a coarse slice
+        self.last_slice_change = 0.0
+        self.refine_timer = QTimer()
+        self.refine_timer.setSingleShot(True)
+        self.refine_timer.setInterval(150)
+        self.refine_timer.timeout.connect(self.refine_slices)
 
         self.central_widget = QWidget()
         self.setCentralWidget(self.central_widget)
         self.main_layout = QVBoxLayout(self.central_widget)
 
-        self.contour_point_actors_2d = [] 
 
         # === Top Control Area ===
         top_controls_layout = QHBoxLayout()
@@ -227,6 +330,24 @@ class VTIViewer(QMainWindow):
         top_controls_layout.addWidget(self.open_btn)
         top_controls_layout.addWidget(self.draw_btn)
         top_controls_layout.addWidget(self.clear_btn)
+        self.save_contours_btn = QPushButton("Save Contours")
+        self.save_contours_btn.clicked.connect(self.save_contours)
+        self.load_contours_btn = QPushButton("Load Contours")
+        self.load_contours_btn.clicked.connect(self.load_contours)
+        top_controls_layout.addWidget(self.save_contours_btn)
+        top_controls_layout.addWidget(self.load_contours_btn)
+        self.export_mask_btn = QPushButton("Export Mask")
+        self.export_mask_btn.clicked.connect(self.export_label_volume)
+        top_controls_layout.addWidget(self.export_mask_btn)
+        self.interpolate_btn = QPushButton("Interpolate Slices")
+        self.interpolate_btn.setCheckable(True)
+        self.interpolate_btn.setChecked(True)
+        self.interpolate_btn.toggled.connect(lambda checked: self.start_contour_interpolation())
+        top_controls_layout.addWidget(self.interpolate_btn)
+        self.animate_steps_btn = QPushButton("Animate Steps")
+        self.animate_steps_btn.setCheckable(True)
+        self.animate_steps_btn.setChecked(True)
+        top_controls_layout.addWidget(self.animate_steps_btn)
         top_controls_layout.addStretch()
         self.main_layout.addLayout(top_controls_layout)
 
@@ -241,6 +362,83 @@ class VTIViewer(QMainWindow):
         self.vti_toggle_btn.toggled.connect(self.toggle_vti_in_3d)
         top_controls_layout.addWidget(self.vti_toggle_btn)
 
+        # === Force out-of-core loading regardless of the volume size ===
+        self.out_of_core_btn = QPushButton("Out-of-Core")
+        self.out_of_core_btn.setCheckable(True)
+        top_controls_layout.addWidget(self.out_of_core_btn)
+
+        # === Step back to the previously displayed VTP ===
+        self.prev_step_btn = QPushButton("Previous Step")
+        self.prev_step_btn.clicked.connect(self.show_previous_vtp_step)
+        top_controls_layout.addWidget(self.prev_step_btn)
+
+        # === Cross-sections of the displayed VTP on the 2D slices ===
+        self.mesh_outline_btn = QPushButton("Mesh Outlines")
+        self.mesh_outline_btn.setCheckable(True)
+        self.mesh_outline_btn.setChecked(True)
+        self.mesh_outline_btn.toggled.connect(lambda checked: self.update_mesh_sections('zyx'))
+        top_controls_layout.addWidget(self.mesh_outline_btn)
+
+        # === Mean surface of all VTP members coloured by their spread ===
+        self.ensemble_btn = QPushButton("Ensemble Uncertainty")
+        self.ensemble_btn.setCheckable(True)
+        self.ensemble_btn.toggled.connect(self.toggle_ensemble_view)
+        top_controls_layout.addWidget(self.ensemble_btn)
+
+        # === Dice/IoU/surface distances of the contours and ensemble members ===
+        self.metrics_btn = QPushButton("Agreement Metrics")
+        self.metrics_btn.clicked.connect(lambda: self.start_agreement_metrics(self.vtp_file_list, pairwise=True))
+        top_controls_layout.addWidget(self.metrics_btn)
+
+        # === Window/level presets from the volume histogram, and empty-slice skipping ===
+        self.window_preset_combo = QComboBox()
+        self.window_preset_combo.addItems(list(WINDOW_PRESETS))
+        self.window_preset_combo.setCurrentText("Auto (1-99%)")
+        self.window_preset_combo.setEnabled(False)  # Enabled once the statistics index is ready
+        self.window_preset_combo.currentTextChanged.connect(self.apply_window_preset)
+        top_controls_layout.addWidget(QLabel("W/L:"))
+        top_controls_layout.addWidget(self.window_preset_combo)
+        self.skip_empty_btn = QPushButton("Skip Empty Slices")
+        self.skip_empty_btn.setCheckable(True)
+        self.skip_empty_btn.toggled.connect(lambda checked: self.update_slices())
+        top_controls_layout.addWidget(self.skip_empty_btn)
+
+        # === CPU volume rendering in the 3D view with transfer-function presets ===
+        self.volume_render_btn = QPushButton("Volume Rendering")
+        self.volume_render_btn.setCheckable(True)
+        self.volume_render_btn.toggled.connect(self.toggle_volume_rendering)
+        top_controls_layout.addWidget(self.volume_render_btn)
+        self.tf_preset_combo = QComboBox()
+        self.tf_preset_combo.addItems(list(TRANSFER_FUNCTION_PRESETS))
+        self.tf_preset_combo.currentTextChanged.connect(lambda preset: self.update_volume_rendering_property())
+        top_controls_layout.addWidget(self.tf_preset_combo)
+
+        # === Per-view FPS / latency overlays and trace export ===
+        self.stats_overlay_btn = QPushButton("Show Stats")
+        self.stats_overlay_btn.setCheckable(True)
+        self.stats_overlay_btn.toggled.connect(self.toggle_stats_overlays)
+        top_controls_layout.addWidget(self.stats_overlay_btn)
+        self.export_trace_btn = QPushButton("Export Trace")
+        self.export_trace_btn.clicked.connect(self.export_trace)
+        top_controls_layout.addWidget(self.export_trace_btn)
+        self.clear_trace_btn = QPushButton("Clear Trace")
+        self.clear_trace_btn.clicked.connect(self.profiler.clear)  # Starts a new recording, e.g. before a scenario
+        top_controls_layout.addWidget(self.clear_trace_btn)
+
+        # === Frame rate the 3D view tries to hold while the camera moves ===
+        self.target_fps_spin = QSpinBox()
+        self.target_fps_spin.setRange(5, 60)
+        self.target_fps_spin.setValue(15)
+        self.target_fps_spin.setSuffix(" FPS")
+        self.target_fps_spin.valueChanged.connect(self.set_target_fps)
+        top_controls_layout.addWidget(QLabel("3D Target:"))
+        top_controls_layout.addWidget(self.target_fps_spin)
+        # Depth peeling is several render passes per frame: opt-in, for GPUs that can afford it
+        self.depth_peeling_btn = QPushButton("Depth Peeling")
+        self.depth_peeling_btn.setCheckable(True)
+        self.depth_peeling_btn.toggled.connect(lambda checked: self.update_depth_peeling())
+        top_controls_layout.addWidget(self.depth_peeling_btn)
+
 
 
         # === View Area (2x2 Grid) ===
@@ -282,7 +480,18 @@ class VTIViewer(QMainWindow):
         self.renderer_3d.SetBackground(0.7, 0.7, 0.7)
         self.vtk_widget_3d.GetRenderWindow().AddRenderer(self.renderer_3d)
         self.interactor_3d = self.vtk_widget_3d.GetRenderWindow().GetInteractor()
-        self.interactor_3d.SetInteractorStyle(vtk.vtkInteractorStyleTrackballCamera())
+        self.trackball_style = vtk.vtkInteractorStyleTrackballCamera()
+        self.trackball_style.AddObserver("StartInteractionEvent", self.on_3d_interaction_start)
+        self.trackball_style.AddObserver("EndInteractionEvent", self.on_3d_interaction_end)
+        self.interactor_3d.SetInteractorStyle(self.trackball_style)
+        # Depth peeling sorts translucent meshes correctly. It is off unless enabled with the
+        # "Depth Peeling" button, and then only used at rest with a translucent mesh shown
+        self.vtk_widget_3d.GetRenderWindow().SetAlphaBitPlanes(1)
+        self.renderer_3d.SetUseDepthPeeling(0)
+        self.renderer_3d.SetMaximumNumberOfPeels(4)
+        self.frame_rate_governor = FrameRateGovernor(self.vtk_widget_3d.GetRenderWindow(),
+                                                     self.apply_3d_quality,
+                                                     target_fps=self.target_fps_spin.value())
 
         viewer3d_group = QWidget()
         viewer3d_layout = QVBoxLayout(viewer3d_group)
@@ -295,6 +504,23 @@ class VTIViewer(QMainWindow):
         # Set the three 2D views to the same light gray background
         for w in [self.slice_widget_axial, self.slice_widget_coronal, self.slice_widget_sagittal]:
             w.renderer.SetBackground(0.7, 0.7, 0.7)
+            w.render_scheduler = self.render_scheduler
+            w.profiler = self.profiler
+
+        # === Timing of renders and reslices, shown per view when the stats overlay is on ===
+        view_names = {'z': "axial", 'y': "coronal", 'x': "sagittal"}
+        self.stats_overlays = []
+        for w in [self.slice_widget_axial, self.slice_widget_coronal, self.slice_widget_sagittal]:
+            name = view_names[w.view_axis]
+            render_window = w.vtk_widget.GetRenderWindow()
+            self.profiler.observe(render_window, f"render:{name}", category="render")
+            self.profiler.observe(w.reslice, f"reslice:{name}")
+            self.stats_overlays.append(FrameStatsOverlay(w.renderer, render_window, self.profiler,
+                                                         latency_spans=(f"set_slice:{w.view_axis}", f"render:{name}")))
+        self.profiler.observe(self.vtk_widget_3d.GetRenderWindow(), "render:3d", category="render")
+        self.stats_overlay_3d = FrameStatsOverlay(self.renderer_3d, self.vtk_widget_3d.GetRenderWindow(), self.profiler,
+                                                  latency_spans=("update_slices", "show_mesh", "render:3d"))
+        self.stats_overlays.append(self.stats_overlay_3d)
 
 
         # === Add a small coordinate axis to the 3D window ===
@@ -323,6 +549,9 @@ class VTIViewer(QMainWindow):
         self.image_slice_3d_axial = vtk.vtkImageSlice()
         self.image_slice_3d_coronal = vtk.vtkImageSlice()
         self.image_slice_3d_sagittal = vtk.vtkImageSlice()
+        # Ray-cast volume shown in place of the slice planes when volume rendering is on
+        self.volume_renderer = CPUVolumeRenderer()
+        self.max_volume_render_size = 256  # Out-of-core volumes are rendered from a pyramid level this small
 
         # === Bottom Slider Control Area ===
         self.setup_controls_ui()
@@ -332,9 +561,59 @@ class VTIViewer(QMainWindow):
         self.slice_widget_axial.vtk_widget.GetRenderWindow().GetInteractor().Initialize()
         self.vtk_widget_3d.GetRenderWindow().GetInteractor().Initialize()
 
-        # Save contour objects for each slice
-        self.axial_contours_per_slice = {}  # key: slice_index, value: dict with keys: points, actor2d, actor3d, etc.
+        # Finished contours live in one array-backed store; actors are only built for what is displayed:
+        # one line actor and one marker actor for the current axial slice, one line actor for all contours in 3D
+        self.contour_store = ContourStore()
+        self.label_rasterizer = None  # Keeps a label volume on the VTI grid in sync with the contours
         self.current_axial_slice = None     # The currently displayed axial slice
+        self.current_contour_slice = None   # The axial slice the contour being drawn belongs to
+        self.slice_contours_polydata = vtk.vtkPolyData()
+        self.slice_markers_polydata = vtk.vtkPolyData()
+        self.contours_3d_polydata = vtk.vtkPolyData()
+
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInputData(self.slice_contours_polydata)
+        self.slice_contours_actor = vtk.vtkActor()
+        self.slice_contours_actor.SetMapper(mapper)
+        self.slice_contours_actor.GetProperty().SetColor(1, 1, 0)  # Yellow
+        self.slice_contours_actor.GetProperty().SetLineWidth(2)
+        self.slice_contours_actor.PickableOff()
+        self.slice_widget_axial.renderer.AddActor(self.slice_contours_actor)
+
+        self.slice_markers_actor = make_marker_actor(self.slice_markers_polydata)
+        self.slice_markers_actor.PickableOff()
+        self.slice_widget_axial.renderer.AddActor(self.slice_markers_actor)
+
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInputData(self.contours_3d_polydata)
+        self.contours_3d_actor = vtk.vtkActor()
+        self.contours_3d_actor.SetMapper(mapper)
+        self.contours_3d_actor.GetProperty().SetColor(1, 1, 0)
+        self.contours_3d_actor.GetProperty().SetLineWidth(4)
+        self.renderer_3d.AddActor(self.contours_3d_actor)
+
+        # Contours interpolated between key contours, recomputed in the background after every edit
+        self.interpolated_store = ContourStore()
+        self.interpolation_job = None
+        self.slice_interpolated_polydata = vtk.vtkPolyData()
+        self.interpolated_3d_polydata = vtk.vtkPolyData()
+
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInputData(self.slice_interpolated_polydata)
+        self.slice_interpolated_actor = vtk.vtkActor()
+        self.slice_interpolated_actor.SetMapper(mapper)
+        self.slice_interpolated_actor.GetProperty().SetColor(0, 1, 1)  # Cyan
+        self.slice_interpolated_actor.GetProperty().SetLineWidth(1)
+        self.slice_interpolated_actor.PickableOff()
+        self.slice_widget_axial.renderer.AddActor(self.slice_interpolated_actor)
+
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInputData(self.interpolated_3d_polydata)
+        self.interpolated_3d_actor = vtk.vtkActor()
+        self.interpolated_3d_actor.SetMapper(mapper)
+        self.interpolated_3d_actor.GetProperty().SetColor(0, 1, 1)
+        self.interpolated_3d_actor.GetProperty().SetLineWidth(2)
+        self.renderer_3d.AddActor(self.interpolated_3d_actor)
 
         # === Pre-store VTP files for later use ===
         self.vtp_file_list = [
@@ -343,8 +622,38 @@ class VTIViewer(QMainWindow):
             "D:/HuaweiMoveData/Users/lyxx01/Desktop/ISURE/segmentation_demo/vtp/ensemble_nc3_moved.vtp",
             "D:/HuaweiMoveData/Users/lyxx01/Desktop/ISURE/segmentation_demo/vtp/ensemble_nc4_moved.vtp"
         ]
+        # Successive steps are shown by one actor whose points are updated in place (animated if enabled)
+        self.vtp_mesh = PersistentMeshActor()
+        self.vtp_mesh.actor.GetProperty().SetColor(0.5, 0.5, 0.5) # Gray
+        self.vtp_mesh.actor.GetProperty().SetOpacity(0.3) # Opacity
+        self.mesh_transition_ms = 400
+        self.mesh_transition = None
         self.current_vtp_actor = None
+        self.section_index = None  # TriangleSliceIndex of the displayed VTP, for its outlines in the 2D views
+        self.metrics_job = None
         self.vtp_file_index = 0  # Used to control which VTP file is displayed in the current step
+        # Meshes streamed progressively by the compute service (host:port), see mesh_stream.py
+        self.compute_server = os.environ.get("SEGMENTATION_COMPUTE_SERVER", "127.0.0.1:8765")
+        self.mesh_stream = None
+        self.mesh_stream_count = 0  # Numbers the calculations so their meshes get distinct cache/LOD keys
+
+        # Ensemble uncertainty view: mean surface of all VTP members coloured by positional spread
+        self.ensemble_job = None
+        self.ensemble_paths = None  # Members the current ensemble_surface was computed from
+        self.ensemble_surface = None
+        self.ensemble_members = None  # SharedTopologyEnsemble of the members behind ensemble_surface
+        self.ensemble_actor = None
+        self.ensemble_scalar_bar = None
+
+        # Decoded VTP steps are kept in a size-bounded LRU cache and prefetched on worker threads
+        self.vtp_cache = PolyDataLRUCache(max_bytes=256 * 1024 * 1024)
+        # Decimated levels of each decoded mesh are built in the background and shown while the camera moves
+        self.mesh_lod = MeshLODBuilder()
+        self.current_vtp_path = None
+        self.vtp_step_request = None  # Future of the VTP step waiting to be shown
+        self.vtp_prefetcher = VTPPrefetcher(self.vtp_file_list, cache=self.vtp_cache, lookahead=2,
+                                            on_loaded=self.mesh_lod.request,
+                                            geometry_cache=GeometryCache())
 
 
     def setup_controls_ui(self):
@@ -391,10 +700,14 @@ class VTIViewer(QMainWindow):
         sagittal_layout.addWidget(self.label_sagittal_value)
         layout.addRow("Sagittal (X):", sagittal_layout)
 
+        # Contours vs. the displayed VTP, refreshed after each step
+        self.metrics_label = QLabel("N/A")
+        layout.addRow("Agreement:", self.metrics_label)
+
         # Connect slider signals
-        self.slider_axial.valueChanged.connect(self.update_slices)
-        self.slider_coronal.valueChanged.connect(self.update_slices)
-        self.slider_sagittal.valueChanged.connect(self.update_slices)
+        self.slider_axial.valueChanged.connect(lambda value: self.update_slices())
+        self.slider_coronal.valueChanged.connect(lambda value: self.update_slices())
+        self.slider_sagittal.valueChanged.connect(lambda value: self.update_slices())
         self.controls_group.setEnabled(False)
 
     def show_actual_rotation_center_marker(self):
@@ -429,7 +742,7 @@ class VTIViewer(QMainWindow):
         self.renderer_3d.AddActor(actor)
         self._actual_rotation_center_actor = actor
 
-        self.vtk_widget_3d.GetRenderWindow().Render()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
 
 
 
@@ -441,30 +754,141 @@ class VTIViewer(QMainWindow):
         if file_path:
             self.load_vti(file_path)
 
+    @profiled("io")
     def load_vti(self, file_path):
-        """Loads a VTI file and initializes all views."""
-        reader = vtk.vtkXMLImageDataReader()
-        reader.SetFileName(file_path)
-        reader.Update()
-        self.image_data = reader.GetOutput()
+        """Starts reading a VTI file in the background; the views are initialized once it is loaded."""
+        if self.vti_load_job is not None and not self.vti_load_job.done:
+            self.vti_load_job.cancel()
+
+        out_of_core_bytes = 0 if self.out_of_core_btn.isChecked() else self.out_of_core_threshold_bytes
+        self.vti_load_job = VolumeLoadJob(file_path, out_of_core_bytes=out_of_core_bytes,
+                                          profiler=self.profiler).start()
+        self.vti_load_started = time.perf_counter()
+
+        self.load_progress = QProgressDialog("Loading VTI...", "Cancel", 0, 100, self)
+        self.load_progress.setWindowTitle("Loading")
+        self.load_progress.setAutoClose(True)
+        self.load_progress.canceled.connect(self.vti_load_job.cancel)
+        self.load_progress.show()
+
+        self.poll_vti_load(self.vti_load_job)
+
+    def poll_vti_load(self, job):
+        """Forwards the background load's progress and slice previews to the GUI until it finishes."""
+        if job is not self.vti_load_job:
+            return  # Superseded by a newer load
+
+        # Show the middle slices as soon as they have been read
+        for axis, preview in job.take_previews().items():
+            self.show_slice_preview(axis, preview)
+
+        if not job.done:
+            self.load_progress.setValue(int(job.progress * 100))
+            QTimer.singleShot(50, lambda: self.poll_vti_load(job))
+            return
 
-        if not self.image_data:
+        self.load_progress.canceled.disconnect()  # Closing the dialog would otherwise emit canceled
+        self.load_progress.close()
+        if job.cancelled:
+            self.restore_slice_views()
+            return
+        if job.error is not None or job.image_data is None:
+            self.restore_slice_views()
             QMessageBox.critical(self, "Error", "Failed to load VTI file.")
             return
+        self.on_vti_loaded(job.image_data, volume=job.volume)
+        self.profiler.add_span("load_vti_total", self.vti_load_started, time.perf_counter(), "io")
+
+    def show_slice_preview(self, axis, preview):
+        """Displays a single-slice image read ahead of the full volume in the matching 2D view.
 
-        scalar_range = self.image_data.GetScalarRange()
+        Only the view's displayed image is replaced: its slice cache (and the
+        sliders) keep serving the previous volume until the new one is loaded.
+        """
+        widget = {'z': self.slice_widget_axial,
+                  'y': self.slice_widget_coronal,
+                  'x': self.slice_widget_sagittal}[axis]
+        scalar_range = preview.GetScalarRange()
+        window = scalar_range[1] - scalar_range[0]
+        if window == 0: window = 1.0
+        voxels = volume_voxels(preview)
+        values = {'z': voxels[0], 'y': voxels[:, 0], 'x': voxels[:, :, 0]}[axis]
+        in_plane = {'z': (0, 1), 'y': (0, 2), 'x': (1, 2)}[axis]
+        widget.camera_reset_done = False
+        widget.set_color_window(window)
+        widget.set_color_level((scalar_range[0] + scalar_range[1]) / 2.0)
+        widget.set_coarse_slice(view_slice_image(values, preview.GetExtent(), preview.GetOrigin(),
+                                                 preview.GetSpacing(), in_plane))
+
+    def restore_slice_views(self):
+        """Puts the current volume's slices and window/level back after a load that showed previews failed."""
+        if not self.image_data:
+            return
+        property_3d = self.image_slice_3d_axial.GetProperty()
+        for axis, widget in (('z', self.slice_widget_axial), ('y', self.slice_widget_coronal),
+                             ('x', self.slice_widget_sagittal)):
+            if axis in self.displayed_slices:
+                widget.camera_reset_done = False
+                widget.set_slice(self.displayed_slices[axis])
+        self.set_window_level(property_3d.GetColorWindow(), property_3d.GetColorLevel())
+
+    @profiled("io")
+    def on_vti_loaded(self, image_data, volume=None):
+        """Initializes all views with a loaded volume (or the geometry of an out-of-core one)."""
+        self.image_data = image_data
+        self.volume = volume
+        self.displayed_slices = {}
+
+        # Axis-aligned voxels as a (nz, ny, nx) array, if the volume can be indexed directly
+        voxels = None
+        if self.volume is not None:
+            voxels = self.volume.array
+        elif image_data.GetPointData().GetScalars() and image_data.GetDirectionMatrix().IsIdentity():
+            voxels = volume_voxels(image_data)
+
+        # Start from the range of the middle slices; the statistics index refines window/level later
+        if self.volume is not None:
+            scalar_range = self.volume.scalar_range
+        elif voxels is not None:
+            scalar_range = middle_slices_range(voxels)
+        else:
+            scalar_range = self.image_data.GetScalarRange()
+        if self.volume_stats is not None:
+            self.volume_stats.cancel()
+        self.volume_stats = None
+        self.window_preset_combo.setEnabled(False)
+        if voxels is not None:
+            self.volume_stats = VolumeStatistics(voxels, self.image_data.GetExtent()).start()
+            QTimer.singleShot(100, lambda: self.poll_volume_stats(self.volume_stats))
         window = scalar_range[1] - scalar_range[0]
         level = (scalar_range[0] + scalar_range[1]) / 2.0
         if window == 0: window = 1.0
 
         # --- Initialize 2D views ---
         for widget in [self.slice_widget_axial, self.slice_widget_coronal, self.slice_widget_sagittal]:
-            widget.set_input_data(self.image_data)
+            if self.volume is not None:
+                widget.set_voxels(self.volume.array, self.volume.extent, self.volume.origin, self.volume.spacing)
+            else:
+                widget.set_input_data(self.image_data)
             widget.set_color_window(window)
             widget.set_color_level(level)
+
+        # --- Build the coarse levels shown while scrolling in the background ---
+        if self.volume_pyramid is not None:
+            self.volume_pyramid.cancel()
+        self.volume_pyramid = None
+        self.coarse_axes = set()
+        if voxels is not None:
+            if voxels.shape[0] * voxels.shape[1] * voxels.shape[2] > self.pyramid_min_voxels:
+                self.volume_pyramid = VolumePyramid(voxels, self.image_data.GetExtent(),
+                                                    self.image_data.GetOrigin(), self.image_data.GetSpacing()).start()
         
         # --- Initialize slices in the 3D view ---
+        extent = self.image_data.GetExtent()
+        self.ensemble_btn.setChecked(False)
+        self.volume_render_btn.setChecked(False)
         self.renderer_3d.RemoveAllViewProps()
+        self.renderer_3d.AddViewProp(self.stats_overlay_3d.text_actor)
         slice_mappers_3d = {
             'axial': vtk.vtkImageSliceMapper(),
             'coronal': vtk.vtkImageSliceMapper(),
@@ -473,28 +897,33 @@ class VTIViewer(QMainWindow):
         
         slice_mappers_3d['axial'].SetOrientation(2)
         self.image_slice_3d_axial.SetMapper(slice_mappers_3d['axial'])
-        slice_mappers_3d['axial'].SetInputData(self.image_data)
+        slice_mappers_3d['axial'].SetInputData(self.slice_input('z', (extent[4] + extent[5]) // 2))
         self.image_slice_3d_axial.GetProperty().SetColorWindow(window)
         self.image_slice_3d_axial.GetProperty().SetColorLevel(level)
 
         slice_mappers_3d['coronal'].SetOrientation(1)
         self.image_slice_3d_coronal.SetMapper(slice_mappers_3d['coronal'])
-        slice_mappers_3d['coronal'].SetInputData(self.image_data)
+        slice_mappers_3d['coronal'].SetInputData(self.slice_input('y', (extent[2] + extent[3]) // 2))
         self.image_slice_3d_coronal.GetProperty().SetColorWindow(window)
         self.image_slice_3d_coronal.GetProperty().SetColorLevel(level)
 
         slice_mappers_3d['sagittal'].SetOrientation(0)
         self.image_slice_3d_sagittal.SetMapper(slice_mappers_3d['sagittal'])
-        slice_mappers_3d['sagittal'].SetInputData(self.image_data)
+        slice_mappers_3d['sagittal'].SetInputData(self.slice_input('x', (extent[0] + extent[1]) // 2))
         self.image_slice_3d_sagittal.GetProperty().SetColorWindow(window)
         self.image_slice_3d_sagittal.GetProperty().SetColorLevel(level)
 
         self.renderer_3d.AddActor(self.image_slice_3d_axial)
         self.renderer_3d.AddActor(self.image_slice_3d_coronal)
         self.renderer_3d.AddActor(self.image_slice_3d_sagittal)
+        self.renderer_3d.AddActor(self.contours_3d_actor)
+        self.renderer_3d.AddActor(self.interpolated_3d_actor)
+        self.refresh_contour_actors()
+
+        self.label_rasterizer = ContourRasterizer(self.image_data)
+        self.update_label_volume()
 
         # --- Initialize sliders ---
-        extent = self.image_data.GetExtent()
         self.slider_sagittal.setRange(extent[0], extent[1])
         self.slider_coronal.setRange(extent[2], extent[3])
         self.slider_axial.setRange(extent[4], extent[5])
@@ -526,47 +955,64 @@ class VTIViewer(QMainWindow):
 
 
         self.renderer_3d.ResetCameraClippingRange()
-        self.vtk_widget_3d.GetRenderWindow().Render()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
 
         # self.show_actual_rotation_center_marker()  # Show the small sphere for the actual rotation center
 
 
 
+    def slice_input(self, axis, slice_index):
+        """Returns the image a 3D slice mapper reads for a slice (just that slice when out-of-core)."""
+        if self.volume is not None:
+            return self.volume.slice_image(axis, slice_index)
+        return self.image_data
+
+    @profiled("slices")
     def update_slices(self):
         if not self.image_data:
             return
 
-        prev_axial = getattr(self, "current_axial_slice", None)
+        if self.skip_empty_btn.isChecked() and self.volume_stats is not None and self.volume_stats.ready:
+            self.skip_empty_slices()
+
         axial_slice = self.slider_axial.value()
         coronal_slice = self.slider_coronal.value()
         sagittal_slice = self.slider_sagittal.value()
         self.current_axial_slice = axial_slice
 
-        # --------- 1. In the 2D window, hide the contours and cubes from the previous slice only ---------
-        if prev_axial is not None:
-            contour_list = self.axial_contours_per_slice.get(prev_axial, [])
-            for contour_info in contour_list:
-                if contour_info.get('actor2d'):
-                    self.slice_widget_axial.renderer.RemoveActor(contour_info['actor2d'])
-                for cube in contour_info.get('cube_actors', []):
-                    self.slice_widget_axial.renderer.RemoveActor(cube)
-        # Do nothing in the 3D window (do not remove actors)
-
-        # --------- 2. Update slice rendering ---------
-        self.slice_widget_axial.set_slice(axial_slice)
-        self.slice_widget_coronal.set_slice(coronal_slice)
-        self.slice_widget_sagittal.set_slice(sagittal_slice)
-
-        # --------- 3. In the 2D window, add the contours and cubes for the current slice only ---------
-        contour_list = self.axial_contours_per_slice.get(axial_slice, [])
-        for contour_info in contour_list:
-            if contour_info.get('actor2d'):
-                self.slice_widget_axial.renderer.AddActor(contour_info['actor2d'])
-            for cube in contour_info.get('cube_actors', []):
-                self.slice_widget_axial.renderer.AddActor(cube)
-        # Do nothing in the 3D window (actors have already been added permanently)
-
-        # --------- 4. Update physical coordinate labels ---------
+        # Only the views whose slice actually changed are resliced and redrawn
+        slices = {'z': axial_slice, 'y': coronal_slice, 'x': sagittal_slice}
+        changed = [axis for axis, index in slices.items() if self.displayed_slices.get(axis) != index]
+        if not changed:
+            return
+        self.displayed_slices.update(slices)
+        slice_widgets = {'z': self.slice_widget_axial, 'y': self.slice_widget_coronal, 'x': self.slice_widget_sagittal}
+        slices_3d = {'z': self.image_slice_3d_axial, 'y': self.image_slice_3d_coronal, 'x': self.image_slice_3d_sagittal}
+
+        # While a slider is dragged (or ticks arrive in quick succession) show a coarse pyramid level
+        now = time.perf_counter()
+        scrolling = (now - self.last_slice_change < self.refine_timer.interval() / 1000.0
+                     or any(slider.isSliderDown() for slider in (self.slider_axial, self.slider_coronal, self.slider_sagittal)))
+        self.last_slice_change = now
+        coarse_level = None
+        if scrolling and self.volume_pyramid is not None:
+            coarse_level = self.volume_pyramid.level_for(self.coarse_slice_size)
+
+        # --------- 1. Update slice rendering ---------
+        for axis in changed:
+            if coarse_level is not None:
+                slice_widgets[axis].set_coarse_slice(
+                    self.volume_pyramid.slice_view_image(coarse_level, axis, slices[axis]))
+            else:
+                slice_widgets[axis].set_slice(slices[axis])
+
+        # --------- 2. In the 2D window, show the contours and markers of the current slice only ---------
+        if 'z' in changed:
+            self.refresh_contour_actors(include_3d=False)
+        self.update_mesh_sections(changed)
+        # The 3D window keeps showing all contours
+
+        # --------- 3. Update physical coordinate labels ---------
         origin = self.image_data.GetOrigin()
         spacing = self.image_data.GetSpacing()
         axial_coord = origin[2] + axial_slice * spacing[2]
@@ -576,19 +1022,89 @@ class VTIViewer(QMainWindow):
         self.label_coronal_value.setText(f"{coronal_coord:.2f} (slice: {coronal_slice})")
         self.label_sagittal_value.setText(f"{sagittal_coord:.2f} (slice: {sagittal_slice})")
 
-        self.image_slice_3d_axial.GetMapper().SetSliceNumber(axial_slice)
-        self.image_slice_3d_coronal.GetMapper().SetSliceNumber(coronal_slice)
-        self.image_slice_3d_sagittal.GetMapper().SetSliceNumber(sagittal_slice)
-
+        for axis in changed:
+            mapper = slices_3d[axis].GetMapper()
+            if coarse_level is not None:
+                mapper.SetInputData(self.volume_pyramid.slice_volume_image(coarse_level, axis, slices[axis]))
+                self.coarse_axes.add(axis)
+            elif self.volume is not None or axis in self.coarse_axes:
+                # Out-of-core: the 3D slice mappers only hold the displayed slices
+                mapper.SetInputData(self.slice_input(axis, slices[axis]))
+                self.coarse_axes.discard(axis)
+            mapper.SetSliceNumber(slices[axis])
+        if self.coarse_axes:
+            self.refine_timer.start()
+
+        # set_slice() already requested the changed 2D views; the 3D view is drawn once with them
         self.renderer_3d.ResetCameraClippingRange()
-        self.slice_widget_axial.vtk_widget.GetRenderWindow().Render()
-        self.slice_widget_coronal.vtk_widget.GetRenderWindow().Render()
-        self.slice_widget_sagittal.vtk_widget.GetRenderWindow().Render()
-        self.vtk_widget_3d.GetRenderWindow().Render()
-
-
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def skip_empty_slices(self):
+        """Moves sliders that landed on a constant slice on to the next slice with data, in the scroll direction."""
+        sliders = {'z': self.slider_axial, 'y': self.slider_coronal, 'x': self.slider_sagittal}
+        for axis, slider in sliders.items():
+            index = slider.value()
+            if not self.volume_stats.is_empty(axis, index):
+                continue
+            direction = -1 if index < self.displayed_slices.get(axis, index) else 1
+            target = self.volume_stats.nearest_nonempty(axis, index, direction)
+            if target != index:
+                slider.blockSignals(True)  # update_slices() is already running
+                slider.setValue(target)
+                slider.blockSignals(False)
+
+    def poll_volume_stats(self, stats):
+        """Applies the histogram-based window/level once the statistics index has been built."""
+        if stats is not self.volume_stats:
+            return
+        if not stats.done:
+            QTimer.singleShot(100, lambda: self.poll_volume_stats(stats))
+            return
+        if stats.error is not None:
+            print(f"Volume statistics failed: {stats.error}")
+            return
+        if not stats.ready:
+            return
+        self.window_preset_combo.setEnabled(True)
+        self.apply_window_preset(self.window_preset_combo.currentText())
+        if self.skip_empty_btn.isChecked():
+            self.update_slices()
 
+    def apply_window_preset(self, preset):
+        if self.volume_stats is None or not self.volume_stats.ready:
+            return
+        self.set_window_level(*self.volume_stats.window_level(preset))
 
+    def set_window_level(self, window, level):
+        """Applies a window/level to all 2D views and the 3D slice planes."""
+        for widget in (self.slice_widget_axial, self.slice_widget_coronal, self.slice_widget_sagittal):
+            widget.set_color_window(window)
+            widget.set_color_level(level)
+            widget.request_render()
+        for image_slice in (self.image_slice_3d_axial, self.image_slice_3d_coronal, self.image_slice_3d_sagittal):
+            image_slice.GetProperty().SetColorWindow(window)
+            image_slice.GetProperty().SetColorLevel(level)
+        self.update_volume_rendering_property()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    @profiled("slices")
+    def refine_slices(self):
+        """Replaces the coarse slices shown while scrolling with full-resolution ones."""
+        slice_widgets = {'z': self.slice_widget_axial, 'y': self.slice_widget_coronal, 'x': self.slice_widget_sagittal}
+        slices_3d = {'z': self.image_slice_3d_axial, 'y': self.image_slice_3d_coronal, 'x': self.image_slice_3d_sagittal}
+        for axis in self.coarse_axes:
+            slice_index = self.displayed_slices[axis]
+            slice_widgets[axis].set_slice(slice_index)
+            mapper = slices_3d[axis].GetMapper()
+            mapper.SetInputData(self.slice_input(axis, slice_index))
+            mapper.SetSliceNumber(slice_index)
+        self.coarse_axes.clear()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+
+
+
+    @profiled("contours")
     def toggle_drawing(self, checked):
         """Toggles drawing mode."""
         self.is_drawing = checked
@@ -605,16 +1121,16 @@ class VTIViewer(QMainWindow):
 
         if self.is_drawing:
             self.draw_btn.setText("Finish Drawing")
-            self.current_contour_points = vtk.vtkPoints()
-            self.current_contour_cubes = []  # <--- New: Used to store the small cube actors for the current contour
-
-            self.polydata_2d = vtk.vtkPolyData()
-            self.polydata_2d.SetPoints(self.current_contour_points)
-            self.polydata_2d.SetLines(vtk.vtkCellArray())
-            self.polydata_2d.SetPolys(vtk.vtkCellArray())
+            spacing = self.image_data.GetSpacing() if self.image_data else [1, 1, 1]
+            origin = self.image_data.GetOrigin() if self.image_data else [0, 0, 0]
+            self.current_contour_slice = self.slider_axial.value()
+            slice_z = origin[2] + self.current_contour_slice * spacing[2]
+            # The slice view shows the image at z = 0; draw the 2D contour just in front of it
+            self.current_contour = IncrementalContour(slice_z, display_z=spacing[2],
+                                                      sample_spacing=min(spacing[0], spacing[1]))
 
             mapper2d = vtk.vtkPolyDataMapper()
-            mapper2d.SetInputData(self.polydata_2d)
+            mapper2d.SetInputData(self.current_contour.polydata_2d)
             self.current_contour_actor_2d = vtk.vtkActor()
             self.current_contour_actor_2d.SetMapper(mapper2d)
             self.current_contour_actor_2d.GetProperty().SetColor(1, 1, 0)  # Yellow
@@ -622,11 +1138,23 @@ class VTIViewer(QMainWindow):
             self.current_contour_actor_2d.PickableOff()
             self.slice_widget_axial.renderer.AddActor(self.current_contour_actor_2d)
 
-            self.polydata_3d = vtk.vtkPolyData()
-            self.polydata_3d.DeepCopy(self.polydata_2d)
+            # All control points of the contour are drawn by one glyph actor
+            self.current_contour_marker_actor = make_marker_actor(self.current_contour.markers)
+            self.current_contour_marker_actor.PickableOff()
+            self.slice_widget_axial.renderer.AddActor(self.current_contour_marker_actor)
+
+            # Rubber band to the cursor, showing where the next segment would go
+            preview_mapper = vtk.vtkPolyDataMapper()
+            preview_mapper.SetInputData(self.current_contour.preview_2d)
+            self.current_contour_preview_actor = vtk.vtkActor()
+            self.current_contour_preview_actor.SetMapper(preview_mapper)
+            self.current_contour_preview_actor.GetProperty().SetColor(1, 0.5, 0)  # Orange
+            self.current_contour_preview_actor.GetProperty().SetLineWidth(1)
+            self.current_contour_preview_actor.PickableOff()
+            self.slice_widget_axial.renderer.AddActor(self.current_contour_preview_actor)
 
             mapper3d = vtk.vtkPolyDataMapper()
-            mapper3d.SetInputData(self.polydata_3d)
+            mapper3d.SetInputData(self.current_contour.polydata_3d)
             self.current_contour_actor_3d = vtk.vtkActor()
             self.current_contour_actor_3d.SetMapper(mapper3d)
             self.current_contour_actor_3d.GetProperty().SetColor(1, 1, 0)
@@ -635,145 +1163,237 @@ class VTIViewer(QMainWindow):
 
         else:
             self.draw_btn.setText("Start Drawing Contour")
-            if self.current_contour_points and self.current_contour_points.GetNumberOfPoints() > 0:
+            if self.current_contour and len(self.current_contour.control_points) > 0:
                 # --------- Storing multiple contours ----------
-                if self.current_axial_slice not in self.axial_contours_per_slice:
-                    self.axial_contours_per_slice[self.current_axial_slice] = []
-                self.axial_contours_per_slice[self.current_axial_slice].append({
-                    'points': self.current_contour_points,
-                    'actor2d': self.current_contour_actor_2d,
-                    'actor3d': self.current_contour_actor_3d,
-                    'cube_actors': self.current_contour_cubes,  # <--- New
-                })
-            self.current_contour_points = None
+                # Only the control points are kept; the drawing actors are replaced by the shared ones
+                self.contour_store.add(self.current_contour_slice, self.current_contour.slice_z,
+                                       self.current_contour.control_points)
+                self.start_contour_interpolation()
+            for actor in [self.current_contour_actor_2d, self.current_contour_marker_actor,
+                          self.current_contour_preview_actor]:
+                if actor:
+                    self.slice_widget_axial.renderer.RemoveActor(actor)
+            if self.current_contour_actor_3d:
+                self.renderer_3d.RemoveActor(self.current_contour_actor_3d)
+            self.refresh_contour_actors()
+            self.current_contour = None
             self.current_contour_actor_2d = None
             self.current_contour_actor_3d = None
-            self.current_contour_cubes = []  # <--- New
+            self.current_contour_marker_actor = None
+            self.current_contour_preview_actor = None
+            self.update_label_volume()
+
+
+
+
+    @profiled("contours")
+    def refresh_contour_actors(self, include_3d=True):
+        """Rebuilds the shared contour actors' geometry from the contour store."""
+        spacing = self.image_data.GetSpacing() if self.image_data else [1, 1, 1]
+        sample_spacing = min(spacing[0], spacing[1])
+        display_z = spacing[2]  # Just in front of the slice view's image plane, as while drawing
+
+        ids = self.contour_store.contours_on_slice(self.current_axial_slice)
+        control = [self.contour_store.control_points(i) for i in ids]
+        curves = [sample_closed_contour(points, sample_spacing) for points in control]
+        self.slice_contours_polydata.ShallowCopy(closed_polylines(curves, [display_z] * len(curves)))
+        self.slice_markers_polydata.ShallowCopy(
+            marker_points(np.concatenate(control) if control else np.empty((0, 2)), display_z))
+        self.slice_widget_axial.request_render()
+
+        ids = self.interpolated_store.contours_on_slice(self.current_axial_slice)
+        curves = [sample_closed_contour(self.interpolated_store.control_points(i), sample_spacing) for i in ids]
+        self.slice_interpolated_polydata.ShallowCopy(closed_polylines(curves, [display_z] * len(curves)))
+
+        if include_3d:
+            for store, polydata in ((self.contour_store, self.contours_3d_polydata),
+                                    (self.interpolated_store, self.interpolated_3d_polydata)):
+                curves = [sample_closed_contour(store.control_points(i), sample_spacing) for i in range(len(store))]
+                polydata.ShallowCopy(closed_polylines(curves, store.slice_z))
+            self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def start_contour_interpolation(self):
+        """Recomputes the contours between key slices on a worker thread (or clears them when disabled)."""
+        if not self.interpolate_btn.isChecked():
+            self.interpolation_job = None
+            if len(self.interpolated_store) > 0:
+                self.interpolated_store.clear()
+                self.set_interpolated_store(self.interpolated_store)
+            return
+        spacing = self.image_data.GetSpacing() if self.image_data else [1, 1, 1]
+        self.interpolation_job = ContourInterpolationJob(self.contour_store,
+                                                         sample_spacing=min(spacing[0], spacing[1])).start()
+        QTimer.singleShot(10, lambda: self.poll_contour_interpolation(self.interpolation_job))
+
+    def poll_contour_interpolation(self, job):
+        if job is not self.interpolation_job:
+            return
+        if not job.done:
+            QTimer.singleShot(10, lambda: self.poll_contour_interpolation(job))
+            return
+        self.interpolation_job = None
+        if job.error is not None:
+            print(f"Contour interpolation failed: {job.error}")
+            return
+        if job.version == self.contour_store.version:  # Otherwise a newer job is already running
+            self.set_interpolated_store(job.result)
 
+    def set_interpolated_store(self, store):
+        self.interpolated_store = store
+        self.refresh_contour_actors()
+        self.update_label_volume()
 
+    def save_contours(self):
+        """Saves all finished contours to a binary .npz annotation file."""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Contours", "", "Contour Files (*.npz)")
+        if file_path:
+            self.contour_store.save(file_path)
 
+    def load_contours(self):
+        """Replaces the current contours with those of a saved annotation file."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Load Contours", "", "Contour Files (*.npz)")
+        if file_path:
+            self.contour_store.load(file_path)
+            self.start_contour_interpolation()
+            self.refresh_contour_actors()
+            self.update_label_volume()
+
+    @profiled("contours")
+    def update_label_volume(self):
+        """Re-rasterizes the slices whose contours changed, including the contour being drawn."""
+        if self.label_rasterizer is None:
+            return
+        pending = None
+        if self.current_contour is not None and len(self.current_contour.control_points) >= 3:
+            pending = (self.current_contour_slice, self.current_contour.control_points)
+        self.label_rasterizer.update(self.contour_store, pending, self.interpolated_store)
+
+    def export_label_volume(self):
+        """Writes the label volume rasterized from the contours as a .vti file."""
+        if self.label_rasterizer is None:
+            QMessageBox.warning(self, "Warning", "Please load a VTI file first!")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Mask", "", "VTI Files (*.vti)")
+        if file_path:
+            self.update_label_volume()
+            try:
+                write_vti(self.label_rasterizer.label_image, file_path)
+            except IOError as e:
+                QMessageBox.critical(self, "Error", str(e))
 
+    @profiled("contours")
     def add_contour_point(self, pos):
-        if not self.is_drawing or not self.current_contour_points:
+        if not self.is_drawing or not self.current_contour:
             return
 
-        spacing = self.image_data.GetSpacing() if self.image_data else [1, 1, 1]
-        origin = self.image_data.GetOrigin() if self.image_data else [0, 0, 0]
-        current_slice = self.slider_axial.value()
-        slice_z = origin[2] + current_slice * spacing[2]
-        contour_z_2d = slice_z + spacing[2] * 20  # Z-offset for 2D visualization to prevent z-fighting
-
-        # 1. Store the original point in self.current_contour_points
-        self.current_contour_points.InsertNextPoint(pos)
-        num_points = self.current_contour_points.GetNumberOfPoints()
-
-        # 2. Refresh the 2D contour (smooth, closed, with a z-offset)
-        if num_points >= 2:
-            spline2d = vtk.vtkParametricSpline()
-            points_2d = vtk.vtkPoints()
-            for i in range(num_points):
-                pt = self.current_contour_points.GetPoint(i)
-                points_2d.InsertNextPoint(pt[0], pt[1], contour_z_2d)
-            points_2d.InsertNextPoint(self.current_contour_points.GetPoint(0)[0],
-                                    self.current_contour_points.GetPoint(0)[1],
-                                    contour_z_2d)  # Close the loop
-            spline2d.SetPoints(points_2d)
-            splineSource2d = vtk.vtkParametricFunctionSource()
-            splineSource2d.SetParametricFunction(spline2d)
-            splineSource2d.SetUResolution(200)
-            splineSource2d.Update()
-            self.polydata_2d.ShallowCopy(splineSource2d.GetOutput())
-        else:
-            points_2d = vtk.vtkPoints()
-            pt = self.current_contour_points.GetPoint(0)
-            points_2d.InsertNextPoint(pt[0], pt[1], contour_z_2d)
-            self.polydata_2d.SetPoints(points_2d)
-            self.polydata_2d.SetLines(vtk.vtkCellArray())
-            self.polydata_2d.SetPolys(vtk.vtkCellArray())
-        self.polydata_2d.Modified()
-
-        # The 2D line actor refreshes automatically; no need to re-add (it was added during initialization)
-
-        # 2D cube
-        cube = vtk.vtkCubeSource()
-        size = 2
-        cube.SetCenter(pos[0], pos[1], contour_z_2d)
-        cube.SetXLength(size)
-        cube.SetYLength(size)
-        cube.SetZLength(size)
-        cube.Update()
-        cube_mapper = vtk.vtkPolyDataMapper()
-        cube_mapper.SetInputConnection(cube.GetOutputPort())
-        cube_actor = vtk.vtkActor()
-        cube_actor.SetMapper(cube_mapper)
-        cube_actor.GetProperty().SetColor(1, 0, 0)
-        cube_actor.GetProperty().SetOpacity(1.0)
-        self.slice_widget_axial.renderer.AddActor(cube_actor)
-        self.current_contour_cubes.append(cube_actor)
-
-        # 3. Refresh the 3D contour (smooth, closed, at the physical Z coordinate)
-        if num_points >= 2:
-            spline3d = vtk.vtkParametricSpline()
-            points_3d = vtk.vtkPoints()
-            for i in range(num_points):
-                pt = self.current_contour_points.GetPoint(i)
-                points_3d.InsertNextPoint(pt[0], pt[1], slice_z)
-            points_3d.InsertNextPoint(self.current_contour_points.GetPoint(0)[0],
-                                    self.current_contour_points.GetPoint(0)[1],
-                                    slice_z)  # Close the loop
-            spline3d.SetPoints(points_3d)
-            splineSource3d = vtk.vtkParametricFunctionSource()
-            splineSource3d.SetParametricFunction(spline3d)
-            splineSource3d.SetUResolution(200)
-            splineSource3d.Update()
-            self.polydata_3d.ShallowCopy(splineSource3d.GetOutput())
-        else:
-            points_3d = vtk.vtkPoints()
-            pt = self.current_contour_points.GetPoint(0)
-            points_3d.InsertNextPoint(pt[0], pt[1], slice_z)
-            self.polydata_3d.SetPoints(points_3d)
-            self.polydata_3d.SetLines(vtk.vtkCellArray())
-            self.polydata_3d.SetPolys(vtk.vtkCellArray())
-        self.polydata_3d.Modified()
+        # Only the segments next to the new point are re-sampled; the glyph actor picks up the new marker
+        self.current_contour.append(pos[0], pos[1])
+        self.current_contour.set_preview(pos[0], pos[1])
+        self.update_label_volume()
 
         # Refresh the display
         self.slice_widget_axial.renderer.ResetCameraClippingRange()
-        self.slice_widget_axial.vtk_widget.GetRenderWindow().Render()
-        self.vtk_widget_3d.GetRenderWindow().Render()
+        self.slice_widget_axial.request_render()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
 
+    def update_contour_preview(self, pos):
+        """Moves the rubber band of the contour being drawn to the cursor (called on every mouse move)."""
+        if self.current_contour is None:
+            return
+        self.current_contour.set_preview(pos[0], pos[1])
+        self.slice_widget_axial.request_render()
 
     def clear_current_contour(self):
         """Clears the contour currently being drawn."""
         if self.current_contour_actor_2d:
             self.slice_widget_axial.renderer.RemoveActor(self.current_contour_actor_2d)
+        if self.current_contour_marker_actor:
+            self.slice_widget_axial.renderer.RemoveActor(self.current_contour_marker_actor)
+        if self.current_contour_preview_actor:
+            self.slice_widget_axial.renderer.RemoveActor(self.current_contour_preview_actor)
         if self.current_contour_actor_3d:
             self.renderer_3d.RemoveActor(self.current_contour_actor_3d)
 
-        self.slice_widget_axial.vtk_widget.GetRenderWindow().Render()
-        self.vtk_widget_3d.GetRenderWindow().Render()
+        self.slice_widget_axial.request_render()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
         
-        self.current_contour_points = None
+        self.current_contour = None
         self.current_contour_actor_2d = None
         self.current_contour_actor_3d = None
+        self.current_contour_marker_actor = None
+        self.current_contour_preview_actor = None
+        self.update_label_volume()
         
         if self.is_drawing:
             self.draw_btn.setChecked(False)
             self.toggle_drawing(False)
-        
-        for actor in getattr(self, 'contour_point_actors_2d', []):
-            self.slice_widget_axial.renderer.RemoveActor(actor)
-        self.contour_point_actors_2d = []
     
     def on_calculate(self):
         # 1. Check if the contour drawing is complete
         # It's sufficient if the current slice has at least one contour
-        contour_list = self.axial_contours_per_slice.get(self.current_axial_slice, [])
-        if not contour_list:
+        if not self.contour_store.contours_on_slice(self.current_axial_slice):
             QMessageBox.warning(self, "Warning", "Please draw and finish at least one contour on the current slice before clicking Calculate!")
             return
 
 
-        # 2. Display a progress bar (simulating a calculation)
+        # Decode the upcoming VTP steps in the background while the calculation runs
+        self.vtp_prefetcher.prefetch(self.vtp_file_index)
+
+        # 2. Display a progress bar, driven by the compute service's progress frames
+        self.progress = QProgressDialog("Calculating...", None, 0, 100, self)
+        self.progress.setWindowTitle("Processing")
+        self.progress.setWindowModality(Qt.WindowModal)
+        self.progress.setAutoClose(True)
+        self.progress.setCancelButton(None)
+        self.progress.show()
+
+        # 3. Ask the compute service for the result; each intermediate mesh is shown as soon as it arrives
+        if self.mesh_stream is not None:
+            self.mesh_stream.cancel()
+        host, _, port = self.compute_server.rpartition(":")
+        request = {
+            'image': self.vti_load_job.file_path if self.vti_load_job else None,
+            'contours': {str(z): [self.contour_store.control_points(i).tolist()
+                                  for i in self.contour_store.contours_on_slice(z)]
+                         for z in self.contour_store.annotated_slices()},
+        }
+        self.mesh_stream_count += 1
+        self.mesh_stream = MeshStreamClient(host or "127.0.0.1", int(port), request).start()
+        QTimer.singleShot(50, lambda: self.poll_mesh_stream(self.mesh_stream))
+
+    def poll_mesh_stream(self, client):
+        """Drains the stream's events: progress updates the dialog, meshes are displayed right away."""
+        if client is not self.mesh_stream:
+            return
+        while not client.events.empty():
+            kind, step, value = client.events.get()
+            if kind == 'progress':
+                fraction, message = value
+                self.progress.setLabelText(f"Calculating... {message}")
+                self.progress.setValue(int(100 * fraction))
+            elif kind == 'mesh':
+                key = f"stream:{self.mesh_stream_count}:{step}"
+                self.vtp_cache.put(key, value)
+                self.show_mesh(value, key)
+            elif kind == 'done':
+                self.progress.setValue(100)
+                self.progress.close()
+                self.mesh_stream = None
+                return
+            elif kind == 'error':
+                self.progress.close()
+                self.mesh_stream = None
+                if not client.connected:
+                    print(f"Compute service {self.compute_server} unavailable ({value}), simulating the calculation")
+                    self.simulate_calculation()
+                else:
+                    QMessageBox.critical(self, "Error", f"Calculation failed: {value}")
+                return
+        QTimer.singleShot(50, lambda: self.poll_mesh_stream(client))
+
+    def simulate_calculation(self):
+        """Fallback without a compute service: a simulated 30 s progress, then the next VTP step."""
         self.progress = QProgressDialog("Calculating...", None, 0, 100, self)
         self.progress.setWindowTitle("Processing")
         self.progress.setWindowModality(Qt.WindowModal)
@@ -798,35 +1418,67 @@ class VTIViewer(QMainWindow):
         advance_progress()
 
     def load_vtp_after_calc(self):
-        # 1. Automatically read the VTP file at the current index
+        # 1. Automatically show the VTP file at the current index
         if self.vtp_file_index >= len(self.vtp_file_list):
             QMessageBox.information(self, "Info", "All steps are complete.")
             return
-        vtp_path = self.vtp_file_list[self.vtp_file_index]
+        self.show_vtp_step(self.vtp_file_index)
 
-        reader = vtk.vtkXMLPolyDataReader()
-        reader.SetFileName(vtp_path)
-        reader.Update()
-        polydata = reader.GetOutput()
-        if not polydata or polydata.GetNumberOfPoints() == 0:
-            QMessageBox.critical(self, "Error", f"VTP error: {vtp_path}")
+    def show_previous_vtp_step(self):
+        """Steps back to the VTP displayed before the current one (served from the cache)."""
+        if self.vtp_file_index < 2:
             return
+        self.show_vtp_step(self.vtp_file_index - 2)
 
-        # Replace the previously displayed VTP
-        if self.current_vtp_actor is not None:
-            self.renderer_3d.RemoveActor(self.current_vtp_actor)
+    def show_vtp_step(self, index):
+        """Displays the VTP at the given index of vtp_file_list in the 3D view once it is decoded."""
+        vtp_path = self.vtp_file_list[index]
+
+        # Cached steps resolve at once; otherwise the decode is polled so the GUI stays responsive
+        self.vtp_step_request = self.vtp_prefetcher.request(vtp_path)
+        self.poll_vtp_step(self.vtp_step_request, vtp_path)
 
-        vtp_mapper = vtk.vtkPolyDataMapper()
-        vtp_mapper.SetInputData(polydata)
-        vtp_actor = vtk.vtkActor()
-        vtp_actor.SetMapper(vtp_mapper)
-        vtp_actor.GetProperty().SetColor(0.5, 0.5, 0.5) # Gray
-        vtp_actor.GetProperty().SetOpacity(0.3) # Opacity
-        self.renderer_3d.AddActor(vtp_actor)
+        # Step to the next file and start decoding the ones after it
+        self.vtp_file_index = index + 1
+        self.vtp_prefetcher.prefetch(self.vtp_file_index)
+
+    def poll_vtp_step(self, future, vtp_path):
+        """Shows a requested VTP step when its decode completes, unless another step was requested since."""
+        if future is not self.vtp_step_request:
+            return
+        if not future.done():
+            QTimer.singleShot(20, lambda: self.poll_vtp_step(future, vtp_path))
+            return
+        self.vtp_step_request = None
+        try:
+            polydata = future.result()
+        except Exception as e:
+            print(f"Background VTP load failed for {vtp_path}: {e}")
+            polydata = None
+        if polydata is None:
+            QMessageBox.critical(self, "Error", f"VTP error: {vtp_path}")
+            return
+        self.show_mesh(polydata, vtp_path)
+
+    @profiled("mesh")
+    def show_mesh(self, polydata, vtp_path):
+        """Displays a mesh (a VTP step or a streamed result, keyed by vtp_path) in the 3D view."""
+        # Reuse the persistent actor; with unchanged connectivity only the points are swapped.
+        # Loading a VTI clears the 3D view, so the actor is added back whenever it is missing
+        self.current_vtp_actor = self.vtp_mesh.actor
+        if not self.renderer_3d.HasViewProp(self.current_vtp_actor):
+            self.renderer_3d.AddActor(self.current_vtp_actor)
+        self.mesh_transition = None
+        if self.animate_steps_btn.isChecked() and self.vtp_mesh.begin_transition(polydata):
+            self.start_mesh_transition()
+        else:
+            self.vtp_mesh.set_mesh(polydata)
+        self.vtp_mesh.set_lod(None)  # The previous step's decimated levels no longer match
+        self.update_depth_peeling()
 
         # --- New: Reset camera focal point when switching to VTP-only view ---
         if self.vti_toggle_btn.isChecked():  # If VTI is in a hidden state
-            bounds = vtp_actor.GetBounds()
+            bounds = polydata.GetBounds()
             center = [
                 0.5 * (bounds[0] + bounds[1]),
                 0.5 * (bounds[2] + bounds[3]),
@@ -838,14 +1490,117 @@ class VTIViewer(QMainWindow):
             camera.SetPosition(center[0], center[1], center[2] + max_dim * 2)
             camera.SetViewUp(0, 1, 0)
             self.renderer_3d.ResetCameraClippingRange()
-            self.vtk_widget_3d.GetRenderWindow().Render()
-
-        self.current_vtp_actor = vtp_actor
-
-        self.vtk_widget_3d.GetRenderWindow().Render()
-
-        # Step to the next file
-        self.vtp_file_index += 1
+            self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+        self.current_vtp_path = vtp_path
+        self.mesh_lod.request(vtp_path, polydata)
+        self.section_index = TriangleSliceIndex(polydata).start()
+        QTimer.singleShot(20, lambda: self.poll_section_index(self.section_index))
+        if len(self.contour_store) > 0:
+            self.start_agreement_metrics([vtp_path], pairwise=False, meshes=[polydata])
+
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def start_mesh_transition(self):
+        """Animates the persistent mesh actor towards its new points over mesh_transition_ms."""
+        transition = object()
+        self.mesh_transition = transition
+        start = time.perf_counter()
+
+        def advance():
+            if self.mesh_transition is not transition:
+                return
+            t = min(1000.0 * (time.perf_counter() - start) / self.mesh_transition_ms, 1.0)
+            if t < 1.0:
+                self.vtp_mesh.set_transition(t * t * (3.0 - 2.0 * t))  # Smoothstep easing
+                QTimer.singleShot(16, advance)
+            else:
+                self.vtp_mesh.end_transition()
+                self.mesh_transition = None
+            self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+        advance()
+
+    def poll_section_index(self, index):
+        """Draws the mesh outlines once the triangle index of the displayed VTP has been built."""
+        if index is not self.section_index:
+            return
+        if not index.done:
+            QTimer.singleShot(20, lambda: self.poll_section_index(index))
+            return
+        if index.error is not None:
+            print(f"Mesh section index failed: {index.error}")
+            self.section_index = None
+        self.update_mesh_sections('zyx')
+
+    @profiled("slices")
+    def update_mesh_sections(self, axes):
+        """Redraws the displayed VTP's cross-section in the 2D views of the given axes."""
+        slice_widgets = {'z': self.slice_widget_axial, 'y': self.slice_widget_coronal, 'x': self.slice_widget_sagittal}
+        index = self.section_index
+        visible = (self.mesh_outline_btn.isChecked() and self.image_data is not None
+                   and index is not None and index.done)
+        origin = self.image_data.GetOrigin() if self.image_data else (0, 0, 0)
+        spacing = self.image_data.GetSpacing() if self.image_data else (1, 1, 1)
+        for axis in axes:
+            if not visible or axis not in self.displayed_slices:
+                slice_widgets[axis].set_section(vtk.vtkPolyData())
+                continue
+            axis_id = 'xyz'.index(axis)
+            position = origin[axis_id] + self.displayed_slices[axis] * spacing[axis_id]
+            # Just in front of the image plane, like the contours
+            slice_widgets[axis].set_section(index.view_section(axis, position, spacing[axis_id]))
+
+    def start_agreement_metrics(self, paths, pairwise, meshes=None):
+        """Computes metrics of the contours against the given VTPs (and of the VTPs against each other).
+
+        meshes, if given, are the already loaded polydata of paths (e.g. streamed meshes the cache may evict).
+        """
+        if self.image_data is None:
+            QMessageBox.warning(self, "Warning", "Please load a VTI file first!")
+            return
+        labels, annotated, contour_xyz = None, [], None
+        if self.label_rasterizer is not None and len(self.contour_store) > 0:
+            self.update_label_volume()
+            # Only the annotated slices are compared, so only their labels are copied
+            annotated, labels = annotated_labels(self.label_rasterizer.labels,
+                                                 sorted(set(self.contour_store.annotated_slices())
+                                                        | set(self.interpolated_store.annotated_slices())),
+                                                 self.image_data)
+            spacing = self.image_data.GetSpacing()
+            contour_xyz = contour_points([self.contour_store, self.interpolated_store], min(spacing[0], spacing[1]))
+        if labels is None and not pairwise:
+            return
+        if self.metrics_job is not None:
+            self.metrics_job.cancel()
+        self.metrics_job = AgreementMetricsJob(paths, self.image_data, loader=self.load_ensemble_member,
+                                               meshes=meshes, labels=labels, annotated_slices=annotated,
+                                               contour_xyz=contour_xyz, pairwise=pairwise).start()
+        self.metrics_label.setText("computing...")
+        QTimer.singleShot(50, lambda: self.poll_agreement_metrics(self.metrics_job))
+
+    def poll_agreement_metrics(self, job):
+        if job is not self.metrics_job:
+            return
+        if not job.done:
+            QTimer.singleShot(50, lambda: self.poll_agreement_metrics(job))
+            return
+        self.metrics_job = None
+        if job.error is not None:
+            self.metrics_label.setText("failed")
+            QMessageBox.critical(self, "Error", f"Failed to compute agreement metrics: {job.error}")
+            return
+        names = [os.path.basename(path) for path in job.paths]
+        lines = []
+        if job.contour_metrics is not None:
+            lines += [f"Contours vs {name}: {format_metrics(m)}" for name, m in zip(names, job.contour_metrics)]
+            by_path = dict(zip(job.paths, job.contour_metrics))
+            self.metrics_label.setText(format_metrics(by_path[self.current_vtp_path])
+                                       if self.current_vtp_path in by_path else "N/A")
+        else:
+            self.metrics_label.setText("N/A (no contours)")
+        lines += [f"{names[i]} vs {names[j]}: {format_metrics(m)}" for (i, j), m in sorted(job.pairwise_metrics.items())]
+        if job.pairwise:
+            QMessageBox.information(self, "Agreement Metrics", "\n".join(lines) or "No meshes could be loaded.")
 
     def toggle_vti_in_3d(self, checked):
         """
@@ -853,13 +1608,203 @@ class VTIViewer(QMainWindow):
         """
         # Control the visibility of the three slice plane actors
         for actor in [self.image_slice_3d_axial, self.image_slice_3d_coronal, self.image_slice_3d_sagittal]:
-            actor.SetVisibility(not checked)
+            actor.SetVisibility(not checked and not self.volume_render_btn.isChecked())
         # Update button text
         if checked:
             self.vti_toggle_btn.setText("Show VTI")
         else:
             self.vti_toggle_btn.setText("Hide VTI")
-        self.vtk_widget_3d.GetRenderWindow().Render()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def volume_rendering_input(self):
+        """Returns the image to ray cast: the loaded volume, or a coarse pyramid level when out-of-core."""
+        if self.volume is None:
+            return self.image_data
+        if self.volume_pyramid is None or not self.volume_pyramid.levels:
+            return None
+        return self.volume_pyramid.level_volume_image(self.volume_pyramid.level_for(self.max_volume_render_size))
+
+    def toggle_volume_rendering(self, checked):
+        """Shows the ray-cast volume in place of the 3D slice planes; VTP meshes and contours stay visible."""
+        if checked:
+            image = self.volume_rendering_input() if self.image_data is not None else None
+            if image is None:
+                QMessageBox.information(self, "Volume Rendering",
+                                        "Volume rendering is available once a volume (and, out-of-core, "
+                                        "its downsampled copy) has been loaded.")
+                self.volume_render_btn.setChecked(False)
+                return
+            self.volume_renderer.set_input(image)
+            self.update_volume_rendering_property()
+            self.renderer_3d.AddVolume(self.volume_renderer.volume)
+        else:
+            self.renderer_3d.RemoveVolume(self.volume_renderer.volume)
+        for actor in [self.image_slice_3d_axial, self.image_slice_3d_coronal, self.image_slice_3d_sagittal]:
+            actor.SetVisibility(not checked and not self.vti_toggle_btn.isChecked())
+        self.renderer_3d.ResetCameraClippingRange()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def update_volume_rendering_property(self):
+        """Maps the selected transfer-function preset onto the current window/level."""
+        if not self.volume_render_btn.isChecked():
+            return
+        window = self.image_slice_3d_axial.GetProperty().GetColorWindow()
+        level = self.image_slice_3d_axial.GetProperty().GetColorLevel()
+        self.volume_renderer.set_preset(self.tf_preset_combo.currentText(), level - window / 2.0, level + window / 2.0)
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def load_ensemble_member(self, path):
+        """Returns a member mesh from the in-memory cache or the geometry cache (called on worker threads)."""
+        polydata = self.vtp_cache.get(path)
+        if polydata is None:
+            polydata = self.vtp_prefetcher.geometry_cache.load(path)
+        return polydata
+
+    def toggle_ensemble_view(self, checked):
+        """Shows the ensemble mean surface coloured by uncertainty in place of the current VTP step."""
+        if not checked:
+            if self.ensemble_job is not None and not self.ensemble_job.done:
+                self.ensemble_job.cancel()
+            for prop in (self.ensemble_actor, self.ensemble_scalar_bar):
+                if prop is not None:
+                    self.renderer_3d.RemoveViewProp(prop)
+            if self.current_vtp_actor is not None:
+                self.current_vtp_actor.SetVisibility(True)
+                self.update_depth_peeling()
+            self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+            return
+
+        paths = list(self.vtp_file_list)
+        if self.ensemble_surface is not None and self.ensemble_paths == paths:
+            self.show_ensemble_surface()
+            return
+        self.ensemble_job = EnsembleStatisticsJob(paths, loader=self.load_ensemble_member).start()
+        self.poll_ensemble_job(self.ensemble_job)
+
+    def poll_ensemble_job(self, job):
+        if job is not self.ensemble_job:
+            return
+        if not job.done:
+            self.ensemble_btn.setText(f"Ensemble Uncertainty (computing {int(job.progress * 100)}%)")
+            QTimer.singleShot(50, lambda: self.poll_ensemble_job(job))
+            return
+        self.ensemble_btn.setText("Ensemble Uncertainty")
+        if job.cancelled:
+            return
+        if job.error is not None:
+            QMessageBox.critical(self, "Error", f"Failed to compute ensemble statistics: {job.error}")
+            self.ensemble_btn.setChecked(False)
+            return
+        self.ensemble_paths = job.paths
+        self.ensemble_surface = job.surface
+        self.ensemble_members = job.ensemble
+        if self.ensemble_btn.isChecked():
+            self.show_ensemble_surface()
+
+    def show_ensemble_surface(self):
+        """Adds the mean surface (coloured by per-vertex standard deviation) and a scalar bar to the 3D view."""
+        scalar_range = self.ensemble_surface.GetPointData().GetArray("StdDev").GetRange()
+        lut = make_uncertainty_lookup_table(scalar_range)
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInputData(self.ensemble_surface)
+        mapper.SetLookupTable(lut)
+        mapper.SetScalarModeToUsePointFieldData()
+        mapper.SelectColorArray("StdDev")
+        mapper.SetScalarRange(scalar_range)
+        mapper.ScalarVisibilityOn()
+        self.ensemble_actor = vtk.vtkActor()
+        self.ensemble_actor.SetMapper(mapper)
+        self.ensemble_scalar_bar = vtk.vtkScalarBarActor()
+        self.ensemble_scalar_bar.SetLookupTable(lut)
+        self.ensemble_scalar_bar.SetTitle("Std. dev.")
+        self.ensemble_scalar_bar.SetNumberOfLabels(4)
+        self.ensemble_scalar_bar.SetWidth(0.08)
+        self.ensemble_scalar_bar.SetHeight(0.4)
+
+        if self.current_vtp_actor is not None:
+            self.current_vtp_actor.SetVisibility(False)
+            self.update_depth_peeling()
+        self.renderer_3d.AddActor(self.ensemble_actor)
+        self.renderer_3d.AddViewProp(self.ensemble_scalar_bar)
+        self.renderer_3d.ResetCameraClippingRange()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def on_3d_interaction_start(self, obj, event):
+        """Drops to the governor's interactive quality level while the camera is being moved."""
+        self.frame_rate_governor.start_interaction()
+
+    def on_3d_interaction_end(self, obj, event):
+        """Restores full quality once the interaction has finished."""
+        self.frame_rate_governor.end_interaction()
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def set_target_fps(self, fps):
+        self.frame_rate_governor.target_fps = fps
+
+    def apply_3d_quality(self, level):
+        """Applies a 3D quality level: 0 = full, 1 = nearest-neighbour slices,
+        2 = + no depth peeling, 3 = + coarsest mesh drawn opaque.
+        While the camera moves a decimated mesh is drawn from the first frame, coarser
+        ones at levels 3 and up, and the ray-cast volume samples more coarsely (along rays
+        and per pixel) at least as at level 1."""
+        interacting = self.frame_rate_governor.interacting
+        self.volume_renderer.set_quality(max(level, 1) if interacting else level)
+        for image_slice in (self.image_slice_3d_axial, self.image_slice_3d_coronal, self.image_slice_3d_sagittal):
+            if level >= 1:
+                image_slice.GetProperty().SetInterpolationTypeToNearest()
+            else:
+                image_slice.GetProperty().SetInterpolationTypeToLinear()
+        self.update_depth_peeling(level)
+
+        if self.current_vtp_actor is None:
+            return
+        levels = self.mesh_lod.levels(self.current_vtp_path)
+        if levels:
+            lod_level = max(level - 1, 1) if interacting else 0
+            self.vtp_mesh.set_lod(levels[min(lod_level, len(levels) - 1)] if lod_level > 0 else None)
+        self.current_vtp_actor.SetForceOpaque(level >= 3)
+
+    def update_depth_peeling(self, level=0):
+        """Uses depth peeling only if enabled, at quality levels below 2 and with the translucent mesh visible."""
+        translucent = self.current_vtp_actor is not None and self.current_vtp_actor.GetVisibility()
+        use = self.depth_peeling_btn.isChecked() and level < 2 and translucent
+        if bool(self.renderer_3d.GetUseDepthPeeling()) != bool(use):
+            self.renderer_3d.SetUseDepthPeeling(1 if use else 0)
+            self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow())
+
+    def toggle_stats_overlays(self, checked):
+        """Shows or hides the FPS / latency overlay in every view."""
+        for overlay in self.stats_overlays:
+            overlay.set_visible(checked)
+        self.render_scheduler.request(self.vtk_widget_3d.GetRenderWindow(),
+                                      *[w.vtk_widget.GetRenderWindow() for w in
+                                        (self.slice_widget_axial, self.slice_widget_coronal, self.slice_widget_sagittal)])
+
+    def export_trace(self):
+        """Saves the recorded timings as a Chrome trace (open in chrome://tracing or Perfetto)."""
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "trace.json", "Trace Files (*.json)")
+        if not file_path:
+            return
+        try:
+            self.profiler.export_chrome_trace(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Failed to export trace: {e}")
+
+    def closeEvent(self, event):
+        """Stops background workers before the window closes."""
+        self.vtp_prefetcher.shutdown()
+        self.mesh_lod.shutdown()
+        if self.mesh_stream is not None:
+            self.mesh_stream.cancel()
+        if self.metrics_job is not None:
+            self.metrics_job.cancel()
+        if self.vti_load_job is not None:
+            self.vti_load_job.cancel()
+        if self.volume_pyramid is not None:
+            self.volume_pyramid.cancel()
+        if self.volume_stats is not None:
+            self.volume_stats.cancel()
+        super().closeEvent(event)
 
 
 
@@ -0,0 +1,106 @@
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from ensemble import point_array, same_topology
+
+CELL_TYPES = ("Verts", "Lines", "Polys", "Strips")
+
+
+# ==============================================================================
+# One actor for successive meshes, updated in place
+# ==============================================================================
+class PersistentMeshActor:
+    """An actor that successive meshes (e.g. VTP steps) are shown with.
+
+    A mesh with the same connectivity as the displayed one only replaces the
+    point coordinates: actor, mapper, polydata and cell arrays are kept, so the
+    mapper re-uploads the vertex buffer but not the index buffer. The points
+    share the new mesh's coordinate array instead of copying it.
+
+    Animated transitions write the interpolated positions into buffers owned by
+    the actor (allocated once per point count and dtype), never into the
+    meshes themselves, which may be cached or read-only memory maps.
+    """
+    def __init__(self):
+        self.polydata = vtk.vtkPolyData()
+        self.points = vtk.vtkPoints()
+        self.polydata.SetPoints(self.points)
+        self.mapper = vtk.vtkPolyDataMapper()
+        self.mapper.SetInputData(self.polydata)
+        self.actor = vtk.vtkActor()
+        self.actor.SetMapper(self.mapper)
+        self.source = None  # Mesh displayed, or being transitioned to
+        self.transition_target = None
+        self._start = None
+        self._delta = None
+        self._buffer = None
+        self._buffer_array = None  # VTK array wrapping _buffer
+
+    def same_topology(self, polydata):
+        """True if polydata has the displayed mesh's point count and polygons."""
+        if self.source is None:
+            return False
+        if polydata.GetPolys() is self.polydata.GetPolys():  # e.g. streamed steps sharing one cell array
+            return polydata.GetNumberOfPoints() == self.polydata.GetNumberOfPoints()
+        return same_topology(self.polydata, polydata)
+
+    def set_mesh(self, polydata):
+        """Displays polydata; returns True if only its points were swapped in."""
+        self.transition_target = None
+        same = self.same_topology(polydata)
+        if not same:
+            for cell_type in CELL_TYPES:
+                getattr(self.polydata, "Set" + cell_type)(getattr(polydata, "Get" + cell_type)())
+        self.points.SetData(polydata.GetPoints().GetData())
+        self._pass_attributes(polydata)
+        self.source = polydata
+        return same
+
+    def begin_transition(self, polydata):
+        """Starts an animated transition from the displayed points to polydata's.
+
+        Returns False, and shows polydata right away, if the topology differs.
+        Drive the transition with set_transition(t) and finish it with end_transition().
+        """
+        if not self.same_topology(polydata):
+            self.set_mesh(polydata)
+            return False
+        displayed = point_array(self.polydata)
+        target = point_array(polydata)
+        if self._buffer is None or self._buffer.shape != target.shape or self._buffer.dtype != target.dtype:
+            self._start = np.empty_like(target)
+            self._delta = np.empty_like(target)
+            self._buffer = np.empty_like(target)
+            self._buffer_array = numpy_support.numpy_to_vtk(self._buffer, deep=0)
+        # The displayed points may be _buffer itself (a transition interrupted midway)
+        np.copyto(self._start, displayed)
+        np.subtract(target, self._start, out=self._delta)
+        np.copyto(self._buffer, self._start)
+        self.points.SetData(self._buffer_array)
+        self._pass_attributes(polydata)
+        self.source = polydata
+        self.transition_target = polydata
+        return True
+
+    def set_transition(self, t):
+        """Moves the points to fraction t (0-1) of the way to the transition's target."""
+        np.multiply(self._delta, t, out=self._buffer)
+        self._buffer += self._start
+        self._buffer_array.Modified()
+        self.points.Modified()
+
+    def end_transition(self):
+        """Switches to the target's own points; the buffers are kept for the next transition."""
+        if self.transition_target is not None:
+            self.set_mesh(self.transition_target)
+
+    def set_lod(self, polydata=None):
+        """Draws a decimated stand-in of the mesh (e.g. while the camera moves); None restores the mesh."""
+        self.mapper.SetInputData(self.polydata if polydata is None else polydata)
+
+    def _pass_attributes(self, polydata):
+        self.polydata.GetPointData().ShallowCopy(polydata.GetPointData())
+        self.polydata.GetCellData().ShallowCopy(polydata.GetCellData())
+        self.points.Modified()
+        self.polydata.Modified()
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+
+def read_vtp(file_path):
+    """Reads a VTP file and returns its polydata (None if the file is empty or unreadable)."""
+    reader = vtk.vtkXMLPolyDataReader()
+    reader.SetFileName(file_path)
+    reader.Update()
+    polydata = reader.GetOutput()
+    if not polydata or polydata.GetNumberOfPoints() == 0:
+        return None
+    return polydata
+
+
+def write_vtp(polydata, file_path):
+    writer = vtk.vtkXMLPolyDataWriter()
+    writer.SetFileName(file_path)
+    writer.SetInputData(polydata)
+    if not writer.Write():
+        raise IOError(f"Failed to write VTP file: {file_path}")
+
+
+# ==============================================================================
+# On-disk binary cache of decoded meshes
+# ==============================================================================
+class GeometryCache:
+    """Stores decoded VTP meshes as uncompressed .npy files that are memory-mapped on reload.
+
+    Entries are keyed by the source path, size and mtime, so an edited file gets a
+    new entry (and the old one is removed when the new one is written). Points,
+    cell offsets/connectivity and the remaining point/cell arrays are wrapped as
+    VTK arrays without copying; bookkeeping arrays such as vtkOriginalPointIds
+    are not stored. Wrapped meshes are read-only views of the cache files.
+    """
+    DROPPED_ARRAYS = ("vtkOriginalPointIds", "vtkOriginalCellIds")
+    CELL_TYPES = ("verts", "lines", "polys", "strips")
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "segmentation_demo", "geometry")
+        self.cache_dir = cache_dir
+
+    def entry_dir(self, vtp_path):
+        vtp_path = os.path.abspath(vtp_path)
+        stat = os.stat(vtp_path)
+        path_key = hashlib.sha1(vtp_path.encode("utf-8")).hexdigest()[:16]
+        content_key = hashlib.sha1(f"{vtp_path}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{path_key}-{content_key}")
+
+    def load(self, vtp_path):
+        """Returns the mesh for vtp_path from the cache, decoding the VTP and caching it on a miss."""
+        if not os.path.isfile(vtp_path):
+            return None
+        entry_dir = self.entry_dir(vtp_path)
+        if not os.path.exists(os.path.join(entry_dir, "manifest.json")):
+            polydata = read_vtp(vtp_path)
+            if polydata is None:
+                return None
+            try:
+                self._write(entry_dir, polydata)
+            except OSError as e:
+                print(f"Could not write geometry cache for {vtp_path}: {e}")
+                return polydata
+        return self._read(entry_dir)
+
+    def _write(self, entry_dir, polydata):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        manifest = {'cells': [], 'point_data': [], 'cell_data': []}
+
+        np.save(os.path.join(tmp_dir, "points.npy"), numpy_support.vtk_to_numpy(polydata.GetPoints().GetData()))
+        for cell_type in self.CELL_TYPES:
+            cells = getattr(polydata, "Get" + cell_type.capitalize())()
+            if cells.GetNumberOfCells() == 0:
+                continue
+            offsets = numpy_support.vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64, copy=False)
+            connectivity = numpy_support.vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64, copy=False)
+            np.save(os.path.join(tmp_dir, f"{cell_type}_offsets.npy"), offsets)
+            np.save(os.path.join(tmp_dir, f"{cell_type}_connectivity.npy"), connectivity)
+            manifest['cells'].append(cell_type)
+        for kind, data in (('point_data', polydata.GetPointData()), ('cell_data', polydata.GetCellData())):
+            for i in range(data.GetNumberOfArrays()):
+                array = data.GetArray(i)
+                if array is None or array.GetName() in self.DROPPED_ARRAYS:
+                    continue
+                file_name = f"{kind}_{len(manifest[kind])}.npy"
+                np.save(os.path.join(tmp_dir, file_name), numpy_support.vtk_to_numpy(array))
+                manifest[kind].append({'name': array.GetName(), 'file': file_name,
+                                       'is_normals': array is data.GetNormals(),
+                                       'is_scalars': array is data.GetScalars()})
+        with open(os.path.join(tmp_dir, "manifest.json"), 'w') as f:
+            json.dump(manifest, f)
+
+        # Publish atomically; another thread may have written the same entry meanwhile
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        # Entries for older versions of the same file are no longer reachable
+        path_key = os.path.basename(entry_dir).split("-")[0]
+        for name in os.listdir(self.cache_dir):
+            stale = os.path.join(self.cache_dir, name)
+            if name.startswith(path_key + "-") and stale != entry_dir and ".tmp-" not in name:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def _read(self, entry_dir):
+        with open(os.path.join(entry_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        def mapped(file_name):
+            return np.load(os.path.join(entry_dir, file_name), mmap_mode='r')
+
+        polydata = vtk.vtkPolyData()
+        points = vtk.vtkPoints()
+        # deep=0 keeps a reference to the memory map on the VTK array instead of copying
+        points.SetData(numpy_support.numpy_to_vtk(mapped("points.npy"), deep=0))
+        polydata.SetPoints(points)
+        for cell_type in manifest['cells']:
+            cells = vtk.vtkCellArray()
+            cells.SetData(numpy_support.numpy_to_vtkIdTypeArray(mapped(f"{cell_type}_offsets.npy"), deep=0),
+                          numpy_support.numpy_to_vtkIdTypeArray(mapped(f"{cell_type}_connectivity.npy"), deep=0))
+            getattr(polydata, "Set" + cell_type.capitalize())(cells)
+        for kind, data in (('point_data', polydata.GetPointData()), ('cell_data', polydata.GetCellData())):
+            for entry in manifest[kind]:
+                array = numpy_support.numpy_to_vtk(mapped(entry['file']), deep=0)
+                array.SetName(entry['name'])
+                if entry['is_normals']:
+                    data.SetNormals(array)
+                elif entry['is_scalars']:
+                    data.SetScalars(array)
+                else:
+                    data.AddArray(array)
+        return polydata
+
+
+# ==============================================================================
+# Size-bounded LRU cache of decoded polydata
+# ==============================================================================
+class PolyDataLRUCache:
+    """Keeps decoded polydata keyed by file path, evicting the least recently used entries."""
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key: path, value: (polydata, size in bytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, polydata):
+        size = polydata.GetActualMemorySize() * 1024  # GetActualMemorySize() is in KiB
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (polydata, size)
+            self._total_bytes += size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+
+# ==============================================================================
+# Background loader that decodes upcoming VTP steps on worker threads
+# ==============================================================================
+class VTPPrefetcher:
+    """Decodes entries of a VTP file list ahead of time and serves them from an LRU cache.
+
+    on_loaded(path, polydata), if given, is called on the worker thread after each decode.
+    With a geometry_cache, files are loaded through it instead of being parsed each time.
+    """
+    def __init__(self, file_list, cache=None, max_workers=2, lookahead=2, on_loaded=None, geometry_cache=None):
+        self.file_list = file_list
+        self.cache = cache if cache is not None else PolyDataLRUCache()
+        self.geometry_cache = geometry_cache
+        self.lookahead = lookahead
+        self.on_loaded = on_loaded
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vtp-prefetch")
+        self._pending = {}  # key: path, value: Future
+        self._lock = threading.Lock()
+
+    def _load(self, path):
+        try:
+            polydata = self.geometry_cache.load(path) if self.geometry_cache is not None else read_vtp(path)
+            if polydata is not None:
+                self.cache.put(path, polydata)
+                if self.on_loaded is not None:
+                    self.on_loaded(path, polydata)
+        finally:
+            # A failed decode is retried by the next request
+            with self._lock:
+                self._pending.pop(path, None)
+        return polydata
+
+    def prefetch(self, start_index):
+        """Queues the next `lookahead` entries starting at start_index for background decoding."""
+        for index in range(start_index, min(start_index + self.lookahead, len(self.file_list))):
+            path = self.file_list[index]
+            with self._lock:
+                if path in self._pending or path in self.cache:
+                    continue
+                self._pending[path] = self._executor.submit(self._load, path)
+
+    def request(self, path):
+        """Returns a Future for path's polydata: already resolved if cached, else its background decode."""
+        polydata = self.cache.get(path)
+        if polydata is not None:
+            future = Future()
+            future.set_result(polydata)
+            return future
+        with self._lock:
+            future = self._pending.get(path)
+            if future is None:
+                future = self._pending[path] = self._executor.submit(self._load, path)
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import vtk
+
+# Fraction of the full mesh's triangles removed at each coarser level
+LOD_REDUCTIONS = (0.8, 0.95)
+
+
+def build_lod_levels(polydata, reductions=LOD_REDUCTIONS):
+    """Returns [full, coarser, ..., coarsest] versions of a triangle mesh.
+
+    Each level is decimated from the previous one, so the coarser levels are cheap.
+    """
+    levels = [polydata]
+    source = polydata
+    kept = 1.0
+    for reduction in reductions:
+        # Reduction relative to the previous level that yields `reduction` overall
+        relative = 1.0 - (1.0 - reduction) / kept
+        decimate = vtk.vtkQuadricDecimation()
+        decimate.SetInputData(source)
+        decimate.SetTargetReduction(relative)
+        decimate.Update()
+        source = vtk.vtkPolyData()
+        source.ShallowCopy(decimate.GetOutput())
+        levels.append(source)
+        kept = 1.0 - reduction
+    return levels
+
+
+# ==============================================================================
+# Background builder of decimated mesh levels
+# ==============================================================================
+class MeshLODBuilder:
+    """Builds LOD levels of meshes on a worker thread and keeps the most recent ones."""
+    def __init__(self, max_entries=8, max_workers=1):
+        self.max_entries = max_entries
+        self._levels = OrderedDict()  # key: mesh key (e.g. file path), value: list of polydata
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mesh-lod")
+
+    def request(self, key, polydata):
+        """Queues LOD generation for a mesh unless its levels exist or are being built."""
+        with self._lock:
+            if key in self._levels or key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._build, key, polydata)
+
+    def _build(self, key, polydata):
+        try:
+            levels = build_lod_levels(polydata)
+        except Exception as e:
+            print(f"LOD generation failed for {key}: {e}")
+            levels = None
+        with self._lock:
+            self._pending.discard(key)
+            if levels is None:
+                return
+            self._levels[key] = levels
+            while len(self._levels) > self.max_entries:
+                self._levels.popitem(last=False)
+
+    def levels(self, key):
+        """Returns the levels of a mesh (finest first), or None while they are not built yet."""
+        with self._lock:
+            levels = self._levels.get(key)
+            if levels is not None:
+                self._levels.move_to_end(key)
+            return levels
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,141 @@
+import threading
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+# In-plane axes of the 2D views, matching AxisSliceCache output (axial: x, y; coronal: x, z; sagittal: y, z)
+VIEW_IN_PLANE_AXES = {'z': (0, 1), 'y': (0, 2), 'x': (1, 2)}
+TRIANGLE_EDGES = ((0, 1), (1, 2), (2, 0))
+
+
+def triangle_arrays(polydata):
+    """Returns the (N, 3) points and (M, 3) triangle vertex ids of a surface (triangulated if needed)."""
+    polys = polydata.GetPolys()
+    offsets = numpy_support.vtk_to_numpy(polys.GetOffsetsArray())
+    if polydata.GetNumberOfStrips() or np.any(np.diff(offsets) != 3):
+        triangulate = vtk.vtkTriangleFilter()
+        triangulate.SetInputData(polydata)
+        triangulate.PassLinesOff()
+        triangulate.PassVertsOff()
+        triangulate.Update()
+        polydata = triangulate.GetOutput()
+        polys = polydata.GetPolys()
+    points = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData())
+    triangles = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 3)
+    return points, triangles
+
+
+def segments_polydata(segments, display_z):
+    """Builds a polydata of independent line segments from a (K, 2, 2) array of in-plane end points."""
+    xyz = np.empty((2 * len(segments), 3))
+    xyz[:, :2] = segments.reshape(-1, 2)
+    xyz[:, 2] = display_z
+    points = vtk.vtkPoints()
+    points.SetData(numpy_support.numpy_to_vtk(xyz, deep=1))
+    lines = vtk.vtkCellArray()
+    lines.SetData(numpy_support.numpy_to_vtkIdTypeArray(np.arange(0, 2 * len(segments) + 1, 2, dtype=np.int64), deep=1),
+                  numpy_support.numpy_to_vtkIdTypeArray(np.arange(2 * len(segments), dtype=np.int64), deep=1))
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(points)
+    polydata.SetLines(lines)
+    return polydata
+
+
+# ==============================================================================
+# Per-axis bucket index of triangle extents for fast planar cross-sections
+# ==============================================================================
+class TriangleSliceIndex:
+    """Cross-sections of a triangle mesh with axis-aligned planes.
+
+    For each axis the triangles' [min, max] extents are binned into uniform
+    buckets (a triangle is listed in every bucket its extent overlaps), stored
+    as one CSR array. A section at position c only tests the triangles of c's
+    bucket and intersects them with the plane in one vectorized pass. The index
+    is built by build(), or on a worker thread by start(); poll `done`.
+    """
+    def __init__(self, polydata, bucket_width_factor=2.0):
+        self.polydata = polydata
+        self.bucket_width_factor = bucket_width_factor  # Bucket width in median triangle extents
+        self.points = None
+        self.triangles = None
+        self.axes = {}  # key: axis id, value: dict(lo, hi, start, width, offsets, triangle_ids)
+        self.done = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="section-index", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def build(self):
+        """Builds the index on the calling thread (start() does it on a worker thread)."""
+        self.points, self.triangles = triangle_arrays(self.polydata)
+        for axis_id in range(3):
+            self.axes[axis_id] = self._build_axis(axis_id)
+        self.done = True
+        return self
+
+    def _run(self):
+        try:
+            self.build()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+    def _build_axis(self, axis_id):
+        coordinates = self.points[:, axis_id][self.triangles]
+        lo, hi = coordinates.min(axis=1), coordinates.max(axis=1)
+        start = float(lo.min()) if len(lo) else 0.0
+        span = float(hi.max()) - start if len(hi) else 0.0
+        width = max(self.bucket_width_factor * float(np.median(hi - lo)) if len(lo) else 0.0, span / 65536.0, 1e-9)
+
+        first = ((lo - start) / width).astype(np.int64)
+        last = ((hi - start) / width).astype(np.int64)
+        counts = last - first + 1
+        triangle_ids = np.repeat(np.arange(len(lo)), counts)
+        buckets = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        order = np.argsort(buckets, kind='stable')
+        num_buckets = int(last.max()) + 1 if len(last) else 0
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(buckets, minlength=num_buckets))])
+        return {'lo': lo, 'hi': hi, 'start': start, 'width': width,
+                'offsets': offsets, 'triangle_ids': triangle_ids[order]}
+
+    def candidates(self, axis_id, position):
+        """Ids of the triangles whose extent along axis_id contains position."""
+        index = self.axes[axis_id]
+        bucket = int(np.floor((position - index['start']) / index['width']))
+        if bucket < 0 or bucket >= len(index['offsets']) - 1:
+            return np.empty(0, dtype=np.int64)
+        ids = index['triangle_ids'][index['offsets'][bucket]:index['offsets'][bucket + 1]]
+        return ids[(index['lo'][ids] <= position) & (index['hi'][ids] >= position)]
+
+    def section(self, axis_id, position, in_plane):
+        """Returns the cross-section at `position` along axis_id as a (K, 2, 2) array of segments.
+
+        Segment end points are given in the in_plane axes, e.g. (0, 1) for an axial plane.
+        """
+        triangles = self.triangles[self.candidates(axis_id, position)]
+        corners = self.points[triangles]  # (K, 3, 3)
+        distance = corners[:, :, axis_id] - position
+        above = distance >= 0
+        crossing = above.any(axis=1) & ~above.all(axis=1)
+        corners, distance, above = corners[crossing], distance[crossing], above[crossing]
+
+        # Each crossing triangle has exactly two edges whose end points lie on different sides
+        edge_points = np.empty((len(corners), 3, 2))
+        edge_crosses = np.empty((len(corners), 3), dtype=bool)
+        for e, (i, j) in enumerate(TRIANGLE_EDGES):
+            edge_crosses[:, e] = above[:, i] != above[:, j]
+            denominator = distance[:, i] - distance[:, j]
+            t = np.divide(distance[:, i], denominator, out=np.zeros(len(corners)), where=edge_crosses[:, e])
+            for k, axis in enumerate(in_plane):
+                edge_points[:, e, k] = corners[:, i, axis] + t * (corners[:, j, axis] - corners[:, i, axis])
+        edges = np.nonzero(edge_crosses)[1].reshape(-1, 2)
+        return edge_points[np.arange(len(corners))[:, None], edges]
+
+    def view_section(self, view_axis, position, display_z):
+        """Returns the cross-section in a 2D view's layout as line segments at display_z."""
+        return segments_polydata(self.section('xyz'.index(view_axis), position, VIEW_IN_PLANE_AXES[view_axis]),
+                                 display_z)
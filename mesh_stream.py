@@ -0,0 +1,247 @@
+"""Progressive mesh delivery from a compute service over a TCP socket.
+
+The client sends one REQUEST frame (a JSON description of the job) and the
+service answers with a stream of frames: PROGRESS updates, a MESH frame for
+every intermediate or final surface as soon as it is produced, then DONE (or
+ERROR). Every frame is a fixed 16-byte header followed by its payload:
+
+    header:  magic b"SGMS", frame type (uint8), 3 pad bytes, step (uint32), payload length (uint32)
+    MESH:    point count, triangle count, flags (uint32 each), float32 xyz points,
+             then uint32 triangle vertex ids unless flags has SAME_TOPOLOGY
+    PROGRESS: fraction (float32) and a UTF-8 message
+    REQUEST / ERROR: UTF-8 JSON / message
+
+Successive refinements usually keep their connectivity, so it is only sent
+when it changes. Running this module starts a stand-in service that replays
+VTP files with a configurable delay:
+
+    python mesh_stream.py vtp/*.vtp --port 8765 --delay 2
+"""
+import argparse
+import glob
+import json
+import queue
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from mesh_io import read_vtp
+
+HEADER = struct.Struct("<4sB3xII")
+MESH_HEADER = struct.Struct("<III")
+MAGIC = b"SGMS"
+REQUEST, PROGRESS, MESH, DONE, ERROR = 1, 2, 3, 4, 5
+SAME_TOPOLOGY = 1  # MESH flag: reuse the previous frame's triangles
+
+
+def send_frame(sock, frame_type, step=0, *payload_parts):
+    """Sends a header and the payload parts (bytes-like objects, sent without concatenating them)."""
+    parts = [memoryview(part).cast("B") for part in payload_parts]
+    sock.sendall(HEADER.pack(MAGIC, frame_type, step, sum(part.nbytes for part in parts)))
+    for part in parts:
+        sock.sendall(part)
+
+
+def recv_exact(sock, size):
+    """Reads exactly size bytes into a new bytearray (raises ConnectionError if the peer closes early)."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed in the middle of a frame")
+        received += count
+    return buffer
+
+
+def recv_frame(sock):
+    """Returns (frame type, step, payload bytearray)."""
+    magic, frame_type, step, length = HEADER.unpack(recv_exact(sock, HEADER.size))
+    if magic != MAGIC:
+        raise ConnectionError("Unexpected data on the mesh stream")
+    return frame_type, step, recv_exact(sock, length)
+
+
+def triangle_mesh_arrays(polydata):
+    """Returns the float32 (N, 3) points and uint32 (M, 3) triangles of a triangle mesh."""
+    points = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData()).astype(np.float32, copy=False)
+    polys = polydata.GetPolys()
+    if np.any(np.diff(numpy_support.vtk_to_numpy(polys.GetOffsetsArray())) != 3):
+        triangulate = vtk.vtkTriangleFilter()
+        triangulate.SetInputData(polydata)
+        triangulate.Update()
+        polys = triangulate.GetOutput().GetPolys()
+    triangles = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).astype(np.uint32).reshape(-1, 3)
+    return np.ascontiguousarray(points), triangles
+
+
+def send_mesh(sock, step, points, triangles=None):
+    """Sends a MESH frame; triangles=None tells the client to keep the previous connectivity."""
+    flags = SAME_TOPOLOGY if triangles is None else 0
+    num_triangles = 0 if triangles is None else len(triangles)
+    parts = [MESH_HEADER.pack(len(points), num_triangles, flags), points]
+    if triangles is not None:
+        parts.append(triangles)
+    send_frame(sock, MESH, step, *parts)
+
+
+def decode_mesh(payload, previous_polys=None):
+    """Builds a vtkPolyData from a MESH payload; points wrap the payload without copying.
+
+    Returns (polydata, polys) where polys is the cell array to pass as
+    previous_polys for the next frame.
+    """
+    num_points, num_triangles, flags = MESH_HEADER.unpack_from(payload)
+    offset = MESH_HEADER.size
+    points = np.frombuffer(payload, dtype=np.float32, count=3 * num_points, offset=offset).reshape(-1, 3)
+    offset += points.nbytes
+    if flags & SAME_TOPOLOGY:
+        if previous_polys is None:
+            raise ValueError("Mesh frame reuses a topology that was never sent")
+        polys = previous_polys
+    else:
+        triangles = np.frombuffer(payload, dtype=np.uint32, count=3 * num_triangles, offset=offset)
+        polys = vtk.vtkCellArray()
+        polys.SetData(numpy_support.numpy_to_vtkIdTypeArray(np.arange(0, 3 * num_triangles + 1, 3, dtype=np.int64),
+                                                            deep=1),
+                      numpy_support.numpy_to_vtkIdTypeArray(triangles.astype(np.int64), deep=1))
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_support.numpy_to_vtk(points, deep=0))
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(vtk_points)
+    polydata.SetPolys(polys)
+    return polydata, polys
+
+
+# ==============================================================================
+# Client: receives the stream on a worker thread
+# ==============================================================================
+class MeshStreamClient:
+    """Sends a request to a compute service and collects its frames on a worker thread.
+
+    The GUI drains `events`, a queue of ('progress', step, (fraction, message)),
+    ('mesh', step, polydata), ('done', step, None) and ('error', step, message)
+    tuples; `done` is set once the connection is finished. `connected` tells
+    whether the service could be reached at all.
+    """
+    def __init__(self, host, port, request, connect_timeout=2.0):
+        self.host = host
+        self.port = port
+        self.request = request
+        self.connect_timeout = connect_timeout
+        self.events = queue.Queue()
+        self.connected = False
+        self.cancelled = False
+        self.done = False
+        self._sock = None
+        self._thread = threading.Thread(target=self._run, name="mesh-stream", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        polys = None
+        try:
+            self._sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+            self._sock.settimeout(None)
+            self.connected = True
+            send_frame(self._sock, REQUEST, 0, json.dumps(self.request).encode("utf-8"))
+            while not self.cancelled:
+                frame_type, step, payload = recv_frame(self._sock)
+                if frame_type == PROGRESS:
+                    fraction, = struct.unpack_from("<f", payload)
+                    self.events.put(('progress', step, (fraction, payload[4:].decode("utf-8"))))
+                elif frame_type == MESH:
+                    polydata, polys = decode_mesh(payload, polys)
+                    self.events.put(('mesh', step, polydata))
+                elif frame_type == DONE:
+                    self.events.put(('done', step, None))
+                    break
+                elif frame_type == ERROR:
+                    self.events.put(('error', step, payload.decode("utf-8")))
+                    break
+        except Exception as e:
+            if not self.cancelled:
+                self.events.put(('error', 0, f"{type(e).__name__}: {e}"))
+        finally:
+            if self._sock is not None:
+                self._sock.close()
+            self.done = True
+
+
+# ==============================================================================
+# Stand-in compute service replaying VTP files
+# ==============================================================================
+class ReplayHandler(socketserver.BaseRequestHandler):
+    """Answers any request by streaming the server's VTP files as successive steps."""
+    def handle(self):
+        frame_type, _, payload = recv_frame(self.request)
+        if frame_type != REQUEST:
+            send_frame(self.request, ERROR, 0, b"Expected a request frame")
+            return
+        print(f"Request from {self.client_address[0]}: {bytes(payload[:200]).decode('utf-8', 'replace')}")
+        paths = self.server.paths
+        previous = None
+        for step, path in enumerate(paths):
+            message = f"Step {step + 1}/{len(paths)}"
+            send_frame(self.request, PROGRESS, step, struct.pack("<f", step / len(paths)), message.encode("utf-8"))
+            time.sleep(self.server.delay)
+            polydata = read_vtp(path)
+            if polydata is None:
+                send_frame(self.request, ERROR, step, f"Cannot read {path}".encode("utf-8"))
+                return
+            points, triangles = triangle_mesh_arrays(polydata)
+            same = previous is not None and np.array_equal(previous, triangles)
+            send_mesh(self.request, step, points, None if same else triangles)
+            previous = triangles
+        send_frame(self.request, PROGRESS, len(paths), struct.pack("<f", 1.0), b"Finished")
+        send_frame(self.request, DONE, len(paths))
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, paths, delay=1.0):
+        super().__init__(address, ReplayHandler)
+        self.paths = list(paths)
+        self.delay = delay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in compute service streaming VTP files as mesh steps.")
+    parser.add_argument("paths", nargs="*", help="VTP files in step order (default: vtp/*.vtp)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds before each step is sent")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob("vtp/*.vtp"))
+    if not paths:
+        print("No VTP files to replay.", file=sys.stderr)
+        return 1
+    with ReplayServer((args.host, args.port), paths, args.delay) as server:
+        print(f"Replaying {len(paths)} meshes on {args.host}:{args.port} ({args.delay} s per step)")
+        server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
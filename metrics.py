@@ -0,0 +1,225 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+from contours import edges_mask, sample_closed_contour
+from ensemble import corresponding_points, load_members, point_array
+from mesh_io import read_vtp
+from mesh_sections import TriangleSliceIndex
+
+
+def dice(a, b):
+    """Dice coefficient of two boolean masks (1.0 if both are empty)."""
+    total = np.count_nonzero(a) + np.count_nonzero(b)
+    return 2.0 * np.count_nonzero(a & b) / total if total else 1.0
+
+
+def iou(a, b):
+    """Intersection over union of two boolean masks (1.0 if both are empty)."""
+    union = np.count_nonzero(a | b)
+    return np.count_nonzero(a & b) / union if union else 1.0
+
+
+def mesh_mask(polydata, reference_image, section_index=None, slices=None):
+    """Voxelizes a closed surface onto the grid of reference_image; returns a (nz, ny, nx) boolean array.
+
+    Each axial slice is filled from the mesh's cross-section (see
+    TriangleSliceIndex) by the even-odd rule, so voxel centres inside the
+    surface are set. With `slices` (axial slice indices) only those slices are
+    voxelized, one mask row per entry.
+    """
+    if section_index is None:
+        section_index = TriangleSliceIndex(polydata).build()
+    x0, x1, y0, y1, z0, z1 = reference_image.GetExtent()
+    origin, spacing = reference_image.GetOrigin(), reference_image.GetSpacing()
+    plane_origin = (origin[0] + x0 * spacing[0], origin[1] + y0 * spacing[1])
+    slices = range(z0, z1 + 1) if slices is None else slices
+    mask = np.zeros((len(slices), y1 - y0 + 1, x1 - x0 + 1), dtype=bool)
+    for row, k in enumerate(slices):
+        segments = section_index.section(2, origin[2] + k * spacing[2], (0, 1))
+        if len(segments):
+            mask[row] = edges_mask(segments[:, 0], segments[:, 1], plane_origin, spacing[:2], mask.shape[1:])
+    return mask
+
+
+def annotated_labels(labels, annotated_slices, reference_image):
+    """Returns (slices, label rows): the annotated axial slices inside the volume and a copy of their labels.
+
+    labels is the (nz, ny, nx) label volume on reference_image's grid; only the
+    annotated rows are copied.
+    """
+    z0 = reference_image.GetExtent()[4]
+    slices = [k for k in annotated_slices if 0 <= k - z0 < len(labels)]
+    return slices, labels[np.asarray(slices, dtype=np.int64) - z0]
+
+
+def points_polydata(points):
+    polydata = vtk.vtkPolyData()
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(points, dtype=float), deep=1))
+    polydata.SetPoints(vtk_points)
+    return polydata
+
+
+def nearest_distances(points, target_points):
+    """Distance from each of points (N, 3) to the closest of target_points (M, 3), via a k-d tree locator."""
+    if len(points) == 0 or len(target_points) == 0:
+        return np.full(len(points), np.inf)
+    closest = corresponding_points(points_polydata(points), points_polydata(target_points))
+    return np.linalg.norm(closest - points, axis=1)
+
+
+def surface_distance_metrics(points_a, points_b):
+    """Symmetric Hausdorff and average surface distance between two sampled surfaces (point arrays)."""
+    a_to_b = nearest_distances(points_a, points_b)
+    b_to_a = nearest_distances(points_b, points_a)
+    return {'hausdorff': float(max(a_to_b.max(initial=0.0), b_to_a.max(initial=0.0))),
+            'average_surface_distance': float((a_to_b.sum() + b_to_a.sum()) / max(len(a_to_b) + len(b_to_a), 1))}
+
+
+def contour_points(stores, sample_spacing=1.0):
+    """Samples the contours of ContourStores into one (N, 3) array of physical points."""
+    curves = []
+    for store in stores:
+        for contour_id in range(len(store)):
+            curve = sample_closed_contour(store.control_points(contour_id), sample_spacing)
+            curves.append(np.column_stack([curve, np.full(len(curve), store.slice_z[contour_id])]))
+    return np.concatenate(curves) if curves else np.empty((0, 3))
+
+
+def section_points(section_index, slice_z_values):
+    """Returns the end points of a mesh's axial cross-sections at the given heights as an (N, 3) array."""
+    sections = []
+    for z in slice_z_values:
+        ends = section_index.section(2, z, (0, 1)).reshape(-1, 2)
+        sections.append(np.column_stack([ends, np.full(len(ends), z)]))
+    return np.concatenate(sections) if sections else np.empty((0, 3))
+
+
+# ==============================================================================
+# Agreement of drawn contours with meshes, and of ensemble members with each other
+# ==============================================================================
+def contour_mesh_metrics(labels, annotated_slices, contour_xyz, mask, section_index, reference_image):
+    """Compares the contours' labels and sampled points with one mesh (its mask and section index).
+
+    labels and mask hold one row per annotated axial slice (see
+    annotated_labels and mesh_mask), so unannotated slices do not count as
+    disagreement. Surface distances compare the contour points with the
+    mesh's cross-sections on the same slices, in both directions.
+    """
+    result = {'dice': dice(labels > 0, mask), 'iou': iou(labels > 0, mask)}
+
+    origin, spacing = reference_image.GetOrigin(), reference_image.GetSpacing()
+    slice_z = origin[2] + np.asarray(annotated_slices, dtype=float) * spacing[2]
+    result.update(surface_distance_metrics(contour_xyz, section_points(section_index, slice_z)))
+    return result
+
+
+def mesh_pair_metrics(mask_a, mask_b, polydata_a, polydata_b):
+    """Dice/IoU of two voxelized meshes and the surface distances between their vertices."""
+    result = {'dice': dice(mask_a, mask_b), 'iou': iou(mask_a, mask_b)}
+    result.update(surface_distance_metrics(point_array(polydata_a), point_array(polydata_b)))
+    return result
+
+
+def ensemble_agreement(members, masks, executor):
+    """Pairwise metrics of all members (given their masks); returns {(i, j): metrics} for i < j."""
+    pairs = list(combinations(range(len(members)), 2))
+    results = executor.map(lambda p: mesh_pair_metrics(masks[p[0]], masks[p[1]], members[p[0]], members[p[1]]),
+                           pairs)
+    return dict(zip(pairs, results))
+
+
+def compute_agreement_metrics(meshes, reference_image, labels=None, annotated_slices=(), contour_xyz=None,
+                              pairwise=True, max_workers=4, is_cancelled=None):
+    """Returns (contour metrics per mesh or None without contours, {(i, j): pairwise metrics}).
+
+    labels holds one row per entry of annotated_slices (see annotated_labels).
+    Meshes are only voxelized completely for the pairwise metrics. If
+    is_cancelled() becomes true the remaining stages are skipped.
+    """
+    is_cancelled = is_cancelled or (lambda: False)
+    contour_metrics, pairwise_metrics = None, {}
+    with_contours = labels is not None and len(annotated_slices) > 0
+    pairwise = pairwise and len(meshes) > 1
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="metrics") as executor:
+        # Each mesh is indexed and voxelized once, for both kinds of metrics
+        indices = list(executor.map(lambda mesh: TriangleSliceIndex(mesh).build(), meshes))
+        if is_cancelled():
+            return contour_metrics, pairwise_metrics
+        slices = None if pairwise else list(annotated_slices)
+        masks = list(executor.map(lambda index: mesh_mask(index.polydata, reference_image, index, slices), indices))
+        if with_contours and not is_cancelled():
+            z0 = reference_image.GetExtent()[4]
+            rows = slice(None) if slices is not None else np.asarray(annotated_slices, dtype=np.int64) - z0
+            contour_metrics = list(executor.map(
+                lambda i: contour_mesh_metrics(labels, annotated_slices, contour_xyz, masks[i][rows], indices[i],
+                                               reference_image),
+                range(len(meshes))))
+        if pairwise and not is_cancelled():
+            pairwise_metrics = ensemble_agreement(meshes, masks, executor)
+    return contour_metrics, pairwise_metrics
+
+
+class AgreementMetricsJob:
+    """Loads meshes and computes contour-vs-mesh metrics and, optionally, pairwise ensemble agreement.
+
+    Runs on a worker thread with the per-mesh work spread over a thread pool
+    (k-d tree queries run in VTK's C++ code). The GUI polls `done`, `error`,
+    `contour_metrics` (one dict per loaded mesh, or None without contours) and
+    `pairwise_metrics` ({(i, j): metrics}); `paths` lists the meshes that could
+    be loaded, in the order the results refer to them. Meshes already in memory
+    are passed as `meshes` (one per path) and not loaded again. Pass labels (the
+    annotated rows, see annotated_labels) and contour_xyz as copies, they are
+    read on the worker thread. cancel() skips the remaining stages.
+    """
+    def __init__(self, paths, reference_image, loader=read_vtp, meshes=None, labels=None, annotated_slices=(),
+                 contour_xyz=None, pairwise=True, max_workers=4):
+        self.paths = list(paths)
+        self.loader = loader
+        self.meshes = list(meshes) if meshes is not None else None
+        self.reference_image = reference_image
+        self.labels = labels
+        self.annotated_slices = list(annotated_slices)
+        self.contour_xyz = contour_xyz
+        self.pairwise = pairwise
+        self.max_workers = max_workers
+        self.contour_metrics = None
+        self.pairwise_metrics = {}
+        self.error = None
+        self.done = False
+        self.cancelled = False
+        self._thread = threading.Thread(target=self._run, name="agreement-metrics", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        try:
+            if self.meshes is None:
+                self.meshes = load_members(self.paths, self.loader, self.max_workers)
+            loaded = [(path, mesh) for path, mesh in zip(self.paths, self.meshes) if mesh is not None]
+            self.paths = [path for path, _ in loaded]
+            self.meshes = [mesh for _, mesh in loaded]
+            if self.cancelled:
+                return
+            self.contour_metrics, self.pairwise_metrics = compute_agreement_metrics(
+                self.meshes, self.reference_image, self.labels, self.annotated_slices, self.contour_xyz,
+                self.pairwise, self.max_workers, is_cancelled=lambda: self.cancelled)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+
+def format_metrics(metrics):
+    return (f"Dice {metrics['dice']:.3f}  IoU {metrics['iou']:.3f}  "
+            f"HD {metrics['hausdorff']:.2f}  ASD {metrics['average_surface_distance']:.2f}")
@@ -0,0 +1,151 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import vtk
+
+
+# ==============================================================================
+# Timing spans with Chrome-trace export
+# ==============================================================================
+class Profiler:
+    """Records named timing spans from any thread and exports them as a Chrome trace.
+
+    Spans are kept in a bounded ring buffer. While `enabled` is False nothing is
+    recorded, so instrumented code costs only an attribute check.
+    """
+    def __init__(self, max_events=200000, enabled=True):
+        self.enabled = enabled
+        self._events = deque(maxlen=max_events)  # (name, category, start, duration, thread id, args)
+        self._last_durations = {}  # key: span name, value: duration of its latest occurrence (seconds)
+        self._thread_names = {}
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, end, category="app", args=None):
+        """Records a span measured elsewhere (perf_counter timestamps)."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        with self._lock:
+            self._events.append((name, category, start, end - start, thread.ident, args))
+            self._last_durations[name] = end - start
+            self._thread_names.setdefault(thread.ident, thread.name)
+
+    @contextmanager
+    def span(self, name, category="app", args=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter(), category, args)
+
+    def last_duration(self, name):
+        return self._last_durations.get(name)
+
+    def observe(self, vtk_object, name, category="vtk"):
+        """Records a span between the Start/End events of a VTK object (algorithm Update() or Render())."""
+        starts = {}
+
+        def on_start(obj, event):
+            starts[threading.get_ident()] = time.perf_counter()
+
+        def on_end(obj, event):
+            start = starts.pop(threading.get_ident(), None)
+            if start is not None:
+                self.add_span(name, start, time.perf_counter(), category)
+        vtk_object.AddObserver("StartEvent", on_start)
+        vtk_object.AddObserver("EndEvent", on_end)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._last_durations.clear()
+
+    def chrome_trace(self):
+        """Returns the recorded spans in the Chrome trace event format (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            thread_names = dict(self._thread_names)
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+                 for tid, thread_name in thread_names.items()]
+        for name, category, start, duration, tid, args in events:
+            event = {'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': tid,
+                     'ts': (start - self._origin) * 1e6, 'dur': duration * 1e6}
+            if args:
+                event['args'] = args
+            trace.append(event)
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, file_path):
+        with open(file_path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+def profiled(category="app", name=None):
+    """Method decorator that records a span on `self.profiler` (if the instance has one).
+
+    name may be a function of the instance, for span names that differ per instance.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = getattr(self, "profiler", None)
+            if profiler is None or not profiler.enabled:
+                return method(self, *args, **kwargs)
+            span_name = name(self) if callable(name) else name or method.__name__
+            with profiler.span(span_name, category):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ==============================================================================
+# Per-view FPS / latency overlay
+# ==============================================================================
+class FrameStatsOverlay:
+    """Text overlay in a render window's corner showing its frame rate and latest latencies.
+
+    latency_spans lists the profiler span names whose last duration is shown.
+    The text is refreshed at the start of every frame, so it describes the
+    frames drawn before it.
+    """
+    FPS_WINDOW_SECONDS = 1.0
+
+    def __init__(self, renderer, render_window, profiler, latency_spans=()):
+        self.profiler = profiler
+        self.latency_spans = latency_spans
+        self._frame_times = deque()  # Start times of the frames drawn during the last FPS_WINDOW_SECONDS
+        self.text_actor = vtk.vtkTextActor()
+        self.text_actor.GetTextProperty().SetFontSize(12)
+        self.text_actor.GetTextProperty().SetColor(1.0, 1.0, 0.0)
+        self.text_actor.GetPositionCoordinate().SetCoordinateSystemToNormalizedViewport()
+        self.text_actor.SetPosition(0.01, 0.01)
+        self.text_actor.PickableOff()
+        self.text_actor.SetVisibility(False)
+        renderer.AddViewProp(self.text_actor)
+        render_window.AddObserver("StartEvent", self._on_render_start)
+
+    def set_visible(self, visible):
+        self.text_actor.SetVisibility(visible)
+
+    def _on_render_start(self, obj, event):
+        now = time.perf_counter()
+        self._frame_times.append(now)
+        while now - self._frame_times[0] > self.FPS_WINDOW_SECONDS:
+            self._frame_times.popleft()
+        if not self.text_actor.GetVisibility():
+            return
+        lines = []
+        if len(self._frame_times) > 1:
+            lines.append(f"{(len(self._frame_times) - 1) / (now - self._frame_times[0]):.1f} FPS")
+        for span_name in self.latency_spans:
+            duration = self.profiler.last_duration(span_name)
+            if duration is not None:
+                lines.append(f"{span_name}: {duration * 1000:.1f} ms")
+        self.text_actor.SetInput("\n".join(lines))
@@ -0,0 +1,127 @@
+import time
+
+from PyQt5.QtCore import QTimer
+
+
+# ==============================================================================
+# Coalescing render scheduler shared by all views
+# ==============================================================================
+class RenderScheduler:
+    """Collects render requests and draws each dirty render window once per frame.
+
+    Requests made during one event-loop cycle are coalesced into a single flush,
+    and flushes are spaced at least 1 / max_fps seconds apart.
+    """
+    def __init__(self, max_fps=60):
+        self.max_fps = max_fps
+        self._dirty = []  # Render windows waiting to be drawn, in request order
+        self._last_flush = 0.0
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def request(self, *render_windows):
+        """Marks render windows dirty; they are drawn on the next scheduled flush."""
+        for render_window in render_windows:
+            if render_window not in self._dirty:
+                self._dirty.append(render_window)
+        if not self._timer.isActive():
+            elapsed = time.perf_counter() - self._last_flush
+            delay = max(0.0, 1.0 / self.max_fps - elapsed)
+            self._timer.start(int(delay * 1000))
+
+    def flush(self):
+        """Draws every dirty render window immediately."""
+        self._timer.stop()
+        dirty, self._dirty = self._dirty, []
+        for render_window in dirty:
+            render_window.Render()
+        self._last_flush = time.perf_counter()
+
+    def cancel(self):
+        """Drops all pending requests without drawing."""
+        self._timer.stop()
+        self._dirty = []
+
+
+# ==============================================================================
+# Adaptive quality governor for an interactive render window
+# ==============================================================================
+class FrameRateGovernor:
+    """Lowers rendering quality while the camera moves to hold a target frame rate.
+
+    Frame times are measured from the render window's Start/End events. During
+    an interaction the quality level (0 = full, max_level = cheapest) is raised
+    when frames are over budget and lowered again when they are well under it;
+    apply_quality(level) does the actual work. The level reached is remembered
+    for the next interaction, and full quality is restored when it ends.
+    """
+    FRAMES_BETWEEN_CHANGES = 3
+
+    def __init__(self, render_window, apply_quality, target_fps=15, max_level=3):
+        self.apply_quality = apply_quality
+        self.target_fps = target_fps
+        self.max_level = max_level
+        self.interactive_level = 0
+        self.interacting = False
+        self.last_frame_time = 0.0
+        self._frame_start = None
+        self._frames_since_change = 0
+        render_window.AddObserver("StartEvent", self._on_render_start)
+        render_window.AddObserver("EndEvent", self._on_render_end)
+
+    def _on_render_start(self, obj, event):
+        self._frame_start = time.perf_counter()
+
+    def _on_render_end(self, obj, event):
+        if self._frame_start is None:
+            return
+        self.last_frame_time = time.perf_counter() - self._frame_start
+        self._frame_start = None
+        if not self.interacting:
+            return
+
+        self._frames_since_change += 1
+        if self._frames_since_change < self.FRAMES_BETWEEN_CHANGES:
+            return
+        budget = 1.0 / self.target_fps
+        if self.last_frame_time > budget and self.interactive_level < self.max_level:
+            self._set_interactive_level(self.interactive_level + 1)
+        elif self.last_frame_time < 0.5 * budget and self.interactive_level > 0:
+            self._set_interactive_level(self.interactive_level - 1)
+
+    def _set_interactive_level(self, level):
+        self.interactive_level = level
+        self._frames_since_change = 0
+        self.apply_quality(level)
+
+    def start_interaction(self):
+        self.interacting = True
+        self._frames_since_change = 0
+        self.apply_quality(self.interactive_level)
+
+    def end_interaction(self):
+        self.interacting = False
+        self.apply_quality(0)
+
+
+# ==============================================================================
+# Analytic picking on a plane
+# ==============================================================================
+def display_to_plane(renderer, x, y, plane_z=0.0):
+    """Intersects the view ray through display position (x, y) with the plane z = plane_z.
+
+    Returns the world point as (x, y, z), or None if the ray is parallel to the
+    plane. Costs two matrix transforms regardless of the props in the scene.
+    """
+    ends = []
+    for depth in (0.0, 1.0):
+        renderer.SetDisplayPoint(x, y, depth)
+        renderer.DisplayToWorld()
+        wx, wy, wz, w = renderer.GetWorldPoint()
+        ends.append((wx / w, wy / w, wz / w))
+    (x0, y0, z0), (x1, y1, z1) = ends
+    if abs(z1 - z0) < 1e-12:
+        return None
+    t = (plane_z - z0) / (z1 - z0)
+    return (x0 + t * (x1 - x0), y0 + t * (y1 - y0), plane_z)
@@ -0,0 +1,137 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+# Shared by all axes so prefetching never competes with more than one core
+_prefetch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slice-prefetch")
+
+
+def volume_voxels(image_data):
+    """Returns the scalars of a vtkImageData as a zero-copy (nz, ny, nx[, components]) NumPy view."""
+    scalars = image_data.GetPointData().GetScalars()
+    x0, x1, y0, y1, z0, z1 = image_data.GetExtent()
+    shape = (z1 - z0 + 1, y1 - y0 + 1, x1 - x0 + 1)
+    components = scalars.GetNumberOfComponents()
+    if components > 1:
+        shape += (components,)
+    return numpy_support.vtk_to_numpy(scalars).reshape(shape)
+
+
+def view_slice_image(values, extent, origin, spacing, in_plane):
+    """Wraps one slice's (rows, columns) voxels as a 2D view image: in-plane axes, slice plane at z = 0."""
+    values = np.ascontiguousarray(values)  # A no-op (zero-copy view) for axial slices
+    image = vtk.vtkImageData()
+    image.SetDimensions(values.shape[1], values.shape[0], 1)
+    # Indices start at the extent's first voxel, so the slice's first sample sits at origin + start * spacing
+    image.SetOrigin(origin[in_plane[0]] + extent[2 * in_plane[0]] * spacing[in_plane[0]],
+                    origin[in_plane[1]] + extent[2 * in_plane[1]] * spacing[in_plane[1]], 0.0)
+    image.SetSpacing(spacing[in_plane[0]], spacing[in_plane[1]], 1.0)
+    components = values.shape[2] if values.ndim == 3 else 1
+    # deep=0 keeps a reference to the NumPy buffer on the VTK array instead of copying
+    scalars = numpy_support.numpy_to_vtk(values.reshape(-1, components), deep=0)
+    image.GetPointData().SetScalars(scalars)
+    return image
+
+
+# ==============================================================================
+# Axis-aligned slice extraction with an LRU cache and directional prefetch
+# ==============================================================================
+class AxisSliceCache:
+    """Serves axis-aligned slices of a voxel array as 2D vtkImageData.
+
+    Slices are NumPy views of the volume; axial slices are wrapped without
+    copying, coronal/sagittal ones need a single contiguous copy. The output
+    geometry matches the view's reslice output (in-plane axes first, physical
+    in-plane coordinates, slice plane at z = 0), so both paths can be swapped.
+    """
+    def __init__(self, view_axis, max_slices=64, prefetch_depth=4):
+        self.view_axis = view_axis
+        self.max_slices = max_slices
+        self.prefetch_depth = prefetch_depth
+        self._volume = None  # (voxels, extent, origin, spacing)
+        self._slices = OrderedDict()  # key: slice index, value: vtkImageData
+        self._pending = set()  # Slice indices queued for prefetch
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped on every new volume so stale prefetches are dropped
+        self._last_index = None
+
+    def set_voxels(self, voxels, extent, origin, spacing):
+        """Sets the volume as a (nz, ny, nx[, components]) array (in memory or memory-mapped)."""
+        with self._lock:
+            self._volume = None if voxels is None else (voxels, tuple(extent), tuple(origin), tuple(spacing))
+            self._slices.clear()
+            self._pending.clear()
+            self._generation += 1
+            self._last_index = None
+
+    def clear(self):
+        self.set_voxels(None, None, None, None)
+
+    def has_volume(self):
+        return self._volume is not None
+
+    def _build(self, volume, slice_index):
+        voxels, extent, origin, spacing = volume
+        x0, x1, y0, y1, z0, z1 = extent
+        if self.view_axis == 'z':  # Axial: output axes (x, y)
+            values = voxels[slice_index - z0]
+            in_plane = (0, 1)
+        elif self.view_axis == 'y':  # Coronal: output axes (x, z)
+            values = voxels[:, slice_index - y0]
+            in_plane = (0, 2)
+        else:  # Sagittal: output axes (y, z)
+            values = voxels[:, :, slice_index - x0]
+            in_plane = (1, 2)
+        return view_slice_image(values, extent, origin, spacing, in_plane)
+
+    def _store(self, generation, slice_index, image):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._pending.discard(slice_index)
+            self._slices[slice_index] = image
+            self._slices.move_to_end(slice_index)
+            while len(self._slices) > self.max_slices:
+                self._slices.popitem(last=False)
+
+    def get(self, slice_index):
+        """Returns the slice image for slice_index and prefetches further slices in the scroll direction."""
+        with self._lock:
+            image = self._slices.get(slice_index)
+            if image is not None:
+                self._slices.move_to_end(slice_index)
+            volume, generation = self._volume, self._generation
+        if image is None:
+            image = self._build(volume, slice_index)
+            self._store(generation, slice_index, image)
+
+        direction = 1 if self._last_index is None or slice_index >= self._last_index else -1
+        self._last_index = slice_index
+        self.prefetch(slice_index, direction)
+        return image
+
+    def prefetch(self, slice_index, direction):
+        """Builds the next prefetch_depth slices in the given direction on the prefetch thread."""
+        with self._lock:
+            volume, generation = self._volume, self._generation
+            if volume is None:
+                return
+            axis_id = 'xyz'.index(self.view_axis)
+            first, last = volume[1][2 * axis_id], volume[1][2 * axis_id + 1]
+            wanted = [slice_index + direction * step for step in range(1, self.prefetch_depth + 1)]
+            wanted = [index for index in wanted
+                      if first <= index <= last and index not in self._slices and index not in self._pending]
+            self._pending.update(wanted)
+        if not wanted:
+            return
+
+        def build_all():
+            for index in wanted:
+                if generation != self._generation:
+                    return
+                self._store(generation, index, self._build(volume, index))
+        _prefetch_executor.submit(build_all)
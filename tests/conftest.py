@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+import vtk
+
+# The modules live at the repository root, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def reference_image():
+    """A 64 x 64 x 48 image with unit spacing, like a small axial series."""
+    image = vtk.vtkImageData()
+    image.SetExtent(0, 63, 0, 63, 0, 47)
+    image.SetOrigin(0.0, 0.0, 0.0)
+    image.SetSpacing(1.0, 1.0, 1.0)
+    return image
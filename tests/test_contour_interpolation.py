@@ -0,0 +1,67 @@
+import numpy as np
+
+from contours import (ContourRasterizer, ContourStore, align_correspondence, interpolate_contours,
+                      match_contours, resample_closed_curve)
+
+
+def circle(center, radius, num_points=16):
+    angles = np.linspace(0.0, 2.0 * np.pi, num_points, endpoint=False)
+    return np.column_stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)])
+
+
+def test_resample_closed_curve_spaces_points_evenly():
+    square = np.array([[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 4.0]])
+    resampled = resample_closed_curve(square, 8)
+    steps = np.hypot(*np.diff(np.vstack([resampled, resampled[:1]]), axis=0).T)
+    assert np.allclose(steps, 2.0)
+
+
+def test_align_correspondence_undoes_shift_and_reversal():
+    a = circle((0.0, 0.0), 5.0, 20)
+    b = np.roll(a, 7, axis=0)[::-1] + 0.1
+    assert np.allclose(align_correspondence(a, b), a + 0.1)
+
+
+def test_match_contours_pairs_nearest_centroids():
+    curves_a = [circle((10.0, 10.0), 3.0), circle((40.0, 40.0), 3.0)]
+    curves_b = [circle((41.0, 39.0), 3.0), circle((11.0, 10.0), 3.0), circle((80.0, 80.0), 3.0)]
+    assert sorted(match_contours(curves_a, curves_b)) == [(0, 1), (1, 0)]
+
+
+def test_interpolated_contours_blend_linearly():
+    store = ContourStore()
+    store.add(10, 5.0, circle((20.0, 20.0), 4.0, 32))
+    store.add(14, 7.0, circle((28.0, 20.0), 8.0, 32))
+    result = interpolate_contours(store, num_points=64)
+
+    assert result.annotated_slices() == [11, 12, 13]
+    assert np.allclose(result.slice_z, [5.5, 6.0, 6.5])
+    for slice_index, fraction in ((11, 0.25), (12, 0.5), (13, 0.75)):
+        (contour_id,) = result.contours_on_slice(slice_index)
+        points = result.control_points(contour_id)
+        assert np.allclose(points.mean(axis=0), (20.0 + 8.0 * fraction, 20.0), atol=0.05)
+        radii = np.hypot(*(points - points.mean(axis=0)).T)
+        assert np.allclose(radii, 4.0 + 4.0 * fraction, atol=0.1)
+
+
+def test_gaps_wider_than_max_gap_are_skipped():
+    store = ContourStore()
+    for slice_index in (0, 3, 20):
+        store.add(slice_index, float(slice_index), circle((20.0, 20.0), 5.0))
+    result = interpolate_contours(store, max_gap=5)
+    assert result.annotated_slices() == [1, 2]
+
+
+def test_reinterpolation_redraws_only_slices_whose_key_contours_changed(reference_image):
+    store = ContourStore()
+    store.add(10, 10.0, circle((30.0, 30.0), 10.0))
+    store.add(20, 20.0, circle((30.0, 30.0), 6.0))
+    rasterizer = ContourRasterizer(reference_image)
+    assert sorted(rasterizer.update(store, interpolated=interpolate_contours(store))) == list(range(10, 21))
+
+    # A fresh but equal interpolation result must not redraw anything
+    assert rasterizer.update(store, interpolated=interpolate_contours(store)) == []
+
+    # A new key contour only redraws its slice and the gap it closes, not the gap 10-20
+    store.add(30, 30.0, circle((30.0, 30.0), 8.0))
+    assert sorted(rasterizer.update(store, interpolated=interpolate_contours(store))) == list(range(21, 31))
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+import vtk
+from vtk.util import numpy_support
+
+from ensemble import (EnsembleStatistics, SharedTopologyEnsemble, compute_ensemble_statistics,
+                      corresponding_points, point_array)
+
+
+def sphere(theta_resolution=24, phi_resolution=16):
+    source = vtk.vtkSphereSource()
+    source.SetRadius(10.0)
+    source.SetThetaResolution(theta_resolution)
+    source.SetPhiResolution(phi_resolution)
+    source.Update()
+    return source.GetOutput()
+
+
+def with_points(polydata, points):
+    """A copy of polydata sharing its cells, with new point coordinates."""
+    member = vtk.vtkPolyData()
+    member.ShallowCopy(polydata)
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(points), deep=1))
+    member.SetPoints(vtk_points)
+    return member
+
+
+@pytest.fixture
+def members():
+    reference = sphere()
+    rng = np.random.default_rng(1)
+    base = point_array(reference)
+    return [with_points(reference, base + rng.normal(0.0, 0.5, base.shape)) for _ in range(11)]
+
+
+def test_shared_topology_members_share_cells_and_coordinates(members):
+    ensemble = SharedTopologyEnsemble()
+    for i, member in enumerate(members):
+        ensemble.add(f"member{i}", member)
+    ensemble.add("other", sphere(12, 8))
+
+    assert len(ensemble) == len(members) + 1
+    assert {ensemble.group_of(i) for i in range(len(members))} == {0}
+    assert ensemble.group_of(len(members)) == 1
+    for i, member in enumerate(members):
+        assert np.array_equal(ensemble.coordinates(i), point_array(member))
+        assert ensemble.member(i).GetPolys() is ensemble.member(0).GetPolys()
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 4, 11])
+def test_batched_statistics_match_brute_force(members, batch_size):
+    ensemble = SharedTopologyEnsemble()
+    for i, member in enumerate(members):
+        ensemble.add(i, member)
+    statistics = compute_ensemble_statistics(ensemble, batch_size=batch_size, max_workers=2)
+
+    positions = np.stack([point_array(member) for member in members])
+    mean = positions.mean(axis=0)
+    assert statistics.count == len(members)
+    assert np.allclose(statistics.mean, mean)
+    assert np.allclose(statistics.variance, ((positions - mean) ** 2).sum(axis=2).mean(axis=0))
+
+
+def test_mean_surface_carries_variance_arrays(members):
+    statistics = EnsembleStatistics(members[0])
+    statistics.add_batch([point_array(member) for member in members])
+    surface = statistics.mean_surface()
+
+    assert surface.GetNumberOfPolys() == members[0].GetNumberOfPolys()
+    assert np.allclose(point_array(surface), statistics.mean)
+    std_dev = numpy_support.vtk_to_numpy(surface.GetPointData().GetArray("StdDev"))
+    assert np.allclose(std_dev, np.sqrt(statistics.variance))
+
+
+def test_corresponding_points_find_the_closest_vertices():
+    reference = sphere()
+    points = point_array(reference)
+    permutation = np.random.default_rng(2).permutation(len(points))
+    shuffled = vtk.vtkPolyData()
+    shuffled_points = vtk.vtkPoints()
+    shuffled_points.SetData(numpy_support.numpy_to_vtk(points[permutation] + 0.01, deep=1))
+    shuffled.SetPoints(shuffled_points)
+    assert np.allclose(corresponding_points(reference, shuffled), points + 0.01)
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+import vtk
+from vtk.util import numpy_support
+
+from mesh_io import read_vtp
+from mesh_sections import TriangleSliceIndex
+
+VTP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vtp")
+
+
+def sphere():
+    source = vtk.vtkSphereSource()
+    source.SetCenter(1.0, -2.0, 3.0)
+    source.SetRadius(10.0)
+    source.SetThetaResolution(40)
+    source.SetPhiResolution(30)
+    source.Update()
+    return source.GetOutput()
+
+
+def cutter_segments(polydata, axis_id, position, in_plane):
+    """The plane section as vtkCutter computes it, as a (K, 2, 2) array of in-plane segments."""
+    plane = vtk.vtkPlane()
+    origin = [0.0, 0.0, 0.0]
+    origin[axis_id] = position
+    normal = [0.0, 0.0, 0.0]
+    normal[axis_id] = 1.0
+    plane.SetOrigin(origin)
+    plane.SetNormal(normal)
+    cutter = vtk.vtkCutter()
+    cutter.SetInputData(polydata)
+    cutter.SetCutFunction(plane)
+    cutter.Update()
+    output = cutter.GetOutput()
+    if output.GetNumberOfLines() == 0:
+        return np.empty((0, 2, 2))
+    points = numpy_support.vtk_to_numpy(output.GetPoints().GetData())[:, list(in_plane)]
+    lines = numpy_support.vtk_to_numpy(output.GetLines().GetConnectivityArray()).reshape(-1, 2)
+    return points[lines]
+
+
+def canonical(segments):
+    """Segments with ordered end points, in sorted order, so two sections can be compared."""
+    segments = np.round(segments, 6)
+    flip = (segments[:, 0, 0] > segments[:, 1, 0]) | ((segments[:, 0, 0] == segments[:, 1, 0])
+                                                      & (segments[:, 0, 1] > segments[:, 1, 1]))
+    segments[flip] = segments[flip][:, ::-1]
+    flat = segments.reshape(-1, 4)
+    return flat[np.lexsort(flat.T[::-1])]
+
+
+@pytest.mark.parametrize("axis_id, in_plane", [(0, (1, 2)), (1, (0, 2)), (2, (0, 1))])
+def test_sections_match_vtk_cutter(axis_id, in_plane):
+    polydata = sphere()
+    index = TriangleSliceIndex(polydata).build()
+    for position in np.linspace(-8.0, 8.0, 7) + 0.137:
+        segments = index.section(axis_id, position, in_plane)
+        expected = cutter_segments(polydata, axis_id, position, in_plane)
+        assert segments.shape == expected.shape
+        assert np.allclose(canonical(segments), canonical(expected), atol=1e-5)
+
+
+def test_sections_of_an_ensemble_mesh_match_vtk_cutter():
+    polydata = read_vtp(os.path.join(VTP_DIR, "ensemble_nc1_moved.vtp"))
+    index = TriangleSliceIndex(polydata).build()
+    bounds = polydata.GetBounds()
+    position = 0.5 * (bounds[4] + bounds[5]) + 0.0123
+    segments = index.section(2, position, (0, 1))
+    expected = cutter_segments(polydata, 2, position, (0, 1))
+    assert len(segments) > 0
+    assert np.allclose(canonical(segments), canonical(expected), atol=1e-4)
+
+
+def test_planes_outside_the_mesh_give_empty_sections():
+    index = TriangleSliceIndex(sphere()).build()
+    assert index.section(2, 50.0, (0, 1)).shape == (0, 2, 2)
+    assert index.section(2, -50.0, (0, 1)).shape == (0, 2, 2)
+
+
+def test_background_build_matches_synchronous_build():
+    polydata = sphere()
+    index = TriangleSliceIndex(polydata).start()
+    index._thread.join()
+    assert index.done and index.error is None
+    expected = TriangleSliceIndex(polydata).build().section(1, 0.5, (0, 2))
+    assert np.array_equal(index.section(1, 0.5, (0, 2)), expected)
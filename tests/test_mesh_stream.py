@@ -0,0 +1,142 @@
+import glob
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+import vtk
+from vtk.util import numpy_support
+
+from mesh_io import read_vtp
+from mesh_stream import (DONE, MESH, MeshStreamClient, ReplayServer, decode_mesh, recv_exact, recv_frame,
+                         send_frame, send_mesh, triangle_mesh_arrays)
+
+VTP_PATHS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "vtp", "*.vtp")))
+
+
+def sphere(shift=0.0):
+    source = vtk.vtkSphereSource()
+    source.SetCenter(shift, 0.0, 0.0)
+    source.Update()
+    return source.GetOutput()
+
+
+def collect(client, timeout=60.0):
+    """Waits for the client to finish and returns its events in order."""
+    deadline = time.monotonic() + timeout
+    while not client.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.done
+    events = []
+    while not client.events.empty():
+        events.append(client.events.get())
+    return events
+
+
+@pytest.fixture
+def replay_server():
+    servers = []
+
+    def start(paths):
+        server = ReplayServer(("127.0.0.1", 0), paths, delay=0.0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_frames_round_trip_over_a_socket():
+    a, b = socket.socketpair()
+    with a, b:
+        payload = np.arange(10, dtype=np.float32)
+        send_frame(a, MESH, 7, b"head", payload)
+        send_frame(a, DONE, 8)
+        frame_type, step, data = recv_frame(b)
+        assert (frame_type, step) == (MESH, 7)
+        assert bytes(data[:4]) == b"head"
+        assert np.array_equal(np.frombuffer(data, dtype=np.float32, offset=4), payload)
+        assert recv_frame(b) == (DONE, 8, bytearray())
+
+
+def test_connection_closed_mid_frame_raises():
+    a, b = socket.socketpair()
+    with b:
+        a.sendall(b"SGMS")
+        a.close()
+        with pytest.raises(ConnectionError):
+            recv_exact(b, 16)
+
+
+def test_mesh_frames_reuse_the_previous_topology():
+    first, second = sphere(), sphere(shift=1.5)
+    points, triangles = triangle_mesh_arrays(first)
+    a, b = socket.socketpair()
+    with a, b:
+        send_mesh(a, 0, points, triangles)
+        send_mesh(a, 1, triangle_mesh_arrays(second)[0])
+        mesh0, polys = decode_mesh(recv_frame(b)[2])
+        mesh1, polys1 = decode_mesh(recv_frame(b)[2], polys)
+
+    assert polys1 is polys and mesh1.GetPolys() is mesh0.GetPolys()
+    connectivity = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).reshape(-1, 3)
+    assert np.array_equal(connectivity, triangles)
+    assert np.array_equal(numpy_support.vtk_to_numpy(mesh1.GetPoints().GetData()),
+                          numpy_support.vtk_to_numpy(second.GetPoints().GetData()).astype(np.float32))
+
+
+def test_same_topology_frame_without_a_previous_mesh_is_rejected():
+    a, b = socket.socketpair()
+    with a, b:
+        send_mesh(a, 0, triangle_mesh_arrays(sphere())[0])
+        with pytest.raises(ValueError):
+            decode_mesh(recv_frame(b)[2])
+
+
+@pytest.mark.skipif(not VTP_PATHS, reason="no VTP files in vtp/")
+def test_replay_server_streams_every_vtp(replay_server):
+    server = replay_server(VTP_PATHS)
+    client = MeshStreamClient(*server.server_address, {'image': None, 'contours': {}}).start()
+    events = collect(client)
+
+    assert client.connected
+    assert events[-1][0] == 'done'
+    meshes = [(step, polydata) for kind, step, polydata in events if kind == 'mesh']
+    assert [step for step, _ in meshes] == list(range(len(VTP_PATHS)))
+    for (_, polydata), path in zip(meshes, VTP_PATHS):
+        points, triangles = triangle_mesh_arrays(read_vtp(path))
+        assert np.array_equal(numpy_support.vtk_to_numpy(polydata.GetPoints().GetData()), points)
+        assert np.array_equal(numpy_support.vtk_to_numpy(polydata.GetPolys().GetConnectivityArray()).reshape(-1, 3),
+                              triangles)
+
+
+def test_replay_server_sends_unchanged_topology_once(replay_server, tmp_path):
+    paths = []
+    for i in range(3):
+        writer = vtk.vtkXMLPolyDataWriter()
+        writer.SetFileName(str(tmp_path / f"step{i}.vtp"))
+        writer.SetInputData(sphere(shift=float(i)))
+        writer.Write()
+        paths.append(writer.GetFileName())
+    server = replay_server(paths)
+    events = collect(MeshStreamClient(*server.server_address, {}).start())
+
+    meshes = [polydata for kind, _, polydata in events if kind == 'mesh']
+    assert len(meshes) == 3
+    assert meshes[1].GetPolys() is meshes[0].GetPolys() and meshes[2].GetPolys() is meshes[0].GetPolys()
+    assert meshes[2].GetBounds()[0] == pytest.approx(sphere(shift=2.0).GetBounds()[0])
+
+
+def test_unreachable_service_reports_an_error():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    client = MeshStreamClient("127.0.0.1", port, {}, connect_timeout=0.5).start()
+    events = collect(client)
+    assert not client.connected
+    assert [kind for kind, _, _ in events] == ['error']
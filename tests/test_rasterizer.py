@@ -0,0 +1,70 @@
+import numpy as np
+
+from contours import ContourRasterizer, ContourStore, polygon_mask
+
+
+def circle(center, radius, num_points=16):
+    angles = np.linspace(0.0, 2.0 * np.pi, num_points, endpoint=False)
+    return np.column_stack([center[0] + radius * np.cos(angles), center[1] + radius * np.sin(angles)])
+
+
+def test_polygon_mask_fills_pixel_centres_inside():
+    square = np.array([[2.5, 1.5], [6.5, 1.5], [6.5, 4.5], [2.5, 4.5]])
+    mask = polygon_mask(square, (0.0, 0.0), (1.0, 1.0), (8, 10))
+    expected = np.zeros((8, 10), dtype=bool)
+    expected[2:5, 3:7] = True
+    assert np.array_equal(mask, expected)
+
+
+def test_polygon_mask_matches_point_in_polygon():
+    rng = np.random.default_rng(0)
+    polygon = circle((20.0, 15.0), 9.0, 12) + rng.normal(0.0, 1.5, (12, 2))
+    origin, spacing, shape = (-0.5, 2.0), (0.75, 1.25), (30, 60)
+    mask = polygon_mask(polygon, origin, spacing, shape)
+
+    # Even-odd rule evaluated per pixel centre
+    ys, xs = np.mgrid[:shape[0], :shape[1]]
+    px = origin[0] + xs * spacing[0]
+    py = origin[1] + ys * spacing[1]
+    inside = np.zeros(shape, dtype=bool)
+    for (x0, y0), (x1, y1) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        crosses = (y0 <= py) != (y1 <= py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        inside ^= crosses & (px < x_cross)
+    assert np.array_equal(mask, inside)
+
+
+def test_update_rasterizes_only_changed_slices(reference_image):
+    store = ContourStore()
+    store.add(10, 10.0, circle((30.0, 30.0), 10.0))
+    store.add(20, 20.0, circle((30.0, 30.0), 8.0))
+    rasterizer = ContourRasterizer(reference_image)
+
+    assert sorted(rasterizer.update(store)) == [10, 20]
+    assert abs(int(rasterizer.labels[10].sum()) - np.pi * 10.0 ** 2) < 0.1 * np.pi * 10.0 ** 2
+    assert not rasterizer.labels[15].any()
+    assert rasterizer.update(store) == []
+
+    store.add(20, 20.0, circle((10.0, 10.0), 4.0))
+    assert rasterizer.update(store) == [20]
+    assert rasterizer.labels[20, 10, 10] and rasterizer.labels[20, 30, 30]
+
+
+def test_pending_contour_is_drawn_and_removed(reference_image):
+    store = ContourStore()
+    rasterizer = ContourRasterizer(reference_image)
+    assert rasterizer.update(store, pending=(5, circle((30.0, 30.0), 6.0))) == [5]
+    assert rasterizer.labels[5, 30, 30]
+    assert rasterizer.update(store) == [5]
+    assert not rasterizer.labels[5].any()
+
+
+def test_cleared_store_empties_the_labels(reference_image):
+    store = ContourStore()
+    store.add(12, 12.0, circle((30.0, 30.0), 10.0))
+    rasterizer = ContourRasterizer(reference_image)
+    rasterizer.update(store)
+    store.clear()
+    assert rasterizer.update(store) == [12]
+    assert not rasterizer.labels.any()
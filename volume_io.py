@@ -0,0 +1,336 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import nullcontext
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+
+def read_vti(file_path):
+    """Reads a whole VTI file (None if it is empty or unreadable)."""
+    reader = vtk.vtkXMLImageDataReader()
+    reader.SetFileName(file_path)
+    reader.Update()
+    image_data = reader.GetOutput()
+    if not image_data or image_data.GetNumberOfPoints() == 0:
+        return None
+    return image_data
+
+
+def write_vti(image_data, file_path):
+    writer = vtk.vtkXMLImageDataWriter()
+    writer.SetFileName(file_path)
+    writer.SetInputData(image_data)
+    if not writer.Write():
+        raise IOError(f"Failed to write VTI file: {file_path}")
+
+
+def read_whole_extent(file_path):
+    """Returns the whole extent stored in a VTI file without reading any voxels."""
+    reader = vtk.vtkXMLImageDataReader()
+    reader.SetFileName(file_path)
+    reader.UpdateInformation()
+    whole_extent = reader.GetOutputInformation(0).Get(vtk.vtkStreamingDemandDrivenPipeline.WHOLE_EXTENT())
+    return tuple(whole_extent) if whole_extent else None
+
+
+def read_extent(file_path, extent):
+    """Reads only the given sub-extent of a VTI file and returns it as a standalone vtkImageData."""
+    reader = vtk.vtkXMLImageDataReader()
+    reader.SetFileName(file_path)
+    reader.UpdateExtent(tuple(extent))
+    image = vtk.vtkImageData()
+    image.DeepCopy(reader.GetOutput())
+    return image
+
+
+def middle_slice_extents(whole_extent):
+    """Returns the single-slice extents through the volume center, keyed by view axis."""
+    x0, x1, y0, y1, z0, z1 = whole_extent
+    mx, my, mz = (x0 + x1) // 2, (y0 + y1) // 2, (z0 + z1) // 2
+    return {
+        'z': (x0, x1, y0, y1, mz, mz),  # Axial
+        'y': (x0, x1, my, my, z0, z1),  # Coronal
+        'x': (mx, mx, y0, y1, z0, z1),  # Sagittal
+    }
+
+
+# ==============================================================================
+# Out-of-core volume access through a memory-mapped raw sidecar
+# ==============================================================================
+class OutOfCoreVolume:
+    """Voxel access to a VTI file through a memory-mapped .npy sidecar.
+
+    The sidecar is written once, slab by slab, from extent reads of the .vti and
+    reused as long as the source file's size and mtime are unchanged. It lives in
+    a cache directory (not next to the source, which may be read-only), keyed
+    like GeometryCache entries; sidecars of older versions of a file are
+    removed. Slices are served as views of the memory map, so only the pages
+    actually displayed stay resident.
+    """
+    SLAB_SLICES = 16  # Axial slices converted per extent read
+
+    def __init__(self, vti_path, array, header):
+        self.vti_path = vti_path
+        self.array = array  # shape (nz, ny, nx) or (nz, ny, nx, components)
+        self.extent = tuple(header['extent'])
+        self.origin = tuple(header['origin'])
+        self.spacing = tuple(header['spacing'])
+        self.scalar_range = tuple(header['scalar_range'])
+        self.scalar_name = header['scalar_name']
+        self._last_slices = {}  # key: view axis, value: (slice index, vtkImageData)
+
+    @staticmethod
+    def sidecar_paths(vti_path, cache_dir=None):
+        """Returns the (.npy, .json) sidecar paths of vti_path, keyed by its path, size and mtime."""
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "segmentation_demo", "volumes")
+        vti_path = os.path.abspath(vti_path)
+        stat = os.stat(vti_path)
+        path_key = hashlib.sha1(vti_path.encode("utf-8")).hexdigest()[:16]
+        content_key = hashlib.sha1(f"{vti_path}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()[:16]
+        stem = os.path.join(cache_dir, f"{path_key}-{content_key}")
+        return stem + ".npy", stem + ".json"
+
+    @classmethod
+    def open(cls, vti_path, progress_callback=None, is_cancelled=None, cache_dir=None):
+        """Opens the sidecar for vti_path, (re)building it first if it is missing or stale.
+
+        Returns None if the conversion was cancelled.
+        """
+        npy_path, json_path = cls.sidecar_paths(vti_path, cache_dir)
+        stat = os.stat(vti_path)
+        header = None
+        if os.path.exists(npy_path) and os.path.exists(json_path):
+            with open(json_path) as f:
+                header = json.load(f)
+            if header.get('source_size') != stat.st_size or header.get('source_mtime_ns') != stat.st_mtime_ns:
+                header = None
+        if header is None:
+            os.makedirs(os.path.dirname(npy_path), exist_ok=True)
+            header = cls._convert(vti_path, npy_path, progress_callback, is_cancelled)
+            if header is None:
+                return None
+            header['source_size'] = stat.st_size
+            header['source_mtime_ns'] = stat.st_mtime_ns
+            # The .json is written last: it marks the sidecar as complete
+            with open(json_path, 'w') as f:
+                json.dump(header, f)
+            cls._remove_stale(npy_path)
+        array = np.load(npy_path, mmap_mode='r')
+        return cls(vti_path, array, header)
+
+    @staticmethod
+    def _remove_stale(npy_path):
+        """Removes the sidecars of older versions of the same source file."""
+        cache_dir, name = os.path.split(npy_path)
+        path_key, current = name.split("-")[0], os.path.splitext(name)[0]
+        for other in os.listdir(cache_dir):
+            if other.startswith(path_key + "-") and os.path.splitext(other)[0] != current:
+                try:
+                    os.remove(os.path.join(cache_dir, other))
+                except OSError:
+                    pass
+
+    @classmethod
+    def _convert(cls, vti_path, npy_path, progress_callback, is_cancelled):
+        whole_extent = read_whole_extent(vti_path)
+        if whole_extent is None:
+            raise IOError(f"Failed to read VTI header: {vti_path}")
+        x0, x1, y0, y1, z0, z1 = whole_extent
+        array = None
+        origin = spacing = scalar_name = None
+        scalar_min, scalar_max = np.inf, -np.inf
+        for k in range(z0, z1 + 1, cls.SLAB_SLICES):
+            if is_cancelled and is_cancelled():
+                if array is not None:
+                    del array
+                    os.remove(npy_path)
+                return None
+            k1 = min(k + cls.SLAB_SLICES - 1, z1)
+            slab = read_extent(vti_path, (x0, x1, y0, y1, k, k1))
+            scalars = slab.GetPointData().GetScalars()
+            values = numpy_support.vtk_to_numpy(scalars)
+            components = scalars.GetNumberOfComponents()
+            shape = (k1 - k + 1, y1 - y0 + 1, x1 - x0 + 1) + ((components,) if components > 1 else ())
+            if array is None:
+                origin, spacing, scalar_name = slab.GetOrigin(), slab.GetSpacing(), scalars.GetName()
+                full_shape = (z1 - z0 + 1,) + shape[1:]
+                array = np.lib.format.open_memmap(npy_path, mode='w+', dtype=values.dtype, shape=full_shape)
+            array[k - z0:k1 - z0 + 1] = values.reshape(shape)
+            scalar_min = min(scalar_min, float(values.min()))
+            scalar_max = max(scalar_max, float(values.max()))
+            if progress_callback:
+                progress_callback((k1 - z0 + 1) / (z1 - z0 + 1))
+        array.flush()
+        del array
+        return {
+            'extent': whole_extent,
+            'origin': origin,
+            'spacing': spacing,
+            'scalar_range': (scalar_min, scalar_max),
+            'scalar_name': scalar_name,
+        }
+
+    def header_image(self):
+        """Returns a vtkImageData carrying the volume geometry but no voxels."""
+        image = vtk.vtkImageData()
+        image.SetExtent(self.extent)
+        image.SetOrigin(self.origin)
+        image.SetSpacing(self.spacing)
+        return image
+
+    def slice_array(self, axis, slice_index):
+        """Returns the voxels of one slice as a view of the memory map."""
+        if axis == 'z':
+            return self.array[slice_index - self.extent[4]]
+        elif axis == 'y':
+            return self.array[:, slice_index - self.extent[2]]
+        return self.array[:, :, slice_index - self.extent[0]]
+
+    def slice_image(self, axis, slice_index):
+        """Returns one slice as a single-slice vtkImageData positioned inside the volume."""
+        last = self._last_slices.get(axis)
+        if last is not None and last[0] == slice_index:
+            return last[1]
+
+        values = np.ascontiguousarray(self.slice_array(axis, slice_index))
+        extent = list(self.extent)
+        axis_id = 'xyz'.index(axis)
+        extent[2 * axis_id] = extent[2 * axis_id + 1] = slice_index
+        image = vtk.vtkImageData()
+        image.SetExtent(extent)
+        image.SetOrigin(self.origin)
+        image.SetSpacing(self.spacing)
+        components = values.shape[-1] if values.ndim == 3 else 1
+        scalars = numpy_support.numpy_to_vtk(values.reshape(-1, components), deep=1)
+        scalars.SetName(self.scalar_name or "Scalars")
+        image.GetPointData().SetScalars(scalars)
+
+        self._last_slices[axis] = (slice_index, image)
+        return image
+
+
+# ==============================================================================
+# Background VTI load with progress, cancellation and early slice previews
+# ==============================================================================
+class VolumeLoadJob:
+    """Reads a VTI file on a worker thread.
+
+    The middle axial slice is read first (an extent request) and published in
+    `previews` so the axial view can show it before the full volume is available.
+    Coronal and sagittal slices span the whole z range, which on compressed files
+    costs about as much as the full read, so those views wait for the volume.
+    Volumes estimated to be larger than `out_of_core_bytes` are not read into
+    memory; they are opened as an OutOfCoreVolume instead (published in `volume`),
+    and `image_data` then only carries the geometry.
+    The GUI polls `progress`, `previews`, `done`, `error` and `image_data`.
+    If a profiler is given, each phase of the load is recorded on it.
+    """
+    def __init__(self, file_path, out_of_core_bytes=None, profiler=None):
+        self.file_path = file_path
+        self.out_of_core_bytes = out_of_core_bytes
+        self.profiler = profiler
+        self.progress = 0.0
+        self.previews = {}  # key: view axis ('x', 'y', 'z'), value: single-slice vtkImageData
+        self.image_data = None
+        self.volume = None
+        self.error = None
+        self._axial_preview = None
+        self._preview_weight = 0.0  # Share of the reported progress taken by the preview read
+        self.done = False
+        self.cancelled = False
+        self._reader = None
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="vti-load", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        """Requests the worker to stop; the reader aborts at its next progress event."""
+        self.cancelled = True
+        with self._lock:
+            if self._reader is not None:
+                self._reader.SetAbortExecuteAndUpdateTime()
+
+    def take_previews(self):
+        """Returns and forgets the previews published since the last call."""
+        with self._lock:
+            previews, self.previews = self.previews, {}
+        return previews
+
+    def _span(self, name):
+        return self.profiler.span(name, "io") if self.profiler is not None else nullcontext()
+
+    def _on_progress(self, reader, event):
+        self.progress = self._preview_weight + (1.0 - self._preview_weight) * reader.GetProgress()
+        if self.cancelled:
+            reader.SetAbortExecuteAndUpdateTime()
+
+    def _open_out_of_core(self):
+        def on_progress(fraction):
+            self.progress = self._preview_weight + (1.0 - self._preview_weight) * fraction
+        volume = OutOfCoreVolume.open(self.file_path, progress_callback=on_progress,
+                                      is_cancelled=lambda: self.cancelled)
+        if volume is None:
+            return
+        self.volume = volume
+        self.image_data = volume.header_image()
+        self.progress = 1.0
+
+    def _run(self):
+        try:
+            with self._span("read_header"):
+                whole_extent = read_whole_extent(self.file_path)
+            if whole_extent is None or whole_extent[1] < whole_extent[0]:
+                raise IOError(f"Failed to read VTI header: {self.file_path}")
+
+            # The preview is one slice of the volume, weighted as such in the progress
+            self._preview_weight = 1.0 / (whole_extent[5] - whole_extent[4] + 2)
+            with self._span("read_preview:z"):
+                preview = read_extent(self.file_path, middle_slice_extents(whole_extent)['z'])
+            if self.cancelled:
+                return
+            with self._lock:
+                self.previews['z'] = preview
+            self._axial_preview = preview
+            self.progress = self._preview_weight
+
+            if self.out_of_core_bytes is not None:
+                # The axial preview holds exactly one slice of the volume
+                slice_bytes = self._axial_preview.GetActualMemorySize() * 1024
+                estimated_bytes = slice_bytes * (whole_extent[5] - whole_extent[4] + 1)
+                if estimated_bytes > self.out_of_core_bytes:
+                    with self._span("open_out_of_core"):
+                        self._open_out_of_core()
+                    return
+
+            reader = vtk.vtkXMLImageDataReader()
+            reader.SetFileName(self.file_path)
+            reader.AddObserver("ProgressEvent", self._on_progress)
+            if self.profiler is not None:
+                self.profiler.observe(reader, "read_volume", category="io")
+            with self._lock:
+                self._reader = reader
+            if self.cancelled:
+                return
+            reader.Update()
+            if self.cancelled:
+                return
+
+            image_data = reader.GetOutput()
+            if not image_data or image_data.GetNumberOfPoints() == 0:
+                raise IOError(f"Failed to load VTI file: {self.file_path}")
+            self.image_data = image_data
+            self.progress = 1.0
+        except Exception as e:
+            self.error = e
+        finally:
+            with self._lock:
+                self._reader = None
+            self.done = True
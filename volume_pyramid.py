@@ -0,0 +1,148 @@
+import threading
+
+import numpy as np
+import vtk
+from vtk.util import numpy_support
+
+
+def block_mean(voxels, factor):
+    """Averages factor^3 voxel blocks of a (nz, ny, nx[, components]) array; partial blocks are dropped.
+
+    The float32 means are cast back to the voxels' dtype, rounded to the nearest
+    value for integer dtypes.
+    """
+    nz, ny, nx = (n // factor for n in voxels.shape[:3])
+    trimmed = voxels[:nz * factor, :ny * factor, :nx * factor]
+    blocks = trimmed.reshape((nz, factor, ny, factor, nx, factor) + voxels.shape[3:])
+    means = blocks.mean(axis=(1, 3, 5), dtype=np.float32)
+    if np.issubdtype(voxels.dtype, np.integer):
+        np.rint(means, out=means)
+    return means.astype(voxels.dtype, copy=False)
+
+
+# ==============================================================================
+# Background-built multi-resolution copies of a volume for coarse slice display
+# ==============================================================================
+class VolumePyramid:
+    """Downsampled levels of a voxel array, built on a worker thread.
+
+    Level factors are powers of two; each coarse voxel is the mean of a
+    factor^3 block, cast back to the source dtype (rounded for integers), so
+    window/level settings carry over. The first level is computed from the source in slabs
+    (the source may be a memory map) and only levels of at most max_level_bytes
+    are kept. Coarse slices are positioned at the centres of their blocks.
+    """
+    SLAB_BLOCKS = 8  # Coarse slices produced per read of the source
+
+    def __init__(self, voxels, extent, origin, spacing, max_level_bytes=256 * 1024 * 1024, min_size=64):
+        self.voxels = voxels
+        self.extent = tuple(extent)
+        self.origin = tuple(origin)
+        self.spacing = tuple(spacing)
+        self.max_level_bytes = max_level_bytes
+        self.min_size = min_size
+        self.levels = []  # (factor, array), finest first; appended as they are built
+        self.done = False
+        self.cancelled = False
+        self._thread = threading.Thread(target=self._run, name="volume-pyramid", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _run(self):
+        try:
+            factor = 2
+            while self.voxels.nbytes / factor ** 3 > self.max_level_bytes:
+                factor *= 2
+            if min(self.voxels.shape[:3]) < factor:
+                return
+            level = self._first_level(factor)
+            while level is not None:
+                self.levels.append((factor, level))
+                if max(level.shape[:3]) <= self.min_size or min(level.shape[:3]) < 2:
+                    break
+                if self.cancelled:
+                    return
+                level = block_mean(level, 2)
+                factor *= 2
+        except Exception as e:
+            print(f"Volume pyramid build failed: {e}")
+        finally:
+            self.done = True
+
+    def _first_level(self, factor):
+        nz = self.voxels.shape[0] // factor
+        level = None
+        for k in range(0, nz, self.SLAB_BLOCKS):
+            if self.cancelled:
+                return None
+            k1 = min(k + self.SLAB_BLOCKS, nz)
+            slab = block_mean(self.voxels[k * factor:k1 * factor], factor)
+            if level is None:
+                level = np.empty((nz,) + slab.shape[1:], dtype=self.voxels.dtype)
+            level[k:k1] = slab
+        return level
+
+    def level_for(self, max_slice_size):
+        """Returns the finest built (factor, array) whose slices are at most max_slice_size on a side."""
+        for factor, level in list(self.levels):
+            if max(level.shape[:3]) <= max_slice_size:
+                return factor, level
+        return self.levels[-1] if self.levels else None
+
+    def _coarse_slice(self, level, axis, slice_index):
+        factor, array = level
+        axis_id = 'xyz'.index(axis)
+        array_axis = 2 - axis_id  # Arrays are indexed (z, y, x)
+        coarse_index = min((slice_index - self.extent[2 * axis_id]) // factor, array.shape[array_axis] - 1)
+        values = np.ascontiguousarray(np.take(array, coarse_index, axis=array_axis))
+        in_plane = [i for i in range(3) if i != axis_id]
+        # Block centres sit (factor - 1) / 2 fine voxels into each block
+        origin = [self.origin[i] + (self.extent[2 * i] + (factor - 1) / 2.0) * self.spacing[i] for i in range(3)]
+        spacing = [self.spacing[i] * factor for i in range(3)]
+        components = values.shape[2] if values.ndim == 3 else 1
+        scalars = numpy_support.numpy_to_vtk(values.reshape(-1, components), deep=0)
+        return values, in_plane, origin, spacing, scalars
+
+    def slice_view_image(self, level, axis, slice_index):
+        """Returns a coarse slice laid out like AxisSliceCache output (in-plane axes, slice plane at z = 0)."""
+        values, in_plane, origin, spacing, scalars = self._coarse_slice(level, axis, slice_index)
+        image = vtk.vtkImageData()
+        image.SetDimensions(values.shape[1], values.shape[0], 1)
+        image.SetOrigin(origin[in_plane[0]], origin[in_plane[1]], 0.0)
+        image.SetSpacing(spacing[in_plane[0]], spacing[in_plane[1]], 1.0)
+        image.GetPointData().SetScalars(scalars)
+        return image
+
+    def slice_volume_image(self, level, axis, slice_index):
+        """Returns a coarse slice as a single-slice vtkImageData placed at slice_index inside the volume."""
+        values, in_plane, origin, spacing, scalars = self._coarse_slice(level, axis, slice_index)
+        axis_id = 'xyz'.index(axis)
+        extent = [0, 0, 0, 0, 0, 0]
+        extent[2 * in_plane[0] + 1] = values.shape[1] - 1
+        extent[2 * in_plane[1] + 1] = values.shape[0] - 1
+        extent[2 * axis_id] = extent[2 * axis_id + 1] = slice_index
+        # Along the normal the slice keeps the fine index and spacing
+        origin[axis_id] = self.origin[axis_id]
+        spacing[axis_id] = self.spacing[axis_id]
+        image = vtk.vtkImageData()
+        image.SetExtent(extent)
+        image.SetOrigin(origin)
+        image.SetSpacing(spacing)
+        image.GetPointData().SetScalars(scalars)
+        return image
+
+    def level_volume_image(self, level):
+        """Returns a whole pyramid level as a vtkImageData covering the volume's bounds (block centres)."""
+        factor, array = level
+        components = array.shape[3] if array.ndim == 4 else 1
+        image = vtk.vtkImageData()
+        image.SetDimensions(array.shape[2], array.shape[1], array.shape[0])
+        image.SetOrigin([self.origin[i] + (self.extent[2 * i] + (factor - 1) / 2.0) * self.spacing[i] for i in range(3)])
+        image.SetSpacing([s * factor for s in self.spacing])
+        image.GetPointData().SetScalars(numpy_support.numpy_to_vtk(array.reshape(-1, components), deep=0))
+        return image
@@ -0,0 +1,91 @@
+import os
+
+import vtk
+
+# Transfer functions as control points over the normalized [0, 1] display range
+TRANSFER_FUNCTION_PRESETS = {
+    "Grayscale": {
+        'color': [(0.0, (0.0, 0.0, 0.0)), (1.0, (1.0, 1.0, 1.0))],
+        'opacity': [(0.0, 0.0), (0.2, 0.0), (1.0, 0.6)],
+    },
+    "Soft tissue": {
+        'color': [(0.0, (0.0, 0.0, 0.0)), (0.4, (0.75, 0.35, 0.25)), (0.7, (1.0, 0.8, 0.65)), (1.0, (1.0, 1.0, 1.0))],
+        'opacity': [(0.0, 0.0), (0.3, 0.0), (0.5, 0.12), (0.7, 0.25), (1.0, 0.4)],
+    },
+    "Bone": {
+        'color': [(0.0, (0.0, 0.0, 0.0)), (0.6, (0.55, 0.25, 0.15)), (0.8, (0.9, 0.85, 0.7)), (1.0, (1.0, 1.0, 0.95))],
+        'opacity': [(0.0, 0.0), (0.6, 0.0), (0.8, 0.5), (1.0, 0.9)],
+    },
+    "MIP": {
+        'color': [(0.0, (0.0, 0.0, 0.0)), (1.0, (1.0, 1.0, 1.0))],
+        'opacity': [(0.0, 0.0), (1.0, 1.0)],
+        'blend': 'maximum',
+    },
+}
+
+# (sample distance factor, image sample distance) per 3D quality level, see FrameRateGovernor
+INTERACTIVE_SAMPLING = [(1.0, 1.0), (2.0, 2.0), (4.0, 3.0), (6.0, 4.0)]
+
+
+def make_volume_property(preset, low, high):
+    """Builds the vtkVolumeProperty of a TRANSFER_FUNCTION_PRESETS entry mapped onto [low, high]."""
+    spec = TRANSFER_FUNCTION_PRESETS[preset]
+    span = high - low if high > low else 1.0
+    color = vtk.vtkColorTransferFunction()
+    for t, rgb in spec['color']:
+        color.AddRGBPoint(low + t * span, *rgb)
+    opacity = vtk.vtkPiecewiseFunction()
+    for t, alpha in spec['opacity']:
+        opacity.AddPoint(low + t * span, alpha)
+
+    volume_property = vtk.vtkVolumeProperty()
+    volume_property.SetColor(color)
+    volume_property.SetScalarOpacity(opacity)
+    volume_property.SetInterpolationTypeToLinear()
+    if spec.get('blend') != 'maximum':
+        volume_property.ShadeOn()
+        volume_property.SetAmbient(0.3)
+        volume_property.SetDiffuse(0.7)
+        volume_property.SetSpecular(0.2)
+    return volume_property
+
+
+# ==============================================================================
+# Multi-threaded CPU ray casting of the loaded volume
+# ==============================================================================
+class CPUVolumeRenderer:
+    """A vtkVolume drawn with the multi-threaded fixed-point CPU ray caster.
+
+    set_quality(level) trades sample distance (along rays) and image sample
+    distance (rays per pixel) for speed; level 0 is full quality.
+    """
+    def __init__(self, number_of_threads=None):
+        self.mapper = vtk.vtkFixedPointVolumeRayCastMapper()
+        self.mapper.SetNumberOfThreads(number_of_threads or os.cpu_count() or 1)
+        self.mapper.AutoAdjustSampleDistancesOff()  # Quality is driven by set_quality()
+        self.volume = vtk.vtkVolume()
+        self.volume.SetMapper(self.mapper)
+        self.volume.PickableOff()
+        self.base_sample_distance = 1.0
+        self.preset = "Grayscale"
+        self.quality_level = 0
+
+    def set_input(self, image_data):
+        self.mapper.SetInputData(image_data)
+        # Half a voxel along the rays at full quality
+        self.base_sample_distance = 0.5 * min(image_data.GetSpacing())
+        self.set_quality(self.quality_level)
+
+    def set_preset(self, preset, low, high):
+        self.preset = preset
+        self.volume.SetProperty(make_volume_property(preset, low, high))
+        if TRANSFER_FUNCTION_PRESETS[preset].get('blend') == 'maximum':
+            self.mapper.SetBlendModeToMaximumIntensity()
+        else:
+            self.mapper.SetBlendModeToComposite()
+
+    def set_quality(self, level):
+        self.quality_level = level
+        distance_factor, image_sample_distance = INTERACTIVE_SAMPLING[min(level, len(INTERACTIVE_SAMPLING) - 1)]
+        self.mapper.SetSampleDistance(self.base_sample_distance * distance_factor)
+        self.mapper.SetImageSampleDistance(image_sample_distance)
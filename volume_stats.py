@@ -0,0 +1,130 @@
+import threading
+
+import numpy as np
+
+# Window/level presets as (low, high) percentiles of the voxel histogram
+WINDOW_PRESETS = {
+    "Full range": (0.0, 100.0),
+    "Auto (1-99%)": (1.0, 99.0),
+    "Narrow (5-95%)": (5.0, 95.0),
+}
+
+
+def middle_slices_range(voxels):
+    """Returns the (min, max) of the three middle slices: a cheap first guess at the scalar range."""
+    if voxels.ndim == 4:
+        voxels = voxels[..., 0]
+    nz, ny, nx = voxels.shape
+    slices = (voxels[nz // 2], voxels[:, ny // 2], voxels[:, :, nx // 2])
+    return (float(min(s.min() for s in slices)), float(max(s.max() for s in slices)))
+
+
+# ==============================================================================
+# Histogram, percentiles and per-slice statistics built in the background
+# ==============================================================================
+class VolumeStatistics:
+    """Global histogram and per-slice min/max/mean of a (nz, ny, nx) voxel array.
+
+    Built on a worker thread in axial slabs, so memory-mapped volumes are read
+    sequentially once per pass (one pass for the ranges and means, one for the
+    histogram). Per-slice statistics exist for all three axes and are keyed by
+    view axis ('x', 'y', 'z'); indices are relative to the volume's extent.
+    Multi-component volumes are indexed by their first component.
+    """
+    SLAB_SLICES = 16
+    HISTOGRAM_BINS = 4096
+
+    def __init__(self, voxels, extent):
+        self.voxels = voxels[..., 0] if voxels.ndim == 4 else voxels
+        self.extent = tuple(extent)
+        self.scalar_range = None
+        self.histogram = None
+        self.bin_edges = None
+        self.slice_min = {}
+        self.slice_max = {}
+        self.slice_mean = {}
+        self.done = False
+        self.cancelled = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="volume-stats", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _slabs(self):
+        nz = self.voxels.shape[0]
+        for k in range(0, nz, self.SLAB_SLICES):
+            if self.cancelled:
+                return
+            yield k, self.voxels[k:k + self.SLAB_SLICES]
+
+    def _run(self):
+        try:
+            nz, ny, nx = self.voxels.shape
+            z_min, z_max, z_sum = np.empty(nz), np.empty(nz), np.empty(nz)
+            y_min, y_max, y_sum = np.full(ny, np.inf), np.full(ny, -np.inf), np.zeros(ny)
+            x_min, x_max, x_sum = np.full(nx, np.inf), np.full(nx, -np.inf), np.zeros(nx)
+            for k, slab in self._slabs():
+                k1 = k + len(slab)
+                z_min[k:k1], z_max[k:k1] = slab.min(axis=(1, 2)), slab.max(axis=(1, 2))
+                z_sum[k:k1] = slab.sum(axis=(1, 2), dtype=np.float64)
+                np.minimum(y_min, slab.min(axis=(0, 2)), out=y_min)
+                np.maximum(y_max, slab.max(axis=(0, 2)), out=y_max)
+                y_sum += slab.sum(axis=(0, 2), dtype=np.float64)
+                np.minimum(x_min, slab.min(axis=(0, 1)), out=x_min)
+                np.maximum(x_max, slab.max(axis=(0, 1)), out=x_max)
+                x_sum += slab.sum(axis=(0, 1), dtype=np.float64)
+            if self.cancelled:
+                return
+            self.slice_min = {'z': z_min, 'y': y_min, 'x': x_min}
+            self.slice_max = {'z': z_max, 'y': y_max, 'x': x_max}
+            self.slice_mean = {'z': z_sum / (ny * nx), 'y': y_sum / (nz * nx), 'x': x_sum / (nz * ny)}
+            self.scalar_range = (float(z_min.min()), float(z_max.max()))
+
+            low, high = self.scalar_range
+            histogram = np.zeros(self.HISTOGRAM_BINS, dtype=np.int64)
+            for _, slab in self._slabs():
+                histogram += np.histogram(slab, bins=self.HISTOGRAM_BINS, range=(low, high if high > low else low + 1))[0]
+            if self.cancelled:
+                return
+            self.histogram = histogram
+            self.bin_edges = np.linspace(low, high if high > low else low + 1, self.HISTOGRAM_BINS + 1)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+
+    @property
+    def ready(self):
+        return self.done and self.histogram is not None
+
+    def percentiles(self, percents):
+        """Returns the voxel values at the given percentiles (0-100), interpolated within histogram bins."""
+        cumulative = np.concatenate(([0], np.cumsum(self.histogram))) / self.histogram.sum()
+        return np.interp(np.asarray(percents, dtype=float) / 100.0, cumulative, self.bin_edges)
+
+    def window_level(self, preset):
+        """Returns the (window, level) of a WINDOW_PRESETS entry."""
+        low, high = self.percentiles(WINDOW_PRESETS[preset])
+        window = high - low
+        return (window if window > 0 else 1.0), (low + high) / 2.0
+
+    def is_empty(self, axis, slice_index):
+        """True if a slice is constant (e.g. padding outside the scanned field)."""
+        i = slice_index - self.extent[2 * 'xyz'.index(axis)]
+        return self.slice_min[axis][i] == self.slice_max[axis][i]
+
+    def nearest_nonempty(self, axis, slice_index, direction=1):
+        """Returns the first non-empty slice from slice_index on in `direction`, else in the other direction."""
+        first = self.extent[2 * 'xyz'.index(axis)]
+        nonempty = np.flatnonzero(self.slice_min[axis] != self.slice_max[axis]) + first
+        if len(nonempty) == 0:
+            return slice_index
+        ahead = nonempty[nonempty >= slice_index] if direction >= 0 else nonempty[nonempty <= slice_index][::-1]
+        if len(ahead):
+            return int(ahead[0])
+        return int(nonempty[np.argmin(np.abs(nonempty - slice_index))])